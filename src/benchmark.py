@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from decoder import Decoder
+from dispatcher import DispatcherGenerator, DISPATCH_MODES
+from interpreter import Datapack, Interpreter
+
+def encode_r(opcode, rd, funct3, rs1, rs2, funct7):
+    return opcode | (rd << 7) | (funct3 << 12) | (rs1 << 15) | (rs2 << 20) | (funct7 << 25)
+
+def encode_i(opcode, rd, funct3, rs1, imm):
+    return opcode | (rd << 7) | (funct3 << 12) | (rs1 << 15) | ((imm & 0xFFF) << 20)
+
+def encode_s(opcode, funct3, rs1, rs2, imm):
+    return opcode | ((imm & 0x1F) << 7) | (funct3 << 12) | (rs1 << 15) | (rs2 << 20) | (((imm >> 5) & 0x7F) << 25)
+
+def encode_b(funct3, rs1, rs2, imm):
+    return (0x63 | (((imm >> 11) & 1) << 7) | (((imm >> 1) & 0xF) << 8) | (funct3 << 12) | (rs1 << 15) | (rs2 << 20)
+            | (((imm >> 5) & 0x3F) << 25) | (((imm >> 12) & 1) << 31))
+
+def encode_u(opcode, rd, imm):
+    return opcode | (rd << 7) | (imm & 0xFFFFF000)
+
+def encode_j(rd, imm):
+    return (0x6F | (rd << 7) | (((imm >> 12) & 0xFF) << 12) | (((imm >> 11) & 1) << 20)
+            | (((imm >> 1) & 0x3FF) << 21) | (((imm >> 20) & 1) << 31))
+
+def random_word(rng):
+    reg = lambda: rng.randrange(32)
+    kind = rng.randrange(12)
+    if kind == 0: return encode_r(0x33, reg(), rng.randrange(8), reg(), reg(), rng.choice([0x00, 0x20, 0x01]))
+    if kind == 1: return encode_i(0x13, reg(), rng.randrange(8), reg(), rng.randrange(-2048, 2048))
+    if kind == 2: return encode_i(0x03, reg(), rng.choice([0, 1, 2, 4, 5]), reg(), rng.randrange(-2048, 2048))
+    if kind == 3: return encode_s(0x23, rng.randrange(3), reg(), reg(), rng.randrange(-2048, 2048))
+    if kind == 4: return encode_b(rng.choice([0, 1, 4, 5, 6, 7]), reg(), reg(), rng.randrange(-2048, 2048) * 2)
+    if kind == 5: return encode_u(rng.choice([0x37, 0x17]), reg(), rng.getrandbits(32))
+    if kind == 6: return encode_j(reg(), rng.randrange(-(1 << 19), 1 << 19) * 2)
+    if kind == 7: return encode_i(0x67, reg(), 0, reg(), rng.randrange(-2048, 2048))
+    if kind == 8: return encode_r(0x2F, reg(), 2, reg(), reg(), rng.randrange(128))
+    if kind == 9: return rng.choice([0x00000073, 0x00100073])
+    if kind == 10: return 0
+    return rng.getrandbits(32)
+
+def synth_random_words(count, seed=0):
+    rng = random.Random(seed)
+    return struct.pack(f"<{count}I", *(random_word(rng) for _ in range(count)))
+
+def synth_function(rng, base, size, callees, next_start=None):
+    # One function of `size` instructions starting at word index `base`:
+    # RV32IMA arithmetic, stack/global memory traffic, short branches inside
+    # the function, calls to `callees`, a call to `next_start` and a ret.
+    reg = lambda: rng.randrange(5, 32)
+    words = []
+    for k in range(max(0, size - 2)):
+        pc = (base + k) * 4
+        r = rng.random()
+        if r < 0.12:
+            target = rng.randrange(base, base + size - 1)
+            words.append(encode_b(rng.choice([0, 1, 4, 5, 6, 7]), reg(), reg(), (target - base - k) * 4))
+        elif r < 0.16 and callees:
+            words.append(encode_j(1, rng.choice(callees) * 4 - pc))
+        elif r < 0.36:
+            funct3 = rng.randrange(8)
+            funct7 = 0x20 if funct3 in (0, 5) and rng.random() < 0.3 else rng.choice([0x00, 0x00, 0x01])
+            words.append(encode_r(0x33, reg(), funct3, reg(), reg(), funct7))
+        elif r < 0.56:
+            funct3 = rng.randrange(8)
+            if funct3 == 1: imm = rng.randrange(32)
+            elif funct3 == 5: imm = rng.randrange(32) | rng.choice([0, 0x400])
+            else: imm = rng.randrange(-2048, 2048)
+            words.append(encode_i(0x13, reg(), funct3, reg(), imm))
+        elif r < 0.70:
+            words.append(encode_i(0x03, reg(), rng.choice([0, 1, 2, 4, 5]), rng.choice([2, 3]), rng.randrange(-512, 512) * 4))
+        elif r < 0.82:
+            words.append(encode_s(0x23, rng.randrange(3), rng.choice([2, 3]), reg(), rng.randrange(-512, 512) * 4))
+        elif r < 0.92:
+            words.append(encode_u(rng.choice([0x37, 0x17]), reg(), rng.getrandbits(32)))
+        elif r < 0.96:
+            words.append(encode_r(0x2F, reg(), 2, rng.choice([2, 3]), reg(), rng.choice([0x00, 0x04, 0x08, 0x0C, 0x10, 0x20])))
+        else:
+            words.append(encode_i(0x73, 0, 0, 0, 0))
+    if size > 1:
+        # Chaining every function to the next keeps the whole program reachable
+        if next_start is None: words.append(encode_i(0x13, 0, 0, 0, 0))
+        else: words.append(encode_j(1, (next_start - (base + size - 2)) * 4))
+    words.append(encode_i(0x67, 0, 0, 1, 0))
+    return words
+
+def synth_program(count, seed=0, function_size=64):
+    """A synthetic RV32IMA program of `count` instructions made of
+    `function_size`-instruction functions that call each other."""
+    rng = random.Random(seed)
+    starts = list(range(0, count, function_size))
+    words = []
+    for i, base in enumerate(starts):
+        size = min(function_size, count - base)
+        # jal reaches +-1 MiB, so only nearby functions are called
+        callees = [s for s in starts[max(0, i - 1000):i + 1000] if abs(s - base) < 200000]
+        next_start = starts[i + 1] if i + 1 < len(starts) else None
+        words.extend(synth_function(rng, base, size, callees, next_start))
+    return struct.pack(f"<{len(words)}I", *words)
+
+def bench_decode(args):
+    count = int(args.size_mb * 1024 * 1024) // 4
+    data = synth_random_words(count, args.seed)
+    print(f"Decoding {count} words ({len(data) / (1024 * 1024):.1f} MB)...")
+
+    start = time.perf_counter()
+    scalar = Decoder(data).decode_all(vectorized=False)
+    scalar_time = time.perf_counter() - start
+    print(f"  scalar:     {scalar_time:.3f}s")
+
+    start = time.perf_counter()
+    vectorized = Decoder(data).decode_all(vectorized=True)
+    vector_time = time.perf_counter() - start
+    print(f"  vectorized: {vector_time:.3f}s")
+
+    start = time.perf_counter()
+    table = Decoder(data).decode_table()
+    table_time = time.perf_counter() - start
+    print(f"  table:      {table_time:.3f}s ({table.nbytes() / (1024 * 1024):.1f} MB of arrays)")
+
+    mismatches = sum(1 for a, b, c in zip(scalar, vectorized, table) if not repr(a) == repr(b) == repr(c) or not a.type == b.type == c.type)
+    if mismatches or not len(scalar) == len(vectorized) == len(table):
+        print(f"  MISMATCH: {mismatches} instructions differ")
+        return 1
+    print(f"  speedup:    {scalar_time / vector_time:.1f}x (outputs identical)")
+    return 0
+
+def bench_pipeline(args):
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            binary = os.path.join(tmp, f"synth_{size}.bin")
+            with open(binary, 'wb') as f:
+                f.write(synth_program(size, args.seed))
+            report_path = os.path.join(tmp, f"synth_{size}.json")
+            output = os.path.join(tmp, f"synth_{size}" + (".zip" if args.zip else ""))
+            cmd = [sys.executable, main_py, binary, output, "--profile", report_path, "--jobs", str(args.jobs)]
+            if args.optimize: cmd.append("-O")
+            if args.reachable: cmd.append("--reachable")
+            print(f"Building {size} instructions...", flush=True)
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            with open(report_path, 'r') as f:
+                report = json.load(f)
+            report["size"] = size
+            results.append(report)
+
+    names = [p["name"] for p in results[0]["phases"]] if results else []
+    print(f"{'instrs':>9} {'total':>8} " + " ".join(f"{n:>9}" for n in names) + f" {'rss MB':>8} {'files':>8} {'MB out':>8}")
+    for report in results:
+        phases = {p["name"]: p["seconds"] for p in report["phases"]}
+        print(f"{report['size']:>9} {report['total_seconds']:>8.2f} " + " ".join(f"{phases.get(n, 0):>9.2f}" for n in names)
+              + f" {report.get('peak_rss_mb', 0):>8.1f} {report['files_written']:>8} {report['bytes_written'] / (1024 * 1024):>8.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Results written to {args.output}")
+    return 0
+
+def bench_dispatch(args):
+    # Commands and interpreter time per dispatch/root lookup, with targets
+    # drawn from Zipf-distributed weights (--skew 0 is uniform)
+    print(f"{'targets':>9} {'mode':>8} {'ways':>4} {'page':>5} {'depth':>5} {'worst':>5} {'expected':>8} {'measured':>8} {'us/lookup':>9}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        addresses = [i * 4 for i in range(size)]
+        ranks = list(range(1, size + 1))
+        rng.shuffle(ranks)
+        weights = {a: max(1, round(1e6 / r ** args.skew)) for a, r in zip(addresses, ranks)}
+        samples = rng.choices(addresses, weights=[weights[a] for a in addresses], k=args.samples)
+        shapes = [(mode, ways, None) for mode in DISPATCH_MODES if mode != "page" for ways in args.ways]
+        shapes += [("page", ways, page_size) for ways in args.ways for page_size in args.page_sizes]
+        for mode, ways, page_size in shapes:
+            with tempfile.TemporaryDirectory() as tmp:
+                function_dir = os.path.join(tmp, "data", "rv32", "function")
+                dispatcher = DispatcherGenerator([], os.path.join(function_dir, "dispatch"), "rv32", mode, ways=ways, page_size=page_size or 1024)
+                depth = dispatcher.generate(weights, set(addresses))
+                dispatcher.writer.close()
+                for addr in set(samples):
+                    with open(os.path.join(function_dir, f"b_{hex(addr)[2:]}.mcfunction"), 'w') as f:
+                        f.write(f"scoreboard players set #hit rv32_temp {addr}\n")
+                stats = dispatcher.stats()
+                vm = Interpreter(Datapack(tmp), "rv32")
+                pc = vm.objective("rv32_pc")
+                commands = 0
+                start = time.perf_counter()
+                for addr in samples:
+                    pc["pc"] = addr
+                    before = vm.commands
+                    vm.run_function("rv32:dispatch/root")
+                    commands += vm.commands - before
+                    if vm.score("#hit", "rv32_temp") != addr:
+                        print(f"  MISMATCH: {mode} {ways}-way dispatch of {hex(addr)} reached {vm.score('#hit', 'rv32_temp')}")
+                        return 1
+                elapsed = time.perf_counter() - start
+            # Less the target's own command
+            measured = commands / len(samples) - 1
+            print(f"{size:>9} {mode:>8} {ways:>4} {page_size or '':>5} {depth:>5} {dispatcher.worst_commands:>5} "
+                  f"{stats['expected_commands']:>8.2f} {measured:>8.2f} {elapsed * 1e6 / len(samples):>9.1f}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="MC-RVVM transpiler benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_decode = sub.add_parser("decode", help="Compare scalar and vectorized Decoder.decode_all")
+    p_decode.add_argument("--size-mb", type=float, default=4, help="Size of the synthetic binary in MB")
+    p_decode.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic binary")
+    p_decode.set_defaults(func=bench_decode)
+
+    p_pipeline = sub.add_parser("pipeline", help="Time every main.py phase on synthetic RV32IMA programs")
+    p_pipeline.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="Program sizes in instructions")
+    p_pipeline.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic programs")
+    p_pipeline.add_argument("--optimize", "-O", action="store_true", help="Build with block optimization")
+    p_pipeline.add_argument("--reachable", action="store_true", help="Build with the reachability pass")
+    p_pipeline.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes passed to main.py")
+    p_pipeline.add_argument("--zip", action="store_true", help="Write zipped datapacks")
+    p_pipeline.add_argument("--output", help="Save all profile reports to this JSON file")
+    p_pipeline.set_defaults(func=bench_pipeline)
+
+    p_dispatch = sub.add_parser("dispatch", help="Measure dispatch tree lookups in the offline interpreter")
+    p_dispatch.add_argument("--sizes", type=int, nargs="+", default=[1000, 30000], help="Numbers of dispatch targets")
+    p_dispatch.add_argument("--ways", type=int, nargs="+", default=[2, 3, 4, 6, 8, 16], help="Range checks per node to compare")
+    p_dispatch.add_argument("--page-sizes", type=int, nargs="+", default=[256, 1024, 4096], help="Page sizes of the page mode to compare")
+    p_dispatch.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the target weights (0 = uniform)")
+    p_dispatch.add_argument("--samples", type=int, default=5000, help="Lookups per tree")
+    p_dispatch.add_argument("--seed", type=int, default=0, help="Random seed for weights and lookups")
+    p_dispatch.set_defaults(func=bench_dispatch)
+
+    args = parser.parse_args()
+    raise SystemExit(args.func(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
-import re
+import struct
+from elf_loader import read_map_symbols
+from cfg import ControlFlowGraph
+from reachability import MAX_TABLE_ENTRIES
+
+BRANCHES = {"beq", "bne", "blt", "bge", "bltu", "bgeu"}
+STORES = {"sb", "sh", "sw"}
+INLINE_SIZE = 8
+INLINE_COST = 200
+SUPERBLOCK_SIZE = 32
 
 class BlockOptimizer:
-    def __init__(self, instructions, map_file=None):
+    def __init__(self, instructions, map_file=None, symbols=None, entry=None, memory=b""):
         self.instructions = sorted(instructions, key=lambda x: x.address)
         self.instr_map = {i.address: i for i in self.instructions}
-        self.map_file = map_file
+        if symbols is None:
+            symbols = read_map_symbols(map_file) if map_file else {}
+        self.symbols = symbols
+        self.entry = entry
+        self.memory = memory
+        self.jumps = {} # jalr address -> ("direct" or "table", targets)
+        self.cfg = None
         self.leaders = set()
         self.blocks = []
         self.weights = {} # Address -> Weight
@@ -15,18 +30,24 @@ class BlockOptimizer:
         self._calc_hotspots()
         return self.blocks, self.weights
 
+    def count_blocks(self):
+        # Number of blocks optimize() would produce, without building them
+        self._identify_leaders()
+        count = 0
+        prev = None
+        for instr in self.instructions:
+            if prev is None or instr.address in self.leaders or instr.address != prev + 4:
+                count += 1
+            prev = instr.address
+        return count
+
     def _identify_leaders(self):
         if self.instructions:
             self.leaders.add(self.instructions[0].address)
 
-        if self.map_file:
-            with open(self.map_file, 'r') as f:
-                for line in f:
-                    match = re.search(r'^\s+(0x[0-9a-fA-F]+)\s+([a-zA-Z_][a-zA-Z0-9_]*)', line)
-                    if match:
-                        addr = int(match.group(1), 16)
-                        if addr in self.instr_map:
-                            self.leaders.add(addr)
+        for addr in self.symbols:
+            if addr in self.instr_map:
+                self.leaders.add(addr)
 
         for i, instr in enumerate(self.instructions):
             is_branch = instr.name in ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
@@ -42,13 +63,83 @@ class BlockOptimizer:
             if (is_branch or is_jump or is_ecall) and i + 1 < len(self.instructions):
                 self.leaders.add(self.instructions[i+1].address)
 
+        # Resolved jalr targets have to start blocks, and a new leader can
+        # split a block the constants were tracked through, so repeat
+        while True:
+            self._resolve_jumps()
+            new_leaders = {t for _, targets in self.jumps.values() for t in targets} - self.leaders
+            if not new_leaders:
+                break
+            self.leaders |= new_leaders
+
+    def _resolve_jumps(self):
+        """Targets of every jalr whose base register holds, within its block,
+        a constant (lui/auipc+addi far calls and jumps) or a word loaded from a
+        constant address or an indexed table (switch jump tables)."""
+        self.jumps = {}
+        values = {}
+        prev = None
+        for instr in self.instructions:
+            if prev is None or instr.address in self.leaders or instr.address != prev + 4:
+                values = {}
+            prev = instr.address
+            name = instr.name
+            if name == "jalr":
+                kind, base = values.get(instr.rs1, (None, 0))
+                if kind == "const":
+                    target = (base + instr.imm) & 0xFFFFFFFE
+                    if target in self.instr_map:
+                        self.jumps[instr.address] = ("direct", [target])
+                elif kind in ("word", "entry"):
+                    targets = self._table_targets(base, instr.imm, kind == "entry")
+                    if targets:
+                        self.jumps[instr.address] = ("table", targets)
+                values = {}
+                continue
+
+            value = None
+            rs1 = values.get(instr.rs1, (None, 0))
+            if name == "lui":
+                value = ("const", instr.imm & 0xFFFFFFFF)
+            elif name == "auipc":
+                value = ("const", (instr.address + instr.imm) & 0xFFFFFFFF)
+            elif name == "addi" and rs1[0] in ("const", "index"):
+                value = (rs1[0], (rs1[1] + instr.imm) & 0xFFFFFFFF)
+            elif name == "add":
+                rs2 = values.get(instr.rs2, (None, 0))
+                if rs1[0] == "const" and rs2[0] == "const":
+                    value = ("const", (rs1[1] + rs2[1]) & 0xFFFFFFFF)
+                elif rs1[0] == "const" or rs2[0] == "const":
+                    # Table base plus a scaled index
+                    value = ("index", rs1[1] if rs1[0] == "const" else rs2[1])
+            elif name == "lw" and rs1[0] in ("const", "index"):
+                value = ("word" if rs1[0] == "const" else "entry", (rs1[1] + instr.imm) & 0xFFFFFFFF)
+            if instr.rd != 0:
+                if value is None:
+                    values.pop(instr.rd, None)
+                else:
+                    values[instr.rd] = value
+
+    def _table_targets(self, address, offset, table):
+        # Code addresses stored from `address` on; a table ends at the first word that is not one
+        targets = set()
+        for entry in range(MAX_TABLE_ENTRIES if table else 1):
+            pos = address + entry * 4
+            if pos + 4 > len(self.memory):
+                break
+            target = (struct.unpack_from("<I", self.memory, pos)[0] + offset) & 0xFFFFFFFE
+            if target not in self.instr_map:
+                break
+            targets.add(target)
+        return sorted(targets)
+
     def _build_blocks(self):
         current_block = []
         sorted_leaders = sorted(list(self.leaders))
         leader_set = self.leaders
 
         for instr in self.instructions:
-            if instr.address in leader_set and current_block:
+            if current_block and (instr.address in leader_set or instr.address != current_block[-1].address + 4):
                 self._finalize_block(current_block)
                 current_block = []
             
@@ -60,44 +151,126 @@ class BlockOptimizer:
     def _finalize_block(self, instrs):
         if not instrs: return
         start_addr = instrs[0].address
-        self.blocks.append({
+        block = {
             "start": start_addr,
             "end": instrs[-1].address,
             "instrs": instrs,
             "length": len(instrs)
-        })
-
-    def _calc_hotspots(self):
-        for instr in self.instructions:
-            self.weights[instr.address] = 1
+        }
+        if instrs[-1].address in self.jumps:
+            block["jump"] = self.jumps[instrs[-1].address]
+        self.blocks.append(block)
 
+    def inline_leaves(self, max_size=INLINE_SIZE, max_cost=INLINE_COST, cost=None):
+        """Copy small leaf functions into the blocks that call them (as
+        block["inline"]). A leaf is a function entry followed by at most
+        `max_size` straight-line instructions that do not write ra, the last
+        of which may be an ecall (syscall wrappers), and a `ret`. `cost(instr)`
+        estimates commands; bodies costing more than `max_cost` stay calls.
+        Returns the number of call sites inlined."""
+        leaves = {}
+        count = 0
         for block in self.blocks:
-            w = 1
-            if self.map_file:
-                pass
-
-        map_funcs = set()
-        if self.map_file:
-             with open(self.map_file, 'r') as f:
-                for line in f:
-                    match = re.search(r'^\s+(0x[0-9a-fA-F]+)\s+([a-zA-Z_][a-zA-Z0-9_]*)', line)
-                    if match:
-                        map_funcs.add(int(match.group(1), 16))
+            call = block["instrs"][-1]
+            if call.rd != 1:
+                continue
+            if call.name == "jal":
+                callee = (call.address + call.imm) & 0xFFFFFFFF
+            elif call.name == "jalr" and block.get("jump", ("",))[0] == "direct":
+                callee = block["jump"][1][0]
+            else:
+                continue
+            if callee not in leaves:
+                leaves[callee] = self._leaf_body(callee, max_size, max_cost, cost)
+            if leaves[callee] is not None:
+                block["inline"] = leaves[callee]
+                count += 1
+        return count
 
+    def _leaf_body(self, start, max_size, max_cost, cost):
+        if start not in self.cfg.functions:
+            return None
+        body = []
+        addr = start
+        while len(body) <= max_size:
+            instr = self.instr_map.get(addr)
+            if instr is None:
+                return None
+            if instr.name == "jalr" and instr.rd == 0 and instr.rs1 == 1 and instr.imm == 0:
+                break
+            if instr.name in BRANCHES or instr.name in ("jal", "jalr", "ebreak", "unknown"):
+                return None
+            if (instr.rd == 1 and instr.name not in STORES) or (body and body[-1].name == "ecall"):
+                return None
+            body.append(instr)
+            addr += 4
+        else:
+            return None
+        if cost and sum(cost(instr) for instr in body) > max_cost:
+            return None
+        return body
+
+    def form_superblocks(self, max_size=SUPERBLOCK_SIZE, weights=None):
+        """Extend every block into a superblock by following its most likely
+        successor (by `weights`, block start -> execution count, default the
+        static estimate) into block["trace"]. Blocks other paths also reach
+        are duplicated. A trace stops at a jalr or ecall, at a block already
+        in it (a loop back edge) or before exceeding `max_size` instructions.
+        Returns the number of blocks copied into traces."""
+        weights = self.weights if weights is None else weights
+        by_start = {b["start"]: b for b in self.blocks}
+        copied = 0
         for block in self.blocks:
-            addr = block["start"]
-            w = 1
-            if addr in map_funcs:
-                w = 100
-            elif addr in self.leaders:
-                pass
-            
-            self.weights[addr] = w
+            trace = []
+            seen = {block["start"]}
+            size = block["length"] + len(block.get("inline", ()))
+            current = block
+            while True:
+                succ = self._likely_successor(current, by_start, weights)
+                if succ is None or succ in seen:
+                    break
+                current = by_start[succ]
+                size += current["length"] + len(current.get("inline", ()))
+                if size > max_size:
+                    break
+                trace.append(current)
+                seen.add(succ)
+            if trace:
+                block["trace"] = trace
+                copied += len(trace)
+        return copied
 
+    def _likely_successor(self, block, by_start, weights):
+        last = block["instrs"][-1]
+        next_addr = (last.address + 4) & 0xFFFFFFFF
+        target = (last.address + last.imm) & 0xFFFFFFFF
+        inline = block.get("inline")
+        if inline is not None:
+            succ = None if inline and inline[-1].name == "ecall" else next_addr
+        elif last.name in BRANCHES:
+            if target not in by_start or next_addr not in by_start:
+                succ = next_addr if target not in by_start else target
+            elif weights.get(target, 0) != weights.get(next_addr, 0):
+                succ = target if weights.get(target, 0) > weights.get(next_addr, 0) else next_addr
+            else:
+                # Backward branches are usually loops
+                succ = target if target <= last.address else next_addr
+        elif last.name == "jal":
+            succ = target
+        elif last.name == "jalr":
+            jump = block.get("jump")
+            succ = jump[1][0] if jump and jump[0] == "direct" else None
+        elif last.name in ("ecall", "ebreak"):
+            succ = None
+        else:
+            succ = next_addr
+        return succ if succ in by_start else None
+
+    def _calc_hotspots(self):
+        # Static estimate from loop nesting and the call graph
         for instr in self.instructions:
-            if instr.name in ["beq", "bne", "blt", "bge", "bltu", "bgeu", "jal"]:
-                target = (instr.address + instr.imm) & 0xFFFFFFFF
-                if target in self.weights and target <= instr.address:
-                    self.weights[target] += 50
-                elif target in self.weights:
-                    self.weights[target] += 5
+            self.weights[instr.address] = 1
+
+        self.cfg = ControlFlowGraph(self.blocks, self.entry, self.symbols)
+        for addr, frequency in self.cfg.estimate().items():
+            self.weights[addr] = max(1, round(frequency))
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import struct
+
+MANIFEST_VERSION = 3
+
+def toolchain_fingerprint():
+    # Any change to the transpiler itself invalidates every cached file.
+    h = hashlib.blake2b(digest_size=16)
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(src_dir)):
+        if name.endswith(".py"):
+            h.update(name.encode())
+            with open(os.path.join(src_dir, name), 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def hash_key(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (bytes, bytearray)):
+            h.update(part)
+        else:
+            h.update(repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+def block_key(block, block_starts):
+    if "trace" in block:
+        return hash_key(_block_key(block, block_starts), [_block_key(b, block_starts) for b in block["trace"]])
+    return _block_key(block, block_starts)
+
+def _block_key(block, block_starts):
+    instrs = block['instrs']
+    last = instrs[-1]
+    next_addr = (last.address + 4) & 0xFFFFFFFF
+    target_addr = (last.address + last.imm) & 0xFFFFFFFF
+    words = struct.pack(f"<{len(instrs)}I", *(i.word for i in instrs))
+    return hash_key(block['start'], words, target_addr in block_starts, next_addr in block_starts, block.get('jump'),
+                    [i.word for i in block.get('inline', [])])
+
+def instruction_key(instr):
+    return hash_key(instr.address, instr.word)
+
+class BuildCache:
+    """Manifest of a previous build, stored next to the datapack directory.
+
+    Function files are keyed by a hash of the instruction words and emission
+    options that produced them, so an incremental build only rewrites files
+    whose inputs changed and removes the ones that no longer exist."""
+
+    def __init__(self, output_dir, options):
+        self.path = output_dir.rstrip("/\\") + ".manifest.json"
+        self.output_dir = output_dir
+        self.options = dict(options, toolchain=toolchain_fingerprint())
+        self.old = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.old = json.load(f)
+            except (OSError, ValueError):
+                self.old = {}
+        self.new = {"version": MANIFEST_VERSION, "options": self.options, "functions": {}}
+        self.rewritten = 0
+        self.reused = 0
+        self.removed = 0
+
+    def reusable(self):
+        return (os.path.isdir(self.output_dir)
+                and self.old.get("version") == MANIFEST_VERSION
+                and self.old.get("options") == self.options)
+
+    def reset(self):
+        self.old = {}
+
+    def section(self, name, key):
+        # Returns the cached record for a whole output group (lib/, dispatch/,
+        # mem/load_data) when it was built from the same inputs.
+        record = self.old.get(name)
+        if record and record.get("key") == key:
+            return record
+        return None
+
+    def record(self, name, key, **values):
+        self.new[name] = dict(values, key=key)
+
+    def cached_function(self, fname, key, writer):
+        entry = self.old.get("functions", {}).get(fname)
+        if entry and entry[0] == key and writer.exists(f"{fname}.mcfunction"):
+            return entry[1]
+        return None
+
+    def record_functions(self, entries):
+        self.new["functions"].update(entries)
+
+    def remove_stale(self, writer):
+        for fname in self.old.get("functions", {}):
+            if fname not in self.new["functions"]:
+                path = writer.path(f"{fname}.mcfunction")
+                if os.path.exists(path):
+                    os.remove(path)
+                    self.removed += 1
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump(self.new, f)
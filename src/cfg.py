@@ -0,0 +1,243 @@
+BRANCHES = {"beq", "bne", "blt", "bge", "bltu", "bgeu"}
+LOOP_SCALE = 10
+MAX_FREQUENCY = 1e9
+
+class ControlFlowGraph:
+    """Intraprocedural CFG over BlockOptimizer blocks with dominators,
+    natural loops and a call graph built from `jal` and constant `jalr` calls.
+
+    Calls are not CFG edges: a calling block falls through to its return
+    site and the callee is recorded in the call graph instead. `jalr` ends
+    a path (returns and indirect jumps) unless BlockOptimizer resolved its
+    targets; indirect calls fall through like direct ones."""
+
+    def __init__(self, blocks, entry=None, symbols=None):
+        self.blocks = {b["start"]: b for b in blocks}
+        self.order = [b["start"] for b in blocks]
+        self.entry = entry if entry in self.blocks else (self.order[0] if self.order else None)
+        self.succs = {start: [] for start in self.order}
+        self.preds = {start: [] for start in self.order}
+        self.calls = {}
+        self._build_edges()
+        # Symbols that code falls or jumps into are labels, not functions
+        self.functions = set(self.call_targets)
+        self.functions.update(a for a in (symbols or ()) if a in self.blocks and not self.preds[a])
+        if self.entry is not None:
+            self.functions.add(self.entry)
+
+    def _build_edges(self):
+        self.call_targets = set()
+        for start in self.order:
+            self.call_targets.update(t for t in self._call_targets(self.blocks[start]) if t in self.blocks)
+
+        for start in self.order:
+            block = self.blocks[start]
+            last = block["instrs"][-1]
+            next_addr = (last.address + 4) & 0xFFFFFFFF
+            target = (last.address + last.imm) & 0xFFFFFFFF
+            name = last.name
+            if name == "jal":
+                jump = [target]
+            else:
+                jump = block["jump"][1] if "jump" in block else []
+            if name in BRANCHES:
+                succs = [target, next_addr]
+            elif name in ("jal", "jalr") and (last.rd != 0 or self.call_targets.intersection(jump)):
+                # A call, or a tail call when jumping to a called function
+                callees = [t for t in jump if t in self.blocks]
+                if callees:
+                    self.calls[start] = callees
+                succs = [next_addr] if last.rd != 0 else []
+            elif name in ("jal", "jalr"):
+                # Plain jumps, far jumps and switch tables
+                succs = jump
+            else:
+                succs = [next_addr]
+            for succ in succs:
+                if succ in self.blocks and succ not in self.succs[start]:
+                    self.succs[start].append(succ)
+                    self.preds[succ].append(start)
+
+    def _call_targets(self, block):
+        # Callees of a jal with a link register or of a jalr BlockOptimizer resolved
+        last = block["instrs"][-1]
+        if last.rd == 0:
+            return []
+        if last.name == "jal":
+            return [(last.address + last.imm) & 0xFFFFFFFF]
+        if last.name == "jalr" and "jump" in block:
+            return block["jump"][1]
+        return []
+
+    def roots(self):
+        # Function entries plus any block nothing falls or jumps into
+        return [s for s in self.order if s in self.functions or not self.preds[s]]
+
+    def reverse_postorder(self):
+        seen = set()
+        order = []
+        for root in self.roots():
+            if root in seen:
+                continue
+            seen.add(root)
+            stack = [(root, iter(self.succs[root]))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append((child, iter(self.succs[child])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        order.reverse()
+        return order
+
+    def dominators(self):
+        """Immediate dominator of every block (Cooper, Harvey and Kennedy).
+        Roots are dominated by a virtual entry, represented as None."""
+        order = self.reverse_postorder()
+        index = {node: i for i, node in enumerate(order)}
+        roots = set(self.roots())
+        idom = {root: None for root in roots}
+
+        def intersect(a, b):
+            position = lambda n: -1 if n is None else index[n]
+            while a != b:
+                while position(a) > position(b):
+                    a = idom[a]
+                while position(b) > position(a):
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for node in order:
+                if node in roots:
+                    continue
+                new = None
+                first = True
+                for pred in self.preds[node]:
+                    if pred not in idom:
+                        continue
+                    new = pred if first else intersect(pred, new)
+                    first = False
+                if first:
+                    continue
+                if idom.get(node, "unset") != new:
+                    idom[node] = new
+                    changed = True
+        return idom
+
+    def dominates(self, idom, a, b):
+        while b is not None:
+            if a == b:
+                return True
+            b = idom.get(b)
+        return False
+
+    def natural_loops(self):
+        """{header: body} for every back edge n -> h where h dominates n;
+        loops sharing a header are merged."""
+        idom = self.dominators()
+        loops = {}
+        for node in self.order:
+            for succ in self.succs[node]:
+                if node in idom and self.dominates(idom, succ, node):
+                    body = loops.setdefault(succ, {succ})
+                    work = [node]
+                    while work:
+                        n = work.pop()
+                        if n not in body:
+                            body.add(n)
+                            work.extend(self.preds[n])
+        return loops
+
+    def loop_depths(self, loops=None):
+        loops = self.natural_loops() if loops is None else loops
+        depth = {start: 0 for start in self.order}
+        for body in loops.values():
+            for node in body:
+                depth[node] += 1
+        return depth
+
+    def function_blocks(self):
+        # Blocks reachable from each function entry without entering another function
+        members = {}
+        for func in self.functions:
+            body = {func}
+            work = [func]
+            while work:
+                for succ in self.succs[work.pop()]:
+                    if succ not in body and succ not in self.functions:
+                        body.add(succ)
+                        work.append(succ)
+            members[func] = body
+        return members
+
+    def estimate(self):
+        """Static execution frequency of every block: LOOP_SCALE per
+        enclosing loop, times the estimated call count of its function."""
+        loops = self.natural_loops()
+        depth = self.loop_depths(loops)
+        local = {start: float(LOOP_SCALE ** depth[start]) for start in self.order}
+        members = self.function_blocks()
+        owner = {}
+        for func, body in members.items():
+            for block in body:
+                owner.setdefault(block, []).append(func)
+
+        # Call graph edges weighted by how often the call site runs per invocation
+        callees = {func: {} for func in self.functions}
+        for site, targets in self.calls.items():
+            for caller in owner.get(site, ()):
+                for callee in targets:
+                    callees[caller][callee] = callees[caller].get(callee, 0) + local[site]
+
+        # Every function runs at least once; recursion (back edges of the call
+        # graph DFS) is not followed
+        frequency = {func: 1.0 for func in self.functions}
+        order, back_calls = self._call_order(callees)
+        for func in order:
+            for callee, count in callees[func].items():
+                if callee not in back_calls.get(func, ()):
+                    frequency[callee] = min(MAX_FREQUENCY, frequency[callee] + frequency[func] * count)
+
+        estimate = {}
+        for start in self.order:
+            funcs = owner.get(start)
+            scale = sum(frequency[f] for f in funcs) if funcs else 1.0
+            estimate[start] = min(MAX_FREQUENCY, local[start] * scale)
+        self.loops = loops
+        self.depth = depth
+        return estimate
+
+    def _call_order(self, callees):
+        # Callers before callees (reverse postorder of the call graph)
+        seen = set()
+        order = []
+        back_calls = {}
+        for root in sorted(self.functions, key=lambda f: f != self.entry):
+            if root in seen:
+                continue
+            seen.add(root)
+            active = {root}
+            stack = [(root, iter(callees[root]))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child in active:
+                        back_calls.setdefault(node, set()).add(child)
+                    elif child not in seen:
+                        seen.add(child)
+                        active.add(child)
+                        stack.append((child, iter(callees[child])))
+                        break
+                else:
+                    stack.pop()
+                    active.discard(node)
+                    order.append(node)
+        order.reverse()
+        return order, back_calls
@@ -0,0 +1,371 @@
+SCRATCH = ("#op1", "#op2", "#res", "#u1", "#u2", "#imm", "#addr", "#addr_word", "#off", "#old", "#new")
+# Functions that start a new block: scratch values never flow into them
+CONTINUATIONS = ("b_", "i_", "dispatch/", "ras/", "tramp/")
+# Commands that never touch scores
+NO_SCORES = {"data", "tellraw", "say", "title", "particle", "playsound", "setblock", "fill",
+             "summon", "kill", "tag", "gamerule", "forceload", "item", "clone", "tp", "teleport"}
+OPERATIONS = {"=", "+=", "-=", "*=", "/=", "%=", "<", ">", "><"}
+COMMUTATIVE = {"+=", "*=", "<", ">"}
+
+class Command:
+    """One emitted command and its effect on scores.
+
+    `reads`, `must` (always written) and `may` (possibly written) hold
+    (holder, objective) pairs. Function calls are listed in `calls` and
+    resolved by CommandOptimizer. `pure` commands are unconditional
+    `scoreboard players set/add/remove/operation` and nothing else."""
+
+    def __init__(self, text):
+        self.text = text
+        self.reads = set()
+        self.must = set()
+        self.may = set()
+        self.calls = []
+        self.ends = False
+        self.barrier = False
+        self.pure = False
+        self.action = None
+
+    def __repr__(self):
+        return f"Command({self.text!r})"
+
+def parse(line):
+    cmd = Command(line)
+    # Macro lines are modelled unless a $(...) argument names a score
+    macro = line.startswith("$")
+    if not _parse_into(cmd, (line[1:] if macro else line).split()):
+        cmd.barrier = True
+    elif macro and any("$(" in part for score in cmd.reads | cmd.may for part in score):
+        cmd.barrier = True
+    return cmd
+
+def _parse_into(cmd, toks):
+    # False when the command is outside the model
+    if not toks or toks[0].startswith("#"):
+        return True
+    head = toks[0]
+    if head == "scoreboard" and len(toks) >= 5 and toks[1] == "players":
+        action = toks[2]
+        score = (toks[3], toks[4])
+        if action == "set" and len(toks) == 6:
+            cmd.must.add(score)
+            cmd.action = ("set", score, int(toks[5]))
+        elif action in ("add", "remove") and len(toks) == 6:
+            cmd.reads.add(score)
+            cmd.must.add(score)
+            cmd.action = (action, score, int(toks[5]))
+        elif action == "operation" and len(toks) == 8 and toks[5] in OPERATIONS:
+            op, source = toks[5], (toks[6], toks[7])
+            cmd.reads.add(source)
+            if op != "=":
+                cmd.reads.add(score)
+            cmd.must.add(score)
+            if op == "><":
+                cmd.must.add(source)
+            cmd.action = (op, score, source)
+        elif action == "get" and len(toks) == 5:
+            cmd.reads.add(score)
+            return True
+        else:
+            return False
+        cmd.may |= cmd.must
+        cmd.pure = True
+        return True
+    if head == "function" and len(toks) >= 2:
+        cmd.calls.append(toks[1].split(":", 1)[-1])
+        return True
+    if head == "return":
+        cmd.ends = True
+        if len(toks) > 1 and toks[1] == "run":
+            inner = Command(" ".join(toks[2:]))
+            if not _parse_into(inner, toks[2:]):
+                return False
+            _absorb(cmd, inner, conditional=False)
+        return True
+    if head == "execute":
+        return _parse_execute(cmd, toks)
+    return head in NO_SCORES
+
+def _parse_execute(cmd, toks):
+    i = 1
+    conditional = False
+    while i < len(toks) and toks[i] != "run":
+        word = toks[i]
+        if word in ("if", "unless") and i + 1 < len(toks):
+            conditional = True
+            if toks[i + 1] == "score" and i + 4 < len(toks) and toks[i + 4] == "matches":
+                cmd.reads.add((toks[i + 2], toks[i + 3]))
+                i += 6
+            elif toks[i + 1] == "score" and i + 6 < len(toks) and toks[i + 4] in ("=", "<", "<=", ">", ">="):
+                cmd.reads.add((toks[i + 2], toks[i + 3]))
+                cmd.reads.add((toks[i + 5], toks[i + 6]))
+                i += 7
+            elif toks[i + 1] == "data" and toks[i + 2] == "storage":
+                i += 5
+            else:
+                return False
+        elif word == "store" and i + 2 < len(toks):
+            if toks[i + 2] == "score":
+                # Stored into even when a later condition fails: a read for safety
+                cmd.reads.add((toks[i + 3], toks[i + 4]))
+                cmd.may.add((toks[i + 3], toks[i + 4]))
+                i += 5
+            elif toks[i + 2] == "storage":
+                i += 7
+            else:
+                return False
+        else:
+            return False
+    if i < len(toks):
+        inner = Command(" ".join(toks[i + 1:]))
+        if not _parse_into(inner, toks[i + 1:]):
+            return False
+        _absorb(cmd, inner, conditional)
+    return True
+
+def _absorb(cmd, inner, conditional):
+    cmd.reads |= inner.reads
+    cmd.may |= inner.may
+    if not conditional:
+        cmd.must |= inner.must
+    cmd.calls += inner.calls
+    # A conditional return does not end the block
+    if inner.ends and not conditional:
+        cmd.ends = True
+
+class CommandOptimizer:
+    """Peephole passes over the commands of one block function, limited to
+    the scratch scores in SCRATCH (dead at every block boundary):
+
+    - coalescing: `T = X; T op= Y...; R = T` works on R directly when T is
+      dead afterwards and R is not among the Y (or is the only Y of a
+      commutative op)
+    - dead stores: pure writes to scratch scores nobody reads, and copies
+      of a score to itself
+
+    Library functions are summarized from their text (scratch scores they
+    may read before writing, scratch scores they may write). Every rewrite
+    is checked by evaluating both versions symbolically; a block whose
+    rewrite does not match keeps its original commands."""
+
+    def __init__(self, namespace, library):
+        self.temp_obj = f"{namespace}_temp"
+        self.scratch = {(name, self.temp_obj) for name in SCRATCH}
+        self.summaries = {}
+        self._summarize({name: [parse(line) for line in lines if line.strip()] for name, lines in library.items()})
+
+    def _summarize(self, functions):
+        # Least fixpoint: recursive library functions start from nothing
+        for name in functions:
+            self.summaries[name] = (set(), set())
+        changed = True
+        while changed:
+            changed = False
+            for name, commands in functions.items():
+                reads, writes = set(), set()
+                killed = set()
+                for cmd in commands:
+                    cmd_reads, cmd_may = self.effects(cmd)
+                    reads |= cmd_reads - killed
+                    writes |= cmd_may
+                    killed |= cmd.must & self.scratch
+                if (reads, writes) != self.summaries[name]:
+                    self.summaries[name] = (reads, writes)
+                    changed = True
+
+    def effects(self, cmd):
+        # (scratch reads, scratch may-writes) including called functions
+        if cmd.barrier:
+            return set(self.scratch), set(self.scratch)
+        reads = cmd.reads & self.scratch
+        may = cmd.may & self.scratch
+        for name in cmd.calls:
+            if name.startswith(CONTINUATIONS):
+                may = may | self.scratch
+            elif name in self.summaries:
+                reads = reads | self.summaries[name][0]
+                may = may | self.summaries[name][1]
+            else:
+                return set(self.scratch), set(self.scratch)
+        return reads, may
+
+    def optimize(self, lines):
+        """(lines, commands saved), or the original lines and None when the
+        rewrite fails the equivalence check."""
+        original = [parse(line) for line in lines]
+        commands = self._coalesce(list(original))
+        commands = self._dead_stores(commands)
+        if len(commands) == len(original):
+            return lines, 0
+        table = {}
+        if self.evaluate(original, table) != self.evaluate(commands, table):
+            return lines, None
+        return [cmd.text for cmd in commands], len(original) - len(commands)
+
+    def _live_after(self, commands):
+        # Scratch scores live after each command; nothing is live at the end
+        live = set()
+        result = [None] * len(commands)
+        for i in range(len(commands) - 1, -1, -1):
+            cmd = commands[i]
+            result[i] = live
+            reads, _ = self.effects(cmd)
+            if cmd.ends:
+                live = set()
+            live = (live - cmd.must) | reads
+        return result
+
+    def _coalesce(self, commands):
+        i = 0
+        while i < len(commands):
+            rewrite = self._coalesce_at(commands, i)
+            if rewrite:
+                end, replacement = rewrite
+                commands[i:end + 1] = replacement
+            i += 1
+        return commands
+
+    def _coalesce_at(self, commands, i):
+        first = commands[i]
+        if not first.pure or first.action[0] not in ("set", "=") or first.action[1] not in self.scratch:
+            return None
+        temp = first.action[1]
+        if first.action[0] == "=" and first.action[2] == temp:
+            return None
+        updates = []
+        k = i + 1
+        while k < len(commands):
+            cmd = commands[k]
+            if not cmd.pure or cmd.action[1] != temp:
+                break
+            op = cmd.action[0]
+            if op in ("=", "set", "><") or (op not in ("add", "remove") and cmd.action[2] == temp):
+                break
+            updates.append(cmd)
+            k += 1
+        if k == len(commands):
+            return None
+        copy = commands[k]
+        if not copy.pure or copy.action[0] != "=" or copy.action[2] != temp or copy.action[1] == temp:
+            return None
+        target = copy.action[1]
+        if temp in self._live_after(commands)[k]:
+            return None
+        holder, objective = target
+        if (len(updates) == 1 and first.action[0] == "=" and updates[0].action[0] in COMMUTATIVE
+                and updates[0].action[2] == target):
+            # T = X; T += R; R = T is R += X
+            source = first.action[2]
+            return k, [parse(f"scoreboard players operation {holder} {objective} {updates[0].action[0]} {source[0]} {source[1]}")]
+        if any(u.action[0] not in ("add", "remove") and u.action[2] == target for u in updates):
+            return None
+        replacement = []
+        if first.action[0] == "set":
+            replacement.append(parse(f"scoreboard players set {holder} {objective} {first.action[2]}"))
+        elif first.action[2] != target:
+            replacement.append(parse(f"scoreboard players operation {holder} {objective} = {first.action[2][0]} {first.action[2][1]}"))
+        for u in updates:
+            if u.action[0] in ("add", "remove"):
+                replacement.append(parse(f"scoreboard players {u.action[0]} {holder} {objective} {u.action[2]}"))
+            else:
+                replacement.append(parse(f"scoreboard players operation {holder} {objective} {u.action[0]} {u.action[2][0]} {u.action[2][1]}"))
+        return k, replacement
+
+    def _dead_stores(self, commands):
+        changed = True
+        while changed:
+            changed = False
+            live = self._live_after(commands)
+            kept = []
+            for cmd, after in zip(commands, live):
+                if cmd.pure and cmd.action[0] == "=" and cmd.action[1] == cmd.action[2]:
+                    changed = True
+                    continue
+                if cmd.pure and cmd.must <= self.scratch and not (cmd.must & after):
+                    changed = True
+                    continue
+                kept.append(cmd)
+            commands = kept
+        return commands
+
+    def evaluate(self, commands, table):
+        """Symbolic run: the inputs every non-pure command sees (all
+        non-scratch scores touched so far and the scratch scores it reads)
+        and the final non-scratch scores. Two command lists with equal
+        results over the same node `table` behave the same."""
+        def node(*key):
+            return table.setdefault(key, len(table))
+
+        epoch = 0
+        state = {}
+        def value_in(score):
+            return node("in", score, 0 if score in self.scratch else epoch)
+
+        def value(score):
+            if score in state:
+                return state[score]
+            return value_in(score)
+
+        def changed(score, v):
+            # Scores still holding their own input (e.g. after `x = x`) count as untouched
+            return score not in self.scratch and v != value_in(score)
+
+        events = []
+        for n, cmd in enumerate(commands):
+            if cmd.pure:
+                kind, score, arg = cmd.action
+                if kind == "set":
+                    state[score] = node("const", arg)
+                elif kind in ("add", "remove"):
+                    state[score] = node(kind, value(score), arg)
+                elif kind == "=":
+                    state[score] = value(arg)
+                elif kind == "><":
+                    state[score], state[arg] = value(arg), value(score)
+                elif kind in COMMUTATIVE:
+                    state[score] = node(kind, *sorted((value(score), value(arg))))
+                else:
+                    state[score] = node(kind, value(score), value(arg))
+                continue
+            reads, may = self.effects(cmd)
+            seen = {s: v for s, v in state.items() if changed(s, v)}
+            seen.update((s, value(s)) for s in reads)
+            seen.update((s, value(s)) for s in cmd.reads)
+            events.append((cmd.text, tuple(sorted(seen.items()))))
+            # Anything the command may change gets a fresh value
+            epoch += 1
+            for s in list(state):
+                if s not in self.scratch or s in may:
+                    del state[s]
+            for s in may | cmd.may:
+                state[s] = node("after", len(events), s)
+            if cmd.ends:
+                break
+        final = tuple(sorted((s, v) for s, v in state.items() if changed(s, v)))
+        return events, final
+
+if __name__ == "__main__":
+    # Regression checks: (lines, expected lines or None when nothing may change)
+    op = lambda a, o, b: f"scoreboard players operation {a} {o} {b}"
+    cases = [
+        # A self-copy is dropped along with the coalesced #op1
+        ([op("x5 rv32_reg", "=", "x5 rv32_reg"), op("#op1 rv32_temp", "=", "x1 rv32_reg"),
+          op("#op1 rv32_temp", "+=", "x2 rv32_reg"), op("x3 rv32_reg", "=", "#op1 rv32_temp")],
+         [op("x3 rv32_reg", "=", "x1 rv32_reg"), op("x3 rv32_reg", "+=", "x2 rv32_reg")]),
+        # T = X; T += R; R = T is R += X
+        ([op("#op1 rv32_temp", "=", "x1 rv32_reg"), op("#op1 rv32_temp", "+=", "x3 rv32_reg"),
+          op("x3 rv32_reg", "=", "#op1 rv32_temp")],
+         [op("x3 rv32_reg", "+=", "x1 rv32_reg")]),
+        # R is read as a non-commutative operand: no rewrite
+        ([op("#op1 rv32_temp", "=", "x1 rv32_reg"), op("#op1 rv32_temp", "-=", "x3 rv32_reg"),
+          op("x3 rv32_reg", "=", "#op1 rv32_temp")], None),
+    ]
+    optimizer = CommandOptimizer("rv32", {})
+    failures = 0
+    for lines, expected in cases:
+        got, saved = optimizer.optimize(lines)
+        if saved is None or got != (expected or lines):
+            failures += 1
+            print(f"  MISMATCH: {lines} -> {got} (saved {saved})")
+    print(f"{len(cases) - failures}/{len(cases)} peephole checks passed")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,125 @@
+MASK = 0xFFFFFFFF
+INT_MIN = -2147483648
+
+def s32(value):
+    value &= MASK
+    return value - 0x100000000 if value & 0x80000000 else value
+
+def _compute(name, a, b):
+    # 32-bit RISC-V semantics on signed operands; None when `name` is not foldable
+    ua, ub = a & MASK, b & MASK
+    if name in ("add", "addi"): return a + b
+    if name == "sub": return a - b
+    if name in ("and", "andi"): return a & b
+    if name in ("or", "ori"): return a | b
+    if name in ("xor", "xori"): return a ^ b
+    if name in ("sll", "slli"): return ua << (ub & 31)
+    if name in ("srl", "srli"): return ua >> (ub & 31)
+    if name in ("sra", "srai"): return a >> (ub & 31)
+    if name in ("slt", "slti"): return int(a < b)
+    if name in ("sltu", "sltiu"): return int(ua < ub)
+    if name == "mul": return a * b
+    if name == "mulh": return (a * b) >> 32
+    if name == "mulhsu": return (a * ub) >> 32
+    if name == "mulhu": return (ua * ub) >> 32
+    if name == "div":
+        if b == 0: return -1
+        if a == INT_MIN and b == -1: return INT_MIN
+        return abs(a) // abs(b) * (1 if (a < 0) == (b < 0) else -1)
+    if name == "divu": return ua // ub if ub else MASK
+    if name == "rem":
+        if b == 0: return a
+        if a == INT_MIN and b == -1: return 0
+        return abs(a) % abs(b) * (1 if a >= 0 else -1)
+    if name == "remu": return ua % ub if ub else ua
+    return None
+
+REG_OPS = {"add", "sub", "and", "or", "xor", "sll", "srl", "sra", "slt", "sltu",
+           "mul", "mulh", "mulhsu", "mulhu", "div", "divu", "rem", "remu"}
+IMM_OPS = {"addi", "andi", "ori", "xori", "slli", "srli", "srai", "slti", "sltiu"}
+BRANCH_TESTS = {
+    "beq": lambda a, b: a == b, "bne": lambda a, b: a != b,
+    "blt": lambda a, b: a < b, "bge": lambda a, b: a >= b,
+    "bltu": lambda a, b: a & MASK < b & MASK, "bgeu": lambda a, b: a & MASK >= b & MASK,
+}
+
+class ConstantFolder:
+    """Registers with a value known at build time while emitting one block
+    (and its trace). Known results are still written to their register, so
+    every later command sees the same state as without folding."""
+
+    def __init__(self, namespace):
+        self.reg_obj = f"{namespace}_reg"
+        self.const_obj = f"{namespace}_const"
+        self.known = {0: 0}
+
+    def fold(self, instr):
+        """Commands for `instr` from its known operands, or None to convert
+        it as usual. Updates the known registers either way."""
+        name = instr.name
+        a = self.known.get(instr.rs1)
+        if name in REG_OPS:
+            b = self.known.get(instr.rs2)
+        elif name in IMM_OPS:
+            b = instr.imm
+        elif name == "lui":
+            a, b, name = 0, instr.imm, "add"
+        elif name == "auipc":
+            a, b, name = instr.address, instr.imm, "add"
+        elif name in ("jal", "jalr"):
+            self._set(instr.rd, instr.address + 4)
+            return None
+        elif name in ("ecall", "ebreak"):
+            # System calls may write any register (x10 at least)
+            self.known = {0: 0}
+            return None
+        else:
+            # Only loads write rd; stores and branches leave the registers alone
+            if name not in ("sb", "sh", "sw") and name not in BRANCH_TESTS:
+                self._forget(instr.rd)
+            return None
+        if a is not None and b is not None:
+            value = self._set(instr.rd, _compute(name, a, b))
+            return [f"scoreboard players set x{instr.rd} {self.reg_obj} {value}"] if instr.rd else []
+        self._forget(instr.rd)
+        return self._partial(instr, a)
+
+    def _partial(self, instr, a):
+        # One known operand of add/sub: copy the other and add a literal
+        rd = f"x{instr.rd}"
+        if not instr.rd or instr.name not in ("add", "sub"):
+            return None
+        b = self.known.get(instr.rs2)
+        if b is not None:
+            other, literal = instr.rs1, b if instr.name == "add" else -b
+        elif a is not None and instr.name == "add":
+            other, literal = instr.rs2, a
+        else:
+            return None
+        cmds = [f"scoreboard players operation {rd} {self.reg_obj} = x{other} {self.reg_obj}"] if other != instr.rd else []
+        literal = s32(literal)
+        if literal == INT_MIN:
+            cmds.append(f"scoreboard players operation {rd} {self.reg_obj} += #min_int {self.const_obj}")
+        elif literal > 0:
+            cmds.append(f"scoreboard players add {rd} {self.reg_obj} {literal}")
+        elif literal < 0:
+            cmds.append(f"scoreboard players remove {rd} {self.reg_obj} {-literal}")
+        return cmds
+
+    def branch(self, instr):
+        # True/False when both operands are known, else None
+        a = self.known.get(instr.rs1)
+        b = self.known.get(instr.rs2)
+        if a is None or b is None:
+            return None
+        return BRANCH_TESTS[instr.name](a, b)
+
+    def _forget(self, reg):
+        if reg:
+            self.known.pop(reg, None)
+
+    def _set(self, reg, value):
+        value = s32(value)
+        if reg:
+            self.known[reg] = value
+        return value
@@ -1,17 +1,64 @@
+import gc
 import struct
-from instructions import Instruction, InstructionType
+from instructions import Instruction, InstructionTable, InstructionType
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def sign_extend(value, bits):
     sign_bit = 1 << (bits - 1)
     return (value & (sign_bit - 1)) - (value & sign_bit)
 
+# Opcodes whose name and type depend only on the opcode/funct3/funct7 fields.
+# The vectorized path builds its lookup table by running decode_word over
+# every combination of those fields, so both paths always agree on names.
+TABLE_OPCODES = [0x37, 0x17, 0x6F, 0x67, 0x63, 0x03, 0x23, 0x13, 0x33, 0x2F]
+RD_OPCODES = [0x37, 0x17, 0x6F, 0x67, 0x03, 0x13, 0x33, 0x2F]
+RS1_OPCODES = [0x67, 0x63, 0x03, 0x23, 0x13, 0x33, 0x2F]
+RS2_OPCODES = [0x63, 0x23, 0x33, 0x2F]
+
+_lookup_cache = None
+
+def _build_lookup():
+    global _lookup_cache
+    if _lookup_cache is not None:
+        return _lookup_cache
+
+    scalar = Decoder(b"")
+    kinds = [("unknown", InstructionType.R_TYPE)]
+    kind_ids = {kinds[0]: 0}
+    table = np.zeros(1 << 17, dtype=np.int32)
+    for opcode in TABLE_OPCODES:
+        for funct3 in range(8):
+            for funct7 in range(128):
+                instr = scalar.decode_word(0, opcode | (funct3 << 12) | (funct7 << 25))
+                kind = (instr.name, instr.type)
+                if kind not in kind_ids:
+                    kind_ids[kind] = len(kinds)
+                    kinds.append(kind)
+                table[opcode | (funct3 << 7) | (funct7 << 10)] = kind_ids[kind]
+
+    for name in ["ecall", "ebreak"]:
+        kind_ids[(name, InstructionType.I_TYPE)] = len(kinds)
+        kinds.append((name, InstructionType.I_TYPE))
+
+    _lookup_cache = (table, kinds, kind_ids)
+    return _lookup_cache
+
 class Decoder:
     def __init__(self, binary_data, start_address=0):
         self.data = binary_data
         self.current_address = start_address
         self.instructions = []
 
-    def decode_all(self):
+    def decode_all(self, vectorized=None):
+        if vectorized is None:
+            vectorized = np is not None
+        if vectorized:
+            return self.decode_all_vectorized()
+
         offset = 0
         while offset < len(self.data):
             if offset + 4 > len(self.data):
@@ -23,6 +70,83 @@ class Decoder:
             offset += 4
         return self.instructions
 
+    def decode_all_vectorized(self):
+        addresses, kind, rd, rs1, rs2, imm, _, kinds = self._decode_arrays()
+
+        # Building ~1M small objects back to back keeps triggering the cyclic GC,
+        # none of which can be garbage yet, so pause it for the bulk append.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for address, k, r_d, r_s1, r_s2, value in zip(addresses.tolist(), kind.tolist(), rd.tolist(), rs1.tolist(), rs2.tolist(), imm.tolist()):
+                name, itype = kinds[k]
+                self.instructions.append(Instruction(address, name, itype, rd=r_d, rs1=r_s1, rs2=r_s2, imm=value))
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return self.instructions
+
+    def decode_table(self, vectorized=None):
+        if vectorized is None:
+            vectorized = np is not None
+
+        table = InstructionTable()
+        if not vectorized:
+            for offset in range(0, len(self.data) - 3, 4):
+                word = struct.unpack_from('<I', self.data, offset)[0]
+                table.append(self.decode_word(self.current_address + offset, word), word)
+            return table
+
+        addresses, kind, rd, rs1, rs2, imm, words, kinds = self._decode_arrays()
+        for name, itype in kinds:
+            table.kind_id(name, itype)
+        table.kind.frombytes(kind.astype(np.uint16).tobytes())
+        table.address.frombytes((addresses & 0xFFFFFFFF).astype(np.uint32).tobytes())
+        table.word.frombytes(words.astype(np.uint32).tobytes())
+        table.rd.frombytes(rd.astype(np.uint8).tobytes())
+        table.rs1.frombytes(rs1.astype(np.uint8).tobytes())
+        table.rs2.frombytes(rs2.astype(np.uint8).tobytes())
+        table.imm.frombytes(imm.astype(np.int64).tobytes())
+        return table
+
+    def _decode_arrays(self):
+        if np is None:
+            raise ImportError("numpy is required for vectorized decoding")
+
+        table, kinds, kind_ids = _build_lookup()
+        count = len(self.data) // 4
+        words = np.frombuffer(self.data, dtype='<u4', count=count).astype(np.int64)
+
+        opcode = words & 0x7F
+        rd = (words >> 7) & 0x1F
+        funct3 = (words >> 12) & 0x07
+        rs1 = (words >> 15) & 0x1F
+        rs2 = (words >> 20) & 0x1F
+        funct7 = (words >> 25) & 0x7F
+
+        imm_i = sign_extend((words >> 20) & 0xFFF, 12)
+        imm_s = sign_extend(((words >> 25) << 5) | ((words >> 7) & 0x1F), 12)
+        imm_b = sign_extend(((words >> 31) << 12) | ((words & 0x7E000000) >> 20) | ((words & 0xF00) >> 7) | ((words & 0x80) << 4), 13)
+        imm_u = words & 0xFFFFF000
+        imm_j = sign_extend(((words >> 31) << 20) | (words & 0xFF000) | ((words & 0x100000) >> 9) | ((words & 0x7FE00000) >> 20), 21)
+
+        kind = table[opcode | (funct3 << 7) | (funct7 << 10)]
+        kind[words == 0x00000073] = kind_ids[("ecall", InstructionType.I_TYPE)]
+        kind[words == 0x00100073] = kind_ids[("ebreak", InstructionType.I_TYPE)]
+
+        rd = np.where(np.isin(opcode, RD_OPCODES), rd, 0)
+        rs1 = np.where(np.isin(opcode, RS1_OPCODES), rs1, 0)
+        is_shift = (opcode == 0x13) & ((funct3 == 1) | (funct3 == 5))
+        imm = np.select(
+            [(opcode == 0x37) | (opcode == 0x17), opcode == 0x6F, is_shift,
+             np.isin(opcode, [0x67, 0x03, 0x13]), opcode == 0x63, opcode == 0x23],
+            [imm_u, imm_j, rs2, imm_i, imm_b, imm_s],
+            0
+        )
+        rs2 = np.where(np.isin(opcode, RS2_OPCODES), rs2, 0)
+        addresses = self.current_address + 4 * np.arange(count, dtype=np.int64)
+        return addresses, kind, rd, rs1, rs2, imm, words, kinds
+
     def decode_word(self, address, word):
         opcode = word & 0x7F
         rd = (word >> 7) & 0x1F
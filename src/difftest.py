@@ -0,0 +1,99 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from array import array
+from dispatcher import DISPATCH_MODES
+from emitter import DRIVERS
+from interpreter import GuestRunner
+from simulator import Simulator, SimulatorError, load_program
+
+MAX_REPORTED = 10
+
+def build(input_file, output_dir, main_args):
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    subprocess.run([sys.executable, main_py, input_file, output_dir] + main_args, check=True, stdout=subprocess.DEVNULL)
+
+def compare(runner, sim, namespace="rv32"):
+    """Differences between a datapack run and the reference simulator,
+    both stopped after the same number of guest instructions."""
+    vm = runner.vm
+    problems = []
+
+    guest_output = [line for line in vm.output if not line.startswith("[MC-RVVM]")]
+    for i, (got, want) in enumerate(zip(guest_output, sim.output)):
+        if got != want:
+            problems.append(f"output line {i}: datapack printed {got!r}, simulator {want!r}")
+            break
+    if len(guest_output) != len(sim.output):
+        problems.append(f"datapack printed {len(guest_output)} lines, simulator {len(sim.output)}")
+
+    if runner.halted() != sim.halted:
+        problems.append(f"datapack halted: {runner.halted()}, simulator halted: {sim.halted}")
+    if vm.guest_instructions != sim.instructions:
+        problems.append(f"datapack ran {vm.guest_instructions} instructions, simulator {sim.instructions}")
+
+    pc = vm.score("pc", f"{namespace}_pc")
+    if pc is not None and pc & 0xFFFFFFFF != sim.pc:
+        problems.append(f"pc: datapack {hex(pc & 0xFFFFFFFF)}, simulator {hex(sim.pc)}")
+    for i, want in enumerate(sim.registers()[1:], 1):
+        got = vm.score(f"x{i}", f"{namespace}_reg")
+        if got != want:
+            problems.append(f"x{i}: datapack {got}, simulator {want}")
+
+    ram = vm.root(f"{namespace}:ram").get("data", [])
+    words = array('i', bytes(sim.ram))
+    diffs = [i for i in range(min(len(ram), len(words))) if ram[i] != words[i]]
+    for i in diffs[:MAX_REPORTED]:
+        problems.append(f"memory {hex(i * 4)}: datapack {ram[i] & 0xFFFFFFFF:#010x}, simulator {words[i] & 0xFFFFFFFF:#010x}")
+    if len(diffs) > MAX_REPORTED:
+        problems.append(f"... {len(diffs) - MAX_REPORTED} more differing memory words")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential test of the transpiler against the reference simulator")
+    parser.add_argument("input_file", help="Path to the RV32 ELF executable or flat binary file (.bin)")
+    parser.add_argument("--map_file", help="Path to linker map file (.map), passed to main.py and the simulator")
+    parser.add_argument("--ticks", type=int, default=1000, help="Maximum number of datapack ticks to run")
+    parser.add_argument("--namespace", default="rv32", help="Datapack namespace")
+    parser.add_argument("--datapack", help="Build the datapack here and keep it (default: a temporary directory)")
+    parser.add_argument("--optimize", "-O", action="store_true", help="Build with block optimization")
+    parser.add_argument("--reachable", action="store_true", help="Build with the reachability pass")
+    parser.add_argument("--ras", action="store_true", help="Build with the return-address stack")
+    parser.add_argument("--dispatch", choices=DISPATCH_MODES, help="Dispatch tree shape passed to main.py")
+    parser.add_argument("--driver", choices=DRIVERS, help="Block driver passed to main.py")
+    args = parser.parse_args()
+
+    main_args = ["--namespace", args.namespace]
+    if args.optimize: main_args.append("-O")
+    if args.reachable: main_args.append("--reachable")
+    if args.ras: main_args.append("--ras")
+    if args.dispatch: main_args += ["--dispatch", args.dispatch]
+    if args.driver: main_args += ["--driver", args.driver]
+    if args.map_file:
+        main_args += ["--map_file", args.map_file]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = args.datapack or os.path.join(tmp, "datapack")
+        print(f"Building {args.input_file} {' '.join(main_args)}...", flush=True)
+        build(args.input_file, output_dir, main_args)
+        runner = GuestRunner(output_dir, args.namespace, echo=False)
+        report = runner.run(args.ticks)
+
+    sim = Simulator(*load_program(args.input_file, args.map_file))
+    try:
+        sim.run(runner.vm.guest_instructions)
+    except SimulatorError as e:
+        print(f"Simulator stopped: {e}")
+
+    print(f"Datapack: {report['ticks']} ticks, {runner.vm.guest_instructions} instructions{' (halted)' if report['halted'] else ''}")
+    problems = compare(runner, sim, args.namespace)
+    for problem in problems:
+        print(f"  MISMATCH {problem}")
+    if problems:
+        raise SystemExit(1)
+    print("Datapack matches the simulator.")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,43 @@
-import os
+from bisect import bisect_left
+from itertools import accumulate
+from multiprocessing import Pool
+from writer import open_writer
+
+DISPATCH_MODES = ["bst", "weighted", "page"]
+DEFAULT_WAYS = 4
+DEFAULT_PAGE_SIZE = 256
 
 class DispatcherGenerator:
-    def __init__(self, instructions, output_dir, namespace="rv32"):
+    """Search tree of `matches` range checks over the dispatch targets, with
+    up to `ways` checks per node file.
+
+    "bst" cuts every node into equally sized address ranges; "weighted" cuts
+    at the weight quantiles (a weight-balanced search tree), which keeps hot
+    targets near the root. Within a node the heaviest range is checked
+    first, and a range holding a single target calls its function directly.
+
+    "page" jumps straight to the tree of the pc's `page_size`-byte page
+    through a macro call on pc / page_size; the page trees are split by
+    weight like "weighted"."""
+
+    def __init__(self, instructions, writer, namespace="rv32", mode="bst", instrument=False, ways=DEFAULT_WAYS, page_size=DEFAULT_PAGE_SIZE):
         self.instructions = sorted(instructions, key=lambda x: x.address)
-        self.output_dir = output_dir
+        self.writer = open_writer(writer) if isinstance(writer, str) else writer
         self.namespace = namespace
+        self.mode = mode
+        self.instrument = instrument
+        if ways < 2:
+            raise ValueError(f"dispatch tree needs at least 2 ways per node, got {ways}")
+        self.ways = ways
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError(f"page size must be a power of two, got {page_size}")
+        self.page_size = page_size
+        self.worst_commands = 0
 
-    def generate(self, weights=None, block_starts=None):
+    def generate(self, weights=None, block_starts=None, jobs=1):
         self.weights = weights if weights else {}
         self.block_starts = block_starts if block_starts else set()
+        self.prefix = "b" if self.block_starts else "i"
         
         if self.block_starts:
             addresses = sorted(list(self.block_starts))
@@ -18,12 +47,51 @@ class DispatcherGenerator:
         if not addresses:
             return 0
 
-        root_path = os.path.join(self.output_dir, "root.mcfunction")
-        with open(root_path, 'w') as f:
+        self.addresses = addresses
+        if self.mode == "page":
+            return self._generate_pages(addresses, jobs)
+
+        with self.writer.open("root.mcfunction") as f:
             f.write(f"scoreboard players operation #current_pc {self.namespace}_temp = pc {self.namespace}_pc\n")
             f.write(f"function {self.namespace}:dispatch/tree_root\n")
 
-        return self._build_tree(addresses, "tree_root")
+        if jobs > 1 and len(addresses) > jobs:
+            depth, commands = self._build_tree_parallel(addresses, jobs)
+        else:
+            depth, commands = self._build_tree(addresses, "tree_root")
+        # Plus the two commands of dispatch/root
+        self.worst_commands = commands + 2
+        return depth
+
+    def _pages(self, addresses):
+        pages = {}
+        for addr in addresses:
+            pages.setdefault(addr // self.page_size, []).append(addr)
+        return pages
+
+    def _generate_pages(self, addresses, jobs):
+        ns = self.namespace
+        # A power-of-two scale is exact in decimal, and storing to an int
+        # truncates, so this stores pc / page_size without a division
+        shift = self.page_size.bit_length() - 1
+        with self.writer.open("root.mcfunction") as f:
+            f.write(f"scoreboard players operation #current_pc {ns}_temp = pc {ns}_pc\n")
+            f.write(f"execute store result storage {ns}:io page int {1 / self.page_size:.{shift}f} run scoreboard players get #current_pc {ns}_temp\n")
+            f.write(f"function {ns}:dispatch/page with storage {ns}:io\n")
+        with self.writer.open("page.mcfunction") as f:
+            f.write(f"$return run function {ns}:dispatch/page_$(page)\n")
+
+        pages = self._pages(addresses)
+        if jobs > 1 and len(addresses) > jobs:
+            subtree_size = max(1, len(addresses) // (jobs * 8))
+            with Pool(jobs) as pool:
+                shapes = [self._build_tree(addrs, f"page_{page}", pool, subtree_size) for page, addrs in pages.items()]
+                shapes = [self._resolve(shape) for shape in shapes]
+        else:
+            shapes = [self._build_tree(addrs, f"page_{page}") for page, addrs in pages.items()]
+        # dispatch/page is one more level; it and dispatch/root run four commands
+        self.worst_commands = max(commands for _, commands in shapes) + 4
+        return max(depth for depth, _ in shapes) + 1
 
     def _get_weight(self, addr):
         return self.weights.get(addr, 1)
@@ -31,36 +99,153 @@ class DispatcherGenerator:
     def _sum_weight(self, addresses):
         return sum(self._get_weight(a) for a in addresses)
 
-    def _build_tree(self, addresses, func_name):
-        file_path = os.path.join(self.output_dir, f"{func_name}.mcfunction")
-        
-        with open(file_path, 'w') as f:
+    def _partition(self, addresses):
+        # Contiguous groups of addresses, one range check each
+        ways = min(self.ways, len(addresses))
+        if self.mode == "bst":
+            bounds = [len(addresses) * i // ways for i in range(ways + 1)]
+        else:
+            prefix = list(accumulate(self._get_weight(a) for a in addresses))
+            below = lambda k: prefix[k - 1] if k else 0
+            bounds = [0]
+            for i in range(1, ways):
+                # Cut closest to the i-th weight quantile, keeping every group non-empty
+                target = prefix[-1] * i / ways
+                mid = bisect_left(prefix, target)
+                cut = min((mid, mid + 1), key=lambda k: abs(below(k) - target))
+                bounds.append(max(bounds[-1] + 1, min(cut, len(addresses) - (ways - i))))
+            bounds.append(len(addresses))
+        return [addresses[a:b] for a, b in zip(bounds, bounds[1:])]
+
+    def _checks(self, addresses):
+        # (child index, group) in the order the node checks them, heaviest first
+        groups = list(enumerate(self._partition(addresses)))
+        return sorted(groups, key=lambda g: -self._sum_weight(g[1]))
+
+    def _inline(self, group):
+        # Instrumented leaves need a second command, so they keep their own file
+        return len(group) == 1 and not self.instrument
+
+    def stats(self, addresses=None):
+        """Expected (weight-averaged) and worst-case depth in node files and
+        the expected number of commands dispatch/root runs to reach a target."""
+        addresses = self.addresses if addresses is None else addresses
+        total = self._sum_weight(addresses)
+        leaf = 2 if self.instrument else 1
+        depth_sum = commands_sum = worst = 0
+        if self.mode == "page":
+            # dispatch/root and dispatch/page lead into the page trees
+            work = [(addrs, 2, 4) for addrs in self._pages(addresses).values()]
+        else:
+            work = [(addresses, 1, 2)]
+        while work:
+            addrs, depth, commands = work.pop()
+            if len(addrs) == 1:
+                weight = self._get_weight(addrs[0])
+                depth_sum += weight * depth
+                commands_sum += weight * (commands + leaf)
+                worst = max(worst, depth)
+                continue
+            for position, (_, group) in enumerate(self._checks(addrs), 1):
+                if self._inline(group):
+                    weight = self._get_weight(group[0])
+                    depth_sum += weight * depth
+                    commands_sum += weight * (commands + position)
+                    worst = max(worst, depth)
+                else:
+                    work.append((group, depth + 1, commands + position))
+        return {"expected_depth": depth_sum / total if total else 0, "worst_depth": worst,
+                "expected_commands": commands_sum / total if total else 0,
+                "worst_commands": self.worst_commands}
+
+    def _build_tree_parallel(self, addresses, jobs):
+        # The top of the tree is written here; every subtree below
+        # `subtree_size` addresses is built by a worker. Node files never
+        # depend on their children, so the result matches the serial build.
+        subtree_size = max(1, len(addresses) // (jobs * 8))
+        with Pool(jobs) as pool:
+            shape = self._build_tree(addresses, "tree_root", pool, subtree_size)
+            return self._resolve(shape)
+
+    def _resolve(self, shape):
+        # (depth, worst commands), a pending worker result, or a node's
+        # [(check position, child shape)] list
+        if isinstance(shape, tuple):
+            return shape
+        if isinstance(shape, list):
+            return self._combine([(position, self._resolve(child)) for position, child in shape])
+        shape, result = shape.get()
+        self.writer.merge(result)
+        return shape
+
+    def _combine(self, children):
+        return (1 + max(depth for _, (depth, _) in children),
+                max(position + commands for position, (_, commands) in children))
+
+    def _write_checks(self, f, addresses, func_name):
+        # One node's range checks; returns (position, group, child name) with
+        # no group for targets called directly
+        pending = []
+        for position, (index, group) in enumerate(self._checks(addresses), 1):
+            check = f"execute if score #current_pc {self.namespace}_temp matches"
+            if self._inline(group):
+                f.write(f"{check} {group[0]} run return run function {self.namespace}:{self.prefix}_{hex(group[0])[2:]}\n")
+                pending.append((position, None, None))
+            else:
+                child_name = f"{func_name}_{index}"
+                f.write(f"{check} {group[0]}..{group[-1]} run return run function {self.namespace}:dispatch/{child_name}\n")
+                pending.append((position, group, child_name))
+        return pending
+
+    def generate_tables(self, tables):
+        """Local dispatch for indirect jumps with known targets ({jalr
+        address: targets}): dispatch/jt_<addr> checks only those targets and
+        falls back to dispatch/root."""
+        for addr, targets in sorted(tables.items()):
+            self._build_table(targets, f"jt_{hex(addr)[2:]}", top=True)
+
+    def _build_table(self, addresses, func_name, top=False):
+        # Targets may come from writable data, so a pc inside a node's range
+        # need not be one of them: every node ends in the fallback
+        with self.writer.open(f"{func_name}.mcfunction") as f:
+            if top:
+                f.write(f"scoreboard players operation #current_pc {self.namespace}_temp = pc {self.namespace}_pc\n")
+            pending = self._write_checks(f, addresses, func_name)
+            f.write(f"function {self.namespace}:dispatch/root\n")
+        for _, group, child_name in pending:
+            if group is None:
+                continue
+            # A single-target child is only entered on an exact match
+            if len(group) == 1:
+                self._build_tree(group, child_name)
+            else:
+                self._build_table(group, child_name)
+
+    def _build_tree(self, addresses, func_name, pool=None, subtree_size=0):
+        if pool is not None and len(addresses) <= subtree_size:
+            weights = {a: self.weights[a] for a in addresses if a in self.weights}
+            return pool.apply_async(_build_subtree, (self.writer.for_worker(), self.namespace, self.prefix, weights, addresses, func_name, self.mode, self.instrument, self.ways))
+
+        with self.writer.open(f"{func_name}.mcfunction") as f:
             if len(addresses) == 1:
                 addr = addresses[0]
-                prefix = "b" if self.block_starts else "i"
-                f.write(f"function {self.namespace}:{prefix}_{hex(addr)[2:]}\n")
-                return 1
+                if self.instrument:
+                    f.write(f"scoreboard players add d_{hex(addr)[2:]} {self.namespace}_prof 1\n")
+                f.write(f"function {self.namespace}:{self.prefix}_{hex(addr)[2:]}\n")
+                return 1, (2 if self.instrument else 1)
 
-            mid = len(addresses) // 2
-            left = addresses[:mid]
-            right = addresses[mid:]
-            
-            min_left, max_left = left[0], left[-1]
-            min_right, max_right = right[0], right[-1]
+            pending = self._write_checks(f, addresses, func_name)
 
-            left_name = f"{func_name}_0"
-            right_name = f"{func_name}_1"
-            
-            weight_left = self._sum_weight(left)
-            weight_right = self._sum_weight(right)
-            
-            if weight_right > weight_left:
-                f.write(f"execute if score #current_pc {self.namespace}_temp matches {min_right}..{max_right} run return run function {self.namespace}:dispatch/{right_name}\n")
-                f.write(f"execute if score #current_pc {self.namespace}_temp matches {min_left}..{max_left} run return run function {self.namespace}:dispatch/{left_name}\n")
-            else:
-                f.write(f"execute if score #current_pc {self.namespace}_temp matches {min_left}..{max_left} run return run function {self.namespace}:dispatch/{left_name}\n")
-                f.write(f"execute if score #current_pc {self.namespace}_temp matches {min_right}..{max_right} run return run function {self.namespace}:dispatch/{right_name}\n")
+        children = []
+        for position, group, child_name in pending:
+            shape = (0, 0) if group is None else self._build_tree(group, child_name, pool, subtree_size)
+            children.append((position, shape))
+        if pool is not None:
+            return children
+        return self._combine(children)
 
-            left_depth = self._build_tree(left, left_name)
-            right_depth = self._build_tree(right, right_name)
-            return 1 + max(left_depth, right_depth)
+def _build_subtree(writer, namespace, prefix, weights, addresses, func_name, mode, instrument, ways):
+    generator = DispatcherGenerator([], writer, namespace, mode, instrument, ways)
+    generator.weights = weights
+    generator.prefix = prefix
+    return generator._build_tree(addresses, func_name), writer.result()
@@ -0,0 +1,139 @@
+import re
+import struct
+from decoder import Decoder
+from instructions import InstructionTable
+
+ELF_MAGIC = b"\x7fELF"
+EM_RISCV = 243
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+STT_NOTYPE = 0
+STT_FUNC = 2
+
+# RAM the datapack models from address 0 (2^22 words, see mem/init)
+RAM_SIZE = 16 * 1024 * 1024
+
+def is_elf(data):
+    return data[:4] == ELF_MAGIC
+
+class ElfImage:
+    """A statically linked little-endian RV32 ELF executable.
+
+    Executable sections are decoded as code, other allocated sections are
+    placed in the memory image, and NOBITS sections (.bss) are only recorded
+    as zero-fill ranges since RAM starts out zeroed."""
+
+    def __init__(self, data):
+        if not is_elf(data):
+            raise ValueError("not an ELF file")
+        if data[4] != 1 or data[5] != 1:
+            raise ValueError("only little-endian ELF32 files are supported")
+        (self.type, machine, _, self.entry, _, shoff, _, _, _, _, shentsize, shnum, shstrndx) = struct.unpack_from("<HHIIIIIHHHHHH", data, 16)
+        if machine != EM_RISCV:
+            raise ValueError(f"ELF machine {machine} is not RISC-V")
+
+        self.data = data
+        self.sections = []
+        for i in range(shnum):
+            name, sh_type, flags, addr, offset, size, link, _, _, entsize = struct.unpack_from("<IIIIIIIIII", data, shoff + i * shentsize)
+            self.sections.append({"name_off": name, "type": sh_type, "flags": flags, "addr": addr,
+                                  "offset": offset, "size": size, "link": link, "entsize": entsize})
+        if shstrndx < len(self.sections):
+            strtab = self.sections[shstrndx]
+            for section in self.sections:
+                section["name"] = self._string(strtab, section["name_off"])
+
+        self.code = [s for s in self.sections if s["flags"] & SHF_ALLOC and s["flags"] & SHF_EXECINSTR and s["type"] == SHT_PROGBITS and s["size"]]
+        self.rodata = [s for s in self.sections if s["flags"] & SHF_ALLOC and not s["flags"] & (SHF_EXECINSTR | SHF_WRITE) and s["type"] != SHT_NOBITS and s["size"]]
+        self.rwdata = [s for s in self.sections if s["flags"] & SHF_ALLOC and s["flags"] & SHF_WRITE and not s["flags"] & SHF_EXECINSTR and s["type"] != SHT_NOBITS and s["size"]]
+        self.bss = [s for s in self.sections if s["flags"] & SHF_ALLOC and s["type"] == SHT_NOBITS and s["size"]]
+
+        self.symbols = {}
+        self.function_sizes = {}
+        self._read_symbols()
+
+    def _string(self, strtab, offset):
+        start = strtab["offset"] + offset
+        end = self.data.index(b"\0", start)
+        return self.data[start:end].decode("utf-8", "replace")
+
+    def _read_symbols(self):
+        code_indices = {self.sections.index(s) for s in self.code}
+        for symtab in self.sections:
+            if symtab["type"] != SHT_SYMTAB:
+                continue
+            strtab = self.sections[symtab["link"]]
+            for off in range(symtab["offset"], symtab["offset"] + symtab["size"], symtab["entsize"] or 16):
+                name_off, value, size, info, _, shndx = struct.unpack_from("<IIIBBH", self.data, off)
+                if shndx not in code_indices or info & 0xF not in (STT_NOTYPE, STT_FUNC):
+                    continue
+                name = self._string(strtab, name_off)
+                # Skip local labels and the $x/$d mapping symbols
+                if not name or name.startswith((".L", "$")):
+                    continue
+                if value not in self.symbols or info & 0xF == STT_FUNC:
+                    self.symbols[value] = name
+                if size:
+                    self.function_sizes[value] = size
+
+    def section_bytes(self, section):
+        return self.data[section["offset"]:section["offset"] + section["size"]]
+
+    def decode_table(self):
+        table = InstructionTable()
+        for section in sorted(self.code, key=lambda s: s["addr"]):
+            code = self.section_bytes(section)
+            code = code[:len(code) - len(code) % 4]
+            table.extend(Decoder(code, section["addr"]).decode_table())
+        return table
+
+    def memory_image(self):
+        # Flat RAM contents from address 0, the layout `objcopy -O binary`
+        # produces for our linker script. Trailing .bss is left out.
+        loaded = self.code + self.rodata + self.rwdata
+        for section in loaded + self.bss:
+            if section["addr"] + section["size"] > RAM_SIZE:
+                raise ValueError(f"section {section.get('name', '?')} at {section['addr']:#x}..{section['addr'] + section['size']:#x} "
+                                 f"lies outside the {RAM_SIZE // (1024 * 1024)} MB of RAM from address 0; link the program at 0")
+        end = max((s["addr"] + s["size"] for s in loaded), default=0)
+        image = bytearray(end)
+        for section in loaded:
+            image[section["addr"]:section["addr"] + section["size"]] = self.section_bytes(section)
+        return bytes(image)
+
+    def summary(self):
+        size = lambda sections: sum(s["size"] for s in sections)
+        return (f"{size(self.code)} bytes of code in {len(self.code)} sections, "
+                f"{size(self.rodata) + size(self.rwdata)} bytes of data, "
+                f"{size(self.bss)} bytes of zero-fill, {len(self.symbols)} code symbols")
+
+_map_symbol = re.compile(r'^\s+(0x[0-9a-fA-F]+)\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*$')
+_map_section = re.compile(r'^(\.[^\s]+)')
+
+def read_map_symbols(map_file):
+    """Symbols of a GNU ld .map file that lie in a .text output section."""
+    symbols = {}
+    section = None
+    in_map = False
+    with open(map_file, 'r') as f:
+        for line in f:
+            if not in_map:
+                in_map = line.startswith("Linker script and memory map")
+                continue
+            match = _map_section.match(line)
+            if match:
+                section = match.group(1)
+                continue
+            if section is None or not section.startswith(".text"):
+                continue
+            match = _map_symbol.match(line)
+            if match:
+                symbols.setdefault(int(match.group(1), 16), match.group(2))
+    return symbols
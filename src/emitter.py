@@ -0,0 +1,370 @@
+import re
+from multiprocessing import Pool
+from build_cache import block_key, instruction_key
+from const_fold import ConstantFolder
+
+RAS_DEPTH = 64
+DRIVERS = ["chain", "trampoline"]
+STATS = ["fold_saved", "fold_blocks", "peephole_saved", "peephole_blocks", "peephole_rejected"]
+
+class BlockEmitter:
+    def __init__(self, transpiler, writer, namespace, lib_costs, ascii_depth, block_starts=None, cache=None, instrument=False, ras=False, trampoline=False, peephole=None):
+        self.transpiler = transpiler
+        self.writer = writer
+        self.namespace = namespace
+        self.lib_costs = lib_costs
+        self.ascii_depth = ascii_depth
+        self.block_starts = block_starts if block_starts else set()
+        self.func_pattern = re.compile(f"function {namespace}:([a-zA-Z0-9_./]+)")
+        self.cache = cache
+        self.instrument = instrument
+        self.ras = ras
+        self.trampoline = trampoline
+        self.cond = f"execute if score #ipt_count {namespace}_temp matches 1.. if score #sleep_ticks {namespace}_temp matches ..0 unless score #halt {namespace}_temp matches 1 run"
+        self.entries = {}
+        self.rewritten = 0
+        self.reused = 0
+        self.peephole = peephole
+        self.stats = dict.fromkeys(STATS, 0)
+
+    def instruction_lines(self, instr):
+        lines = self.transpiler.convert_instruction(instr, include_pc_update=True)
+        lines.append(f"scoreboard players remove #ipt_count {self.namespace}_temp 1")
+        if self.instrument:
+            lines.insert(0, f"scoreboard players add i_{hex(instr.address)[2:]} {self.namespace}_prof 1")
+        if instr.name in ["ecall", "ebreak"]:
+            lines.append("return 0")
+        return lines
+
+    def lines_cost(self, lines):
+        cost = 0
+        for line in lines:
+            cost += 1
+            match = self.func_pattern.search(line)
+            if match:
+                called_func = match.group(1)
+                if called_func in self.lib_costs: cost += self.lib_costs[called_func]
+                elif "ascii" in called_func: cost += self.ascii_depth
+                else: cost += 50
+        return cost
+
+    def block_lines(self, block):
+        # A superblock runs the blocks of its trace in place, leaving through
+        # a side exit wherever a branch goes the unlikely way
+        chain = [block] + block.get("trace", [])
+        content = []
+        folder = ConstantFolder(self.namespace)
+        saved = self.stats["fold_saved"]
+        for i, part in enumerate(chain):
+            body, exits, taken = self._block_parts(part, folder)
+            content.extend(body)
+            if i + 1 < len(chain):
+                content.extend(self._boundary(part, chain[i + 1]['start'], taken))
+            else:
+                content.extend(exits)
+        if self.stats["fold_saved"] > saved:
+            self.stats["fold_blocks"] += 1
+        if self.peephole:
+            content, removed = self.peephole.optimize(content)
+            if removed is None:
+                self.stats["peephole_rejected"] += 1
+            elif removed:
+                self.stats["peephole_saved"] += removed
+                self.stats["peephole_blocks"] += 1
+        return content
+
+    def _convert(self, instr, folder):
+        lines = self.transpiler.convert_instruction(instr, include_pc_update=False)
+        folded = folder.fold(instr)
+        if folded is None:
+            return lines
+        self.stats["fold_saved"] += len(lines) - len(folded)
+        return folded
+
+    def _goto(self, func, guard=""):
+        # Continue at function `func`: call it (chaining), or leave it in
+        # <ns>:tramp next for the tick driver (trampoline)
+        ns = self.namespace
+        if self.trampoline:
+            return f'{guard}data modify storage {ns}:tramp next set value "{func}"'
+        return f"{self.cond} {guard}function {ns}:{func}"
+
+    def _boundary(self, block, next_start, taken=None):
+        ns = self.namespace
+        lines = []
+        last = block['instrs'][-1]
+        if self._fused(block) and taken is not None:
+            # A branch decided at build time: the trace either continues or leaves for good
+            addr = (last.address + last.imm) & 0xFFFFFFFF if taken else (last.address + 4) & 0xFFFFFFFF
+            if addr != next_start:
+                return self._fused_exits(last, taken) + ["return 0"]
+            lines.append(f"execute unless score #ipt_count {ns}_temp matches 1.. run return run scoreboard players set pc {ns}_pc {next_start}")
+            return lines
+        if self._fused(block):
+            target_addr = (last.address + last.imm) & 0xFFFFFFFF
+            _, taken, not_taken = self.transpiler.branch_condition(last)
+            leave, other = (not_taken, (last.address + 4) & 0xFFFFFFFF) if next_start == target_addr else (taken, target_addr)
+            if other != next_start:
+                if other in self.block_starts:
+                    lines.append(f"execute if score #ipt_count {ns}_temp matches 1.. {leave} run return run function {ns}:b_{hex(other)[2:]}")
+                lines.append(f"execute {leave} run return run scoreboard players set pc {ns}_pc {other}")
+            lines.append(f"execute unless score #ipt_count {ns}_temp matches 1.. run return run scoreboard players set pc {ns}_pc {next_start}")
+            return lines
+        if "inline" not in block and last.name in ["beq", "bne", "blt", "bge", "bltu", "bgeu"]:
+            target_addr = (last.address + last.imm) & 0xFFFFFFFF
+            next_addr = (last.address + 4) & 0xFFFFFFFF
+            other = next_addr if next_start == target_addr else target_addr
+            if other != next_start:
+                if other in self.block_starts:
+                    lines.append(f"execute unless score pc {ns}_pc matches {next_start} run return run " + self._goto(f"b_{hex(other)[2:]}"))
+                else:
+                    lines.append(f"execute unless score pc {ns}_pc matches {next_start} run return 0")
+        # Only an ecall can set #halt or #sleep_ticks, and it ends the trace
+        lines.append(f"execute unless score #ipt_count {ns}_temp matches 1.. run return 0")
+        return lines
+
+    def _fused(self, block):
+        # Chained blocks test their closing branch once in the exits and only
+        # write pc when the chain stops there
+        return not self.trampoline and "inline" not in block and block['instrs'][-1].name in ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
+
+    def _fused_exits(self, instr, resolved=None):
+        # Only an ecall changes #halt or #sleep_ticks, so the tick budget is
+        # the one part of the chaining condition that can fail here
+        ns = self.namespace
+        _, taken, not_taken = self.transpiler.branch_condition(instr)
+        target_addr = (instr.address + instr.imm) & 0xFFFFFFFF
+        next_addr = (instr.address + 4) & 0xFFFFFFFF
+        live = f"execute if score #ipt_count {ns}_temp matches 1.."
+        lines = []
+        if resolved is not None:
+            addr = target_addr if resolved else next_addr
+            if addr in self.block_starts:
+                lines.append(f"{live} run return run function {ns}:b_{hex(addr)[2:]}")
+            lines.append(f"scoreboard players set pc {ns}_pc {addr}")
+            return lines
+        if target_addr in self.block_starts:
+            lines.append(f"{live} {taken} run return run function {ns}:b_{hex(target_addr)[2:]}")
+            # Reached with budget left only when the branch was not taken
+            not_taken_test = ""
+        else:
+            not_taken_test = f" {not_taken}"
+        if next_addr in self.block_starts:
+            lines.append(f"{live}{not_taken_test} run return run function {ns}:b_{hex(next_addr)[2:]}")
+        lines.append(f"execute {taken} run return run scoreboard players set pc {ns}_pc {target_addr}")
+        lines.append(f"scoreboard players set pc {ns}_pc {next_addr}")
+        return lines
+
+    def _branch_tail(self, block, instr, taken):
+        # (body, exits) of a closing conditional branch, `taken` when known at build time
+        ns = self.namespace
+        if self._fused(block):
+            prep = self.transpiler.branch_condition(instr)[0] if taken is None else []
+            return prep, self._fused_exits(instr, taken)
+        target_addr = (instr.address + instr.imm) & 0xFFFFFFFF
+        next_addr = (instr.address + 4) & 0xFFFFFFFF
+        if taken is not None:
+            addr = target_addr if taken else next_addr
+            exits = [self._goto(f"b_{hex(addr)[2:]}")] if addr in self.block_starts else []
+            return [f"scoreboard players set pc {ns}_pc {addr}"], exits
+        exits = []
+        for addr in (target_addr, next_addr):
+            if addr in self.block_starts:
+                exits.append(self._goto(f"b_{hex(addr)[2:]}", f"execute if score pc {ns}_pc matches {addr} run "))
+        return self.transpiler.convert_instruction(instr), exits
+
+    def _block_parts(self, block, folder):
+        # (body, exits, taken): the block's own commands, its chaining to
+        # successors and the direction of a closing branch if known
+        ns = self.namespace
+        block_starts = self.block_starts
+        content = []
+
+        inline = block.get("inline")
+        length = block['length'] + (len(inline) + 1 if inline is not None else 0)
+        content.append(f"scoreboard players remove #ipt_count {ns}_temp {length}")
+        if self.instrument:
+            content.append(f"scoreboard players add b_{hex(block['start'])[2:]} {ns}_prof 1")
+        if inline is not None:
+            body, exits = self._inline_parts(block, inline, folder)
+            return content + body, exits, None
+
+        last_idx = len(block['instrs']) - 1
+        taken = None
+        branch_exits = []
+        for i, instr in enumerate(block['instrs']):
+            is_last = (i == last_idx)
+            is_jmp_type = instr.name in ["jal", "jalr", "beq", "bne", "blt", "bge", "bltu", "bgeu"]
+
+            if is_last and instr.name in ["beq", "bne", "blt", "bge", "bltu", "bgeu"]:
+                taken = folder.branch(instr)
+                body, branch_exits = self._branch_tail(block, instr, taken)
+                if taken is not None:
+                    plain_body, plain_exits = self._branch_tail(block, instr, None)
+                    self.stats["fold_saved"] += len(plain_body) + len(plain_exits) - len(body) - len(branch_exits)
+                content.extend(body)
+            elif is_last and is_jmp_type:
+                folder.fold(instr)
+                content.extend(self.transpiler.convert_instruction(instr, include_pc_update=True))
+            else:
+                content.extend(self._convert(instr, folder))
+
+            if instr.name in ["ecall", "ebreak"]:
+                content.append("return 0")
+
+        last_instr = block['instrs'][-1]
+        next_addr = (last_instr.address + 4) & 0xFFFFFFFF
+
+        is_uncond_jump = last_instr.name in ["jal", "jalr", "ecall", "ebreak"]
+        is_branch = last_instr.name in ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
+
+        if not is_branch and not is_uncond_jump:
+            content.append(f"scoreboard players set pc {ns}_pc {next_addr}")
+
+        if self.ras and last_instr.name in ["jal", "jalr"] and last_instr.rd == 1:
+            # Calls push the return site; the oldest entry is dropped past RAS_DEPTH
+            ret_func = f"b_{hex(next_addr)[2:]}" if next_addr in block_starts else "dispatch/root"
+            content.append(f'data modify storage {ns}:ras stack append value {{pc:{next_addr},f:"{ret_func}"}}')
+            content.append(f"execute if data storage {ns}:ras stack[{RAS_DEPTH}] run data remove storage {ns}:ras stack[0]")
+
+        exits = []
+        target_addr = None
+        if is_branch or last_instr.name == "jal":
+            target_addr = (last_instr.address + last_instr.imm) & 0xFFFFFFFF
+
+        if is_branch:
+            exits = branch_exits
+        elif last_instr.name == "jal":
+            if target_addr is not None and target_addr in block_starts:
+                exits.append(self._goto(f"b_{hex(target_addr)[2:]}"))
+        elif last_instr.name == "jalr" and "jump" in block:
+            kind, targets = block["jump"]
+            if kind == "direct":
+                exits.append(self._goto(f"b_{hex(targets[0])[2:]}"))
+            else:
+                exits.append(self._goto(f"dispatch/jt_{hex(last_instr.address)[2:]}"))
+        elif last_instr.name == "jalr" and self.ras and last_instr.rd == 0 and last_instr.rs1 == 1:
+            # `ret` always pops, even when the tick ends here
+            exits.append(f"function {ns}:ras/ret")
+        elif last_instr.name == "jalr":
+            if not self.trampoline:
+                exits.append(self._goto("dispatch/root"))
+        elif last_instr.name in ["ecall", "ebreak"]:
+            if next_addr in block_starts and not self.trampoline:
+                exits.append(self._goto(f"b_{hex(next_addr)[2:]}"))
+        else:
+            if next_addr in block_starts:
+                exits.append(self._goto(f"b_{hex(next_addr)[2:]}"))
+        return content, exits, taken
+
+    def _inline_parts(self, block, inline, folder):
+        # The call only links ra; the leaf body runs in place and its `ret`
+        # becomes a jump to the return site
+        ns = self.namespace
+        call = block['instrs'][-1]
+        next_addr = (call.address + 4) & 0xFFFFFFFF
+        content = []
+        for instr in block['instrs'][:-1]:
+            content.extend(self._convert(instr, folder))
+        folder.fold(call)
+        content.extend(line for line in self.transpiler.convert_instruction(call) if f" pc {ns}_pc " not in line)
+        for instr in inline:
+            content.extend(self._convert(instr, folder))
+        content.append(f"scoreboard players set pc {ns}_pc {next_addr}")
+        if inline and inline[-1].name == "ecall":
+            content.append("return 0")
+            return content, []
+        if next_addr in self.block_starts:
+            return content, [self._goto(f"b_{hex(next_addr)[2:]}")]
+        return content, []
+
+    def _write(self, fname, lines):
+        self.writer.write(fname, "\n".join(lines))
+
+    def _cached_cost(self, fname, key):
+        if self.cache is None:
+            return None
+        return self.cache.cached_function(fname, key, self.writer)
+
+    def _record(self, fname, key, cost, reused):
+        if self.cache is None:
+            return
+        self.entries[fname] = [key, cost]
+        if reused: self.reused += 1
+        else: self.rewritten += 1
+
+    def emit_instructions(self, instructions):
+        max_cost = 0
+        for instr in instructions:
+            fname = f"i_{hex(instr.address)[2:]}"
+            key = instruction_key(instr) if self.cache else None
+            cost = self._cached_cost(fname, key)
+            reused = cost is not None
+            if not reused:
+                lines = self.instruction_lines(instr)
+                cost = self.lines_cost(lines)
+                self._write(f"{fname}.mcfunction", lines)
+            self._record(fname, key, cost, reused)
+            max_cost = max(max_cost, cost)
+        return max_cost
+
+    def emit_blocks(self, blocks):
+        max_cost = 0
+        for block in blocks:
+            fname = f"b_{hex(block['start'])[2:]}"
+            key = block_key(block, self.block_starts) if self.cache else None
+            cost = self._cached_cost(fname, key)
+            reused = cost is not None
+            if not reused:
+                cost = 0
+                for instr in block['instrs'] + block.get('inline', []):
+                    cost = max(cost, self.lines_cost(self.instruction_lines(instr)))
+                self._write(f"{fname}.mcfunction", self.block_lines(block))
+            self._record(fname, key, cost, reused)
+            max_cost = max(max_cost, cost)
+        return max_cost
+
+    def emit_parallel(self, items, blocks_mode, jobs):
+        """Shard `items` (blocks or instructions) across `jobs` worker processes.
+
+        Every worker writes its own files (or hands them back when the writer
+        cannot be shared, e.g. a zip archive) and returns the highest
+        per-instruction cost it saw; the shards never overlap, so the output is
+        the same as the serial emit_blocks/emit_instructions."""
+        shard = max(1, len(items) // (jobs * 8))
+        ranges = [(start, min(start + shard, len(items))) for start in range(0, len(items), shard)]
+        max_cost = 0
+        writer = self.writer
+        self.writer = writer.for_worker()
+        try:
+            with Pool(jobs, initializer=_init_worker, initargs=(self, items, blocks_mode)) as pool:
+                for cost, entries, rewritten, reused, stats, result in pool.imap_unordered(_emit_range, ranges):
+                    max_cost = max(max_cost, cost)
+                    self.entries.update(entries)
+                    self.rewritten += rewritten
+                    self.reused += reused
+                    for name, value in stats.items():
+                        self.stats[name] += value
+                    writer.merge(result)
+        finally:
+            self.writer = writer
+        return max_cost
+
+_worker_state = None
+
+def _init_worker(emitter, items, blocks_mode):
+    global _worker_state
+    _worker_state = (emitter, emitter.writer, items, blocks_mode)
+
+def _emit_range(bounds):
+    emitter, writer, items, blocks_mode = _worker_state
+    start, end = bounds
+    emitter.writer = writer.for_worker()
+    emitter.entries = {}
+    emitter.rewritten = emitter.reused = 0
+    emitter.stats = dict.fromkeys(STATS, 0)
+    if blocks_mode:
+        cost = emitter.emit_blocks(items[start:end])
+    else:
+        cost = emitter.emit_instructions([items[i] for i in range(start, end)])
+    return cost, emitter.entries, emitter.rewritten, emitter.reused, emitter.stats, emitter.writer.result()
@@ -1,3 +1,4 @@
+from array import array
 from enum import Enum, auto
 
 class InstructionType(Enum):
@@ -9,6 +10,8 @@ class InstructionType(Enum):
     J_TYPE = auto()
 
 class Instruction:
+    __slots__ = ("address", "name", "type", "rd", "rs1", "rs2", "imm")
+
     def __init__(self, address, name, type, rd=0, rs1=0, rs2=0, imm=0):
         self.address = address
         self.name = name
@@ -19,4 +22,91 @@ class Instruction:
         self.imm = imm
 
     def __repr__(self):
-        return f"{hex(self.address)}: {self.name} rd={self.rd} rs1={self.rs1} rs2={self.rs2} imm={self.imm}"
\ No newline at end of file
+        return f"{hex(self.address)}: {self.name} rd={self.rd} rs1={self.rs1} rs2={self.rs2} imm={self.imm}"
+
+class InstructionTable:
+    """Struct-of-arrays instruction store. Indexing and iteration yield
+    InstructionView objects that read like Instruction."""
+
+    def __init__(self):
+        self.kinds = []
+        self.kind_ids = {}
+        self.kind = array('H')
+        self.address = array('I')
+        self.word = array('I')
+        self.rd = array('B')
+        self.rs1 = array('B')
+        self.rs2 = array('B')
+        self.imm = array('q')
+
+    def kind_id(self, name, type):
+        key = (name, type)
+        if key not in self.kind_ids:
+            self.kind_ids[key] = len(self.kinds)
+            self.kinds.append(key)
+        return self.kind_ids[key]
+
+    def append(self, instr, word=0):
+        self.kind.append(self.kind_id(instr.name, instr.type))
+        self.address.append(instr.address)
+        self.word.append(word)
+        self.rd.append(instr.rd)
+        self.rs1.append(instr.rs1)
+        self.rs2.append(instr.rs2)
+        self.imm.append(instr.imm)
+
+    def extend(self, other):
+        remap = array('H', (self.kind_id(name, type) for name, type in other.kinds))
+        self.kind.extend(array('H', (remap[k] for k in other.kind)))
+        self.address.extend(other.address)
+        self.word.extend(other.word)
+        self.rd.extend(other.rd)
+        self.rs1.extend(other.rs1)
+        self.rs2.extend(other.rs2)
+        self.imm.extend(other.imm)
+
+    def select(self, indices):
+        # New table holding only the rows at `indices`, in that order
+        table = InstructionTable()
+        table.kinds = list(self.kinds)
+        table.kind_ids = dict(self.kind_ids)
+        for name in ("kind", "address", "word", "rd", "rs1", "rs2", "imm"):
+            column = getattr(self, name)
+            setattr(table, name, array(column.typecode, (column[i] for i in indices)))
+        return table
+
+    def __len__(self):
+        return len(self.address)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.address)
+        if not 0 <= index < len(self.address):
+            raise IndexError("instruction index out of range")
+        return InstructionView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.address)):
+            yield InstructionView(self, index)
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.kind, self.address, self.word, self.rd, self.rs1, self.rs2, self.imm))
+
+class InstructionView:
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    address = property(lambda self: self.table.address[self.index])
+    word = property(lambda self: self.table.word[self.index])
+    name = property(lambda self: self.table.kinds[self.table.kind[self.index]][0])
+    type = property(lambda self: self.table.kinds[self.table.kind[self.index]][1])
+    rd = property(lambda self: self.table.rd[self.index])
+    rs1 = property(lambda self: self.table.rs1[self.index])
+    rs2 = property(lambda self: self.table.rs2[self.index])
+    imm = property(lambda self: self.table.imm[self.index])
+
+    def __repr__(self):
+        return f"{hex(self.address)}: {self.name} rd={self.rd} rs1={self.rs1} rs2={self.rs2} imm={self.imm}"
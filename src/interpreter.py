@@ -0,0 +1,1024 @@
+import argparse
+import copy
+import json
+import math
+import os
+import re
+import zipfile
+from collections import Counter
+
+INT_MIN = -(1 << 31)
+
+def i32(value):
+    return ((value + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+class InterpreterError(Exception):
+    pass
+
+# ---------------------------------------------------------------- SNBT values
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?([bBsSlLfFdD]?)$')
+_UNQUOTED = re.compile(r'[A-Za-z0-9_.+\-]+')
+_IMMUTABLE = (int, float, str)
+
+class _SnbtReader:
+    def __init__(self, text, pos=0):
+        self.text = text
+        self.pos = pos
+
+    def skip(self):
+        while self.pos < len(self.text) and self.text[self.pos] in " \t":
+            self.pos += 1
+
+    def expect(self, char):
+        self.skip()
+        if self.text[self.pos:self.pos + 1] != char:
+            raise InterpreterError(f"expected '{char}' at {self.pos} in {self.text!r}")
+        self.pos += 1
+
+    def value(self):
+        self.skip()
+        char = self.text[self.pos:self.pos + 1]
+        if char == "{":
+            return self.compound()
+        if char == "[":
+            return self.list()
+        if char in "\"'":
+            return self.quoted()
+        match = _UNQUOTED.match(self.text, self.pos)
+        if not match:
+            raise InterpreterError(f"bad SNBT at {self.pos} in {self.text!r}")
+        self.pos = match.end()
+        return _scalar(match.group())
+
+    def compound(self):
+        self.expect("{")
+        result = {}
+        self.skip()
+        if self.text[self.pos] == "}":
+            self.pos += 1
+            return result
+        while True:
+            self.skip()
+            if self.text[self.pos] in "\"'":
+                key = self.quoted()
+            else:
+                match = _UNQUOTED.match(self.text, self.pos)
+                key = match.group()
+                self.pos = match.end()
+            self.expect(":")
+            result[key] = self.value()
+            self.skip()
+            if self.text[self.pos] == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return result
+
+    def list(self):
+        self.expect("[")
+        if re.match(r'[BIL];', self.text[self.pos:self.pos + 2]):
+            self.pos += 2
+        result = []
+        self.skip()
+        if self.text[self.pos] == "]":
+            self.pos += 1
+            return result
+        while True:
+            result.append(self.value())
+            self.skip()
+            if self.text[self.pos] == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return result
+
+    def quoted(self):
+        quote = self.text[self.pos]
+        self.pos += 1
+        out = []
+        while True:
+            char = self.text[self.pos]
+            self.pos += 1
+            if char == "\\":
+                out.append(self.text[self.pos])
+                self.pos += 1
+            elif char == quote:
+                return "".join(out)
+            else:
+                out.append(char)
+
+def _scalar(token):
+    match = _NUMBER.match(token)
+    if match:
+        suffix = match.group(1).lower()
+        body = token[:-1] if suffix else token
+        if suffix in ("f", "d") or "." in body or "e" in body.lower():
+            return float(body)
+        return int(body)
+    if token == "true": return 1
+    if token == "false": return 0
+    return token
+
+def parse_snbt(text):
+    reader = _SnbtReader(text)
+    value = reader.value()
+    return value
+
+def to_snbt(value):
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{k if _UNQUOTED.fullmatch(k) else json.dumps(k)}:{to_snbt(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, list):
+        return "[" + ",".join(to_snbt(v) for v in value) + "]"
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, float):
+        return f"{value}d"
+    return str(value)
+
+def macro_text(value):
+    # Macro arguments insert strings and numbers without quotes or suffixes
+    if isinstance(value, (dict, list)):
+        return to_snbt(value)
+    return str(value)
+
+def _copy(value):
+    return value if type(value) in _IMMUTABLE else copy.deepcopy(value)
+
+def _matches(value, pattern):
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(k in value and _matches(value[k], v) for k, v in pattern.items())
+    if isinstance(pattern, list):
+        return isinstance(value, list) and all(any(_matches(v, p) for v in value) for p in pattern)
+    return value == pattern
+
+def _merge(target, source):
+    changed = False
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            changed = _merge(target[key], value) or changed
+        elif target.get(key) != value:
+            target[key] = _copy(value)
+            changed = True
+    return changed
+
+# ------------------------------------------------------------------ NBT paths
+
+def parse_path(text):
+    nodes = []
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if char == ".":
+            pos += 1
+        elif char == "{":
+            reader = _SnbtReader(text, pos)
+            nodes.append(("match", reader.compound()))
+            pos = reader.pos
+        elif char == "[":
+            end = pos + 1
+            if text[end] == "]":
+                nodes.append(("all",))
+                pos = end + 1
+            elif text[end] == "{":
+                reader = _SnbtReader(text, end)
+                nodes.append(("filter", reader.compound()))
+                pos = reader.pos + 1
+            else:
+                close = text.index("]", end)
+                nodes.append(("index", int(text[end:close])))
+                pos = close + 1
+        elif char == '"':
+            reader = _SnbtReader(text, pos)
+            nodes.append(("key", reader.quoted()))
+            pos = reader.pos
+        else:
+            match = re.compile(r'[^.\[\]{}"]+').match(text, pos)
+            nodes.append(("key", match.group()))
+            pos = match.end()
+    return nodes
+
+def path_get(root, nodes):
+    current = [root]
+    for node in nodes:
+        kind = node[0]
+        found = []
+        for value in current:
+            if kind == "key":
+                if isinstance(value, dict) and node[1] in value:
+                    found.append(value[node[1]])
+            elif kind == "index":
+                if isinstance(value, list):
+                    index = node[1] + len(value) if node[1] < 0 else node[1]
+                    if 0 <= index < len(value):
+                        found.append(value[index])
+            elif kind == "all":
+                if isinstance(value, list):
+                    found.extend(value)
+            elif kind == "filter":
+                if isinstance(value, list):
+                    found.extend(v for v in value if _matches(v, node[1]))
+            elif _matches(value, node[1]):
+                found.append(value)
+        current = found
+    return current
+
+def path_targets(root, nodes, create):
+    """(container, key) pairs the last node of `nodes` refers to. With
+    `create`, missing compounds and lists along the way are added."""
+    parents = [root]
+    for i, node in enumerate(nodes[:-1]):
+        if create and node[0] == "key":
+            following = nodes[i + 1][0]
+            for parent in parents:
+                if isinstance(parent, dict) and node[1] not in parent:
+                    parent[node[1]] = [] if following in ("index", "all", "filter") else {}
+        parents = path_get(parents[0], [node]) if len(parents) == 1 else [v for p in parents for v in path_get(p, [node])]
+    last = nodes[-1]
+    targets = []
+    for parent in parents:
+        if last[0] == "key" and isinstance(parent, dict):
+            targets.append((parent, last[1]))
+        elif last[0] == "index" and isinstance(parent, list):
+            index = last[1] + len(parent) if last[1] < 0 else last[1]
+            if 0 <= index < len(parent):
+                targets.append((parent, index))
+        elif last[0] == "all" and isinstance(parent, list):
+            targets.extend((parent, i) for i in range(len(parent)))
+        elif last[0] == "filter" and isinstance(parent, list):
+            targets.extend((parent, i) for i, v in enumerate(parent) if _matches(v, last[1]))
+    return targets
+
+# ---------------------------------------------------------- command plumbing
+
+class Call:
+    """Returned by a command that calls a function. `then(vm, result)` runs
+    when the callee finishes and may return a Return for the caller."""
+    __slots__ = ("function", "args", "then")
+
+    def __init__(self, function, args, then=None):
+        self.function = function
+        self.args = args
+        self.then = then
+
+class Return:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+class CompiledFunction(list):
+    macro_keys = ()
+
+class Frame:
+    __slots__ = ("name", "commands", "index", "args", "then")
+
+    def __init__(self, name, commands, args, then):
+        self.name = name
+        self.commands = commands
+        self.index = 0
+        self.args = args
+        self.then = then
+
+def _chain(first, second):
+    if first is None:
+        return second
+    def then(vm, value):
+        first(vm, value)
+        return second(vm, value)
+    return then
+
+def _invalid_command(vm):
+    vm.unsupported["invalid macro command"] += 1
+    return None
+
+def _return_value(vm, value):
+    return Return(value)
+
+class _Words:
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def word(self):
+        text = self.text
+        while self.pos < len(text) and text[self.pos] == " ":
+            self.pos += 1
+        if self.pos >= len(text):
+            return None
+        start = self.pos
+        depth = 0
+        quote = None
+        while self.pos < len(text):
+            char = text[self.pos]
+            if quote:
+                if char == "\\":
+                    self.pos += 1
+                elif char == quote:
+                    quote = None
+            elif char in "\"'":
+                quote = char
+            elif char in "[{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+            elif char == " " and depth == 0:
+                break
+            self.pos += 1
+        return text[start:self.pos]
+
+    def rest(self):
+        rest = self.text[self.pos:].strip()
+        self.pos = len(self.text)
+        return rest
+
+def _range(text):
+    if ".." not in text:
+        value = int(text)
+        return value, value
+    low, high = text.split("..")
+    return (int(low) if low else INT_MIN), (int(high) if high else 0x7FFFFFFF)
+
+_COMPARE = {"<": lambda a, b: a < b, "<=": lambda a, b: a <= b, "=": lambda a, b: a == b,
+            ">": lambda a, b: a > b, ">=": lambda a, b: a >= b}
+
+def _floor_div(a, b):
+    if b == 0: return None
+    return i32(a // b)
+
+def _floor_mod(a, b):
+    if b == 0: return None
+    return a % b
+
+_OPERATIONS = {
+    "+=": lambda a, b: i32(a + b), "-=": lambda a, b: i32(a - b), "*=": lambda a, b: i32(a * b),
+    "/=": _floor_div, "%=": _floor_mod, "<": min, ">": max,
+}
+
+_NOOP_COMMANDS = {"summon", "kill", "clear", "item", "particle", "playsound", "title", "say", "setblock",
+                  "fill", "forceload", "effect", "give", "tp", "teleport", "schedule", "bossbar", "weather", "time"}
+
+# ----------------------------------------------------------------- datapacks
+
+class Datapack:
+    """Function sources and function tags of a datapack directory or zip."""
+
+    def __init__(self, path):
+        self.functions = {}
+        self.tags = {}
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    self._add(name, lambda n=name: archive.read(n).decode("utf-8"))
+        else:
+            for dirpath, _, files in os.walk(path):
+                for fname in files:
+                    full = os.path.join(dirpath, fname)
+                    rel = os.path.relpath(full, path).replace(os.sep, "/")
+                    self._add(rel, lambda f=full: open(f, encoding="utf-8").read())
+
+    def _add(self, rel, read):
+        parts = rel.split("/")
+        if len(parts) < 4 or parts[0] != "data":
+            return
+        ns = parts[1]
+        if parts[2] in ("function", "functions") and rel.endswith(".mcfunction"):
+            self.functions[f"{ns}:{'/'.join(parts[3:])[:-len('.mcfunction')]}"] = _lines(read())
+        elif parts[2] == "tags" and parts[3] in ("function", "functions") and rel.endswith(".json"):
+            tag = f"{ns}:{'/'.join(parts[4:])[:-len('.json')]}"
+            self.tags[tag] = json.loads(read()).get("values", [])
+
+    def tag_functions(self, tag):
+        result = []
+        for entry in self.tags.get(tag, []):
+            entry = entry["id"] if isinstance(entry, dict) else entry
+            if entry.startswith("#"):
+                result.extend(self.tag_functions(entry[1:]))
+            else:
+                result.append(entry)
+        return result
+
+def _lines(text):
+    lines = []
+    pending = ""
+    for line in text.splitlines():
+        line = line.strip()
+        if line.endswith("\\"):
+            pending += line[:-1].strip() + " "
+            continue
+        line = pending + line
+        pending = ""
+        if line and not line.startswith("#"):
+            lines.append(line)
+    return lines
+
+# ---------------------------------------------------------------- interpreter
+
+class Interpreter:
+    """Executes the command subset MC-RVVM emits with Minecraft semantics:
+    int32 scoreboards (floorDiv/floorMod, failing on division by zero),
+    storage NBT, macro functions, `return run` and inline function calls on
+    an explicit frame stack."""
+
+    def __init__(self, pack, namespace="rv32"):
+        self.pack = pack
+        self.namespace = namespace
+        self.scores = {}
+        self.storage = {}
+        self.functions = {}
+        self.macro_cache = {}
+        self.args = None
+        self.output = []
+        self.on_chat = None
+        self.max_chain = 65536
+        self.commands = 0
+        self.max_depth = 0
+        self.guest_instructions = 0
+        self.instruction_counter = ("#ipt_count", f"{namespace}_temp")
+        self.unsupported = Counter()
+
+    # -- state helpers
+
+    def objective(self, name):
+        scores = self.scores.get(name)
+        if scores is None:
+            scores = self.scores[name] = {}
+        return scores
+
+    def score(self, holder, objective):
+        return self.scores.get(objective, {}).get(holder)
+
+    def root(self, storage_id):
+        if ":" not in storage_id:
+            storage_id = "minecraft:" + storage_id
+        root = self.storage.get(storage_id)
+        if root is None:
+            root = self.storage[storage_id] = {}
+        return root
+
+    # -- running
+
+    def run_tag(self, tag):
+        for function in self.pack.tag_functions(tag):
+            self.run_function(function)
+
+    def run_function(self, name, args=None):
+        frame = self._frame(name, args, None)
+        if frame is None:
+            return None
+        return self._run(frame)
+
+    def _frame(self, name, args, then):
+        commands = self.functions.get(name)
+        if commands is None:
+            source = self.pack.functions.get(name)
+            if source is None:
+                self.unsupported[f"missing function {name}"] += 1
+                return None
+            commands = self.functions[name] = CompiledFunction(self.compile(line, name) for line in source)
+            commands.macro_keys = {key for line in source if line.startswith("$") for key in re.findall(r'\$\(([A-Za-z0-9_]+)\)', line)}
+        if commands.macro_keys:
+            if not isinstance(args, dict) or not commands.macro_keys.issubset(args):
+                return None
+        return Frame(name, commands, args, then)
+
+    def _run(self, frame):
+        stack = [frame]
+        limit = self.max_chain
+        result = None
+        count = self.commands
+        max_depth = self.max_depth
+        start = count
+        while stack:
+            frame = stack[-1]
+            commands = frame.commands
+            index = frame.index
+            if index >= len(commands):
+                stack.pop()
+                value = self._finish(stack, frame, None)
+                if not stack: result = value
+                continue
+            frame.index = index + 1
+            self.args = frame.args
+            count += 1
+            if count - start > limit:
+                break
+            r = commands[index](self)
+            kind = type(r)
+            if kind is Call:
+                callee = self._frame(r.function, r.args, r.then)
+                if callee is None:
+                    if r.then is not None:
+                        out = r.then(self, None)
+                        if type(out) is Return:
+                            stack.pop()
+                            value = self._finish(stack, frame, out.value)
+                            if not stack: result = value
+                    continue
+                stack.append(callee)
+                if len(stack) > max_depth: max_depth = len(stack)
+            elif kind is Return:
+                stack.pop()
+                value = self._finish(stack, frame, r.value)
+                if not stack: result = value
+        self.commands = count
+        self.max_depth = max_depth
+        return result
+
+    def _finish(self, stack, frame, value):
+        # Hands a finished frame's value to its caller; a `return run function`
+        # makes the caller return as well.
+        while frame.then is not None:
+            out = frame.then(self, value)
+            if type(out) is not Return or not stack:
+                break
+            frame = stack.pop()
+            value = out.value
+        return value
+
+    # -- compiling
+
+    def compile(self, line, where="?"):
+        if line.startswith("$"):
+            return self._compile_macro(line[1:], where)
+        try:
+            return self._compile(_Words(line))
+        except (InterpreterError, ValueError, IndexError, AttributeError) as e:
+            raise InterpreterError(f"{where}: cannot parse {line!r}: {e}")
+
+    def _compile_macro(self, template, where):
+        parts = re.split(r'\$\(([A-Za-z0-9_]+)\)', template)
+        cache = self.macro_cache
+        def run(vm):
+            args = vm.args
+            text = "".join(macro_text(args[p]) if i % 2 else p for i, p in enumerate(parts))
+            command = cache.get(text)
+            if command is None:
+                if len(cache) > 200000: cache.clear()
+                try:
+                    command = vm.compile(text, where)
+                except InterpreterError:
+                    # Guest-built commands (exec_cmd) may be anything
+                    command = _invalid_command
+                cache[text] = command
+            return command(vm)
+        return run
+
+    def _compile(self, words):
+        name = words.word()
+        if name == "scoreboard":
+            return self._scoreboard(words)
+        if name == "execute":
+            return self._execute(words)
+        if name == "function":
+            return self._function(words)
+        if name == "data":
+            return self._data(words)
+        if name == "return":
+            return self._return(words)
+        if name == "tellraw":
+            return self._tellraw(words)
+        if name == "gamerule":
+            rule, value = words.word(), words.word()
+            def gamerule(vm):
+                if rule == "maxCommandChainLength" and value is not None:
+                    vm.max_chain = int(value)
+                return 1
+            return gamerule
+        if name in _NOOP_COMMANDS:
+            return lambda vm: 1
+        def unsupported(vm):
+            vm.unsupported[name] += 1
+            return None
+        return unsupported
+
+    def _scoreboard(self, words):
+        group, action = words.word(), words.word()
+        if group == "objectives":
+            objective = words.word()
+            def objectives(vm):
+                if action == "add": vm.objective(objective)
+                elif action == "remove": vm.scores.pop(objective, None)
+                return 1
+            return objectives
+
+        holder, objective = words.word(), words.word()
+        scores = self.objective(objective) if objective else None
+        if action == "set":
+            value = i32(int(words.word()))
+            def set_score(vm):
+                scores[holder] = value
+                return value
+            return set_score
+        if action in ("add", "remove"):
+            amount = int(words.word()) * (1 if action == "add" else -1)
+            if action == "remove" and (holder, objective) == self.instruction_counter:
+                def count_instructions(vm):
+                    value = scores[holder] = i32(scores.get(holder, 0) + amount)
+                    vm.guest_instructions -= amount
+                    return value
+                return count_instructions
+            def add_score(vm):
+                value = scores[holder] = i32(scores.get(holder, 0) + amount)
+                return value
+            return add_score
+        if action == "get":
+            return lambda vm: scores.get(holder)
+        if action == "reset":
+            def reset(vm):
+                if objective: scores.pop(holder, None)
+                else:
+                    for s in vm.scores.values(): s.pop(holder, None)
+                return 1
+            return reset
+        if action == "enable":
+            return lambda vm: 1
+        if action == "operation":
+            op, source, source_objective = words.word(), words.word(), words.word()
+            sources = self.objective(source_objective)
+            if op == "=":
+                def assign(vm):
+                    value = scores[holder] = sources.get(source, 0)
+                    return value
+                return assign
+            if op == "><":
+                def swap(vm):
+                    a, b = scores.get(holder, 0), sources.get(source, 0)
+                    scores[holder], sources[source] = b, a
+                    return b
+                return swap
+            fn = _OPERATIONS[op]
+            def operation(vm):
+                value = fn(scores.get(holder, 0), sources.get(source, 0))
+                if value is None:
+                    return None
+                scores[holder] = value
+                return value
+            return operation
+        raise InterpreterError(f"unsupported scoreboard action {action}")
+
+    def _condition(self, words, kind):
+        if kind == "score":
+            holder, objective, op = words.word(), words.word(), words.word()
+            scores = self.objective(objective)
+            if op == "matches":
+                low, high = _range(words.word())
+                def matches(vm):
+                    value = scores.get(holder)
+                    return value is not None and low <= value <= high
+                return matches
+            source, source_objective = words.word(), words.word()
+            sources = self.objective(source_objective)
+            compare = _COMPARE[op]
+            def compare_scores(vm):
+                a, b = scores.get(holder), sources.get(source)
+                return a is not None and b is not None and compare(a, b)
+            return compare_scores
+        if kind == "data":
+            target = words.word()
+            storage_id = words.word()
+            if target != "storage":
+                words.word()
+                return lambda vm: False
+            nodes = parse_path(words.word())
+            return lambda vm: bool(path_get(vm.root(storage_id), nodes))
+        # entity/block/predicate/... conditions have nothing to test offline
+        for _ in range({"entity": 1, "block": 4, "blocks": 7, "predicate": 1, "biome": 4, "dimension": 1, "loaded": 3, "function": 1, "items": 3}.get(kind, 0)):
+            words.word()
+        self.unsupported[f"execute if {kind}"] += 1
+        return lambda vm: False
+
+    def _store(self, words):
+        mode, target = words.word(), words.word()
+        success = mode == "success"
+        if target == "score":
+            holder, objective = words.word(), words.word()
+            scores = self.objective(objective)
+            def store_score(vm, value):
+                scores[holder] = (1 if value is not None else 0) if success else (i32(value) if value is not None else 0)
+            return store_score
+        if target == "storage":
+            storage_id, path, nbt_type, scale = words.word(), words.word(), words.word(), float(words.word())
+            nodes = parse_path(path)
+            def store_storage(vm, value):
+                value = (1 if value is not None else 0) if success else (value or 0)
+                if nbt_type in ("float", "double"): value = value * scale
+                else:
+                    value = int(value * scale)
+                    bits = {"byte": 8, "short": 16, "int": 32, "long": 64}[nbt_type]
+                    value = ((value + (1 << (bits - 1))) & ((1 << bits) - 1)) - (1 << (bits - 1))
+                for container, key in path_targets(vm.root(storage_id), nodes, True):
+                    container[key] = value
+            return store_storage
+        for _ in range({"entity": 4, "block": 6, "bossbar": 2}.get(target, 0)):
+            words.word()
+        return lambda vm, value: None
+
+    def _execute(self, words):
+        conditions = []
+        stores = []
+        target = None
+        no_context = False
+        while True:
+            sub = words.word()
+            if sub is None:
+                break
+            if sub in ("if", "unless"):
+                test = self._condition(words, words.word())
+                conditions.append(test if sub == "if" else (lambda t: lambda vm: not t(vm))(test))
+            elif sub == "store":
+                stores.append(self._store(words))
+            elif sub == "run":
+                target = self._compile(_Words(words.rest()))
+                break
+            elif sub in ("as", "at"):
+                if not words.word().startswith("@s"):
+                    no_context = True
+            elif sub in ("positioned", "rotated"):
+                first = words.word()
+                for _ in range(1 if first == "as" else (2 if sub == "positioned" else 1)):
+                    words.word()
+            elif sub == "facing":
+                first = words.word()
+                for _ in range(2 if first == "entity" else 2):
+                    words.word()
+            elif sub in ("align", "anchored", "in", "on", "summon"):
+                words.word()
+            else:
+                raise InterpreterError(f"unsupported execute subcommand {sub}")
+
+        store = None
+        for s in stores:
+            store = _chain(store, (lambda s: lambda vm, value: s(vm, value))(s))
+        def execute(vm):
+            if no_context:
+                return None
+            for test in conditions:
+                if not test(vm):
+                    return None
+            result = target(vm) if target is not None else 1
+            if store is not None:
+                kind = type(result)
+                if kind is Call:
+                    result.then = _chain(store, result.then) if result.then else store
+                elif kind is not Return:
+                    store(vm, result)
+            return result
+        if not stores and not no_context and target is not None and len(conditions) == 1:
+            test = conditions[0]
+            def execute_one(vm):
+                return target(vm) if test(vm) else None
+            return execute_one
+        return execute
+
+    def _function(self, words):
+        name = words.word()
+        if ":" not in name:
+            name = "minecraft:" + name
+        if words.word() != "with":
+            return lambda vm: Call(name, None)
+        source = words.word()
+        storage_id = words.word()
+        path = words.word()
+        if source != "storage":
+            return lambda vm: None
+        nodes = parse_path(path) if path else []
+        def call_with(vm):
+            values = path_get(vm.root(storage_id), nodes) if nodes else [vm.root(storage_id)]
+            if len(values) != 1 or not isinstance(values[0], dict):
+                return None
+            return Call(name, values[0])
+        return call_with
+
+    def _return(self, words):
+        first = words.word()
+        if first == "run":
+            command = self._compile(_Words(words.rest()))
+            def return_run(vm):
+                result = command(vm)
+                kind = type(result)
+                if kind is Call:
+                    result.then = _chain(result.then, _return_value) if result.then else _return_value
+                    return result
+                if kind is Return:
+                    return result
+                return Return(result)
+            return return_run
+        value = None if first == "fail" else int(first)
+        return lambda vm: Return(value)
+
+    def _data(self, words):
+        action = words.word()
+        target = words.word()
+        if target != "storage":
+            return lambda vm: None
+        storage_id = words.word()
+        if action == "get":
+            nodes = parse_path(words.word())
+            scale = words.word()
+            scale = float(scale) if scale else None
+            def get(vm):
+                values = path_get(vm.root(storage_id), nodes)
+                if len(values) != 1:
+                    return None
+                value = values[0]
+                if isinstance(value, (int, float)):
+                    return i32(math.floor(value * scale)) if scale is not None else i32(int(value))
+                return len(value)
+            return get
+        if action == "remove":
+            nodes = parse_path(words.word())
+            def remove(vm):
+                targets = [(c, k) for c, k in path_targets(vm.root(storage_id), nodes, False) if isinstance(k, int) or k in c]
+                for container, key in sorted(targets, key=lambda t: t[1] if isinstance(t[1], int) else 0, reverse=True):
+                    del container[key]
+                return len(targets) or None
+            return remove
+        if action == "merge":
+            value = parse_snbt(words.rest())
+            return lambda vm: 1 if _merge(vm.root(storage_id), value) else None
+        if action == "modify":
+            return self._modify(words, storage_id)
+        raise InterpreterError(f"unsupported data action {action}")
+
+    def _modify(self, words, storage_id):
+        nodes = parse_path(words.word())
+        mode = words.word()
+        index = int(words.word()) if mode == "insert" else None
+        source_kind = words.word()
+        if source_kind == "value":
+            constant = parse_snbt(words.rest())
+            source = lambda vm: [constant]
+        elif source_kind in ("from", "string"):
+            if words.word() != "storage":
+                return lambda vm: None
+            source_id = words.word()
+            source_nodes = parse_path(words.word())
+            if source_kind == "from":
+                source = lambda vm: path_get(vm.root(source_id), source_nodes)
+            else:
+                start, end = words.word(), words.word()
+                start = int(start) if start else 0
+                end = int(end) if end else None
+                def source(vm):
+                    values = path_get(vm.root(source_id), source_nodes)
+                    if len(values) != 1: return []
+                    text = values[0] if isinstance(values[0], str) else macro_text(values[0])
+                    return [text[start:end]]
+        else:
+            raise InterpreterError(f"unsupported data modify source {source_kind}")
+
+        if mode == "set":
+            def modify_set(vm):
+                values = source(vm)
+                if not values: return None
+                value = values[0]
+                changed = 0
+                for container, key in path_targets(vm.root(storage_id), nodes, True):
+                    if not (isinstance(container, dict) and key in container and container[key] == value):
+                        container[key] = _copy(value)
+                        changed += 1
+                return changed or None
+            return modify_set
+        if mode == "merge":
+            def modify_merge(vm):
+                values = source(vm)
+                if not values or not isinstance(values[0], dict): return None
+                changed = 0
+                for container, key in path_targets(vm.root(storage_id), nodes, True):
+                    if not isinstance(container[key] if not isinstance(container, dict) or key in container else None, dict):
+                        container[key] = {}
+                    changed += _merge(container[key], values[0])
+                return changed or None
+            return modify_merge
+        if mode in ("append", "prepend", "insert"):
+            def modify_list(vm):
+                # Every value the source path matches becomes one element
+                items = [_copy(v) for v in source(vm)]
+                if not items: return None
+                count = 0
+                for container, key in path_targets(vm.root(storage_id), nodes, True):
+                    if isinstance(container, dict) and key not in container:
+                        container[key] = []
+                    target = container[key]
+                    if not isinstance(target, list): continue
+                    if mode == "append": target.extend(items)
+                    elif mode == "prepend": target[0:0] = items
+                    else: target[index:index] = items
+                    count += len(items)
+                return count or None
+            return modify_list
+        raise InterpreterError(f"unsupported data modify mode {mode}")
+
+    def _tellraw(self, words):
+        words.word()
+        text = words.rest()
+        try:
+            component = json.loads(text)
+        except ValueError:
+            component = parse_snbt(text)
+        def tellraw(vm):
+            line = vm.render(component)
+            vm.output.append(line)
+            if vm.on_chat: vm.on_chat(line)
+            return 1
+        return tellraw
+
+    def render(self, component):
+        if isinstance(component, str):
+            return component
+        if isinstance(component, list):
+            return "".join(self.render(c) for c in component)
+        out = ""
+        if "text" in component:
+            out = str(component["text"])
+        elif "score" in component:
+            value = self.score(component["score"]["name"], component["score"]["objective"])
+            out = "" if value is None else str(value)
+        elif "nbt" in component and "storage" in component:
+            values = path_get(self.root(component["storage"]), parse_path(component["nbt"]))
+            separator = component.get("separator", ", ")
+            out = self.render(separator).join(v if isinstance(v, str) else to_snbt(v) for v in values)
+        elif "translate" in component:
+            out = component["translate"]
+        for extra in component.get("extra", []):
+            out += self.render(extra)
+        return out
+
+class GuestRunner:
+    """Runs a transpiled MC-RVVM datapack tick by tick and records how many
+    commands each tick and each guest instruction cost."""
+
+    def __init__(self, pack_path, namespace="rv32", echo=True):
+        self.vm = Interpreter(Datapack(pack_path), namespace)
+        self.namespace = namespace
+        if echo:
+            self.vm.on_chat = print
+        self.ticks = []
+
+    def load(self):
+        self.vm.run_tag("minecraft:load")
+        return self.vm.commands
+
+    def halted(self):
+        return self.vm.score("#halt", f"{self.namespace}_temp") == 1
+
+    def tick(self):
+        vm = self.vm
+        commands, instructions = vm.commands, vm.guest_instructions
+        vm.max_depth = 0
+        vm.run_tag("minecraft:tick")
+        record = {"commands": vm.commands - commands, "instructions": vm.guest_instructions - instructions, "max_depth": vm.max_depth}
+        self.ticks.append(record)
+        return record
+
+    def run(self, max_ticks, stop_on_halt=True):
+        load_commands = self.load()
+        for _ in range(max_ticks):
+            if stop_on_halt and self.halted():
+                break
+            self.tick()
+        return self.report(load_commands)
+
+    def report(self, load_commands=0):
+        commands = sum(t["commands"] for t in self.ticks)
+        instructions = sum(t["instructions"] for t in self.ticks)
+        return {
+            "ticks": len(self.ticks),
+            "halted": self.halted(),
+            "load_commands": load_commands,
+            "tick_commands": commands,
+            "guest_instructions": instructions,
+            "commands_per_instruction": round(commands / instructions, 3) if instructions else None,
+            "commands_per_tick": round(commands / len(self.ticks), 1) if self.ticks else None,
+            "max_commands_per_tick": max((t["commands"] for t in self.ticks), default=0),
+            "max_call_depth": max((t["max_depth"] for t in self.ticks), default=0),
+            "unsupported": dict(self.vm.unsupported),
+            "per_tick": self.ticks,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an MC-RVVM datapack without Minecraft")
+    parser.add_argument("datapack", help="Datapack directory or .zip")
+    parser.add_argument("--namespace", default="rv32", help="Datapack namespace")
+    parser.add_argument("--ticks", type=int, default=1000, help="Maximum number of ticks to run")
+    parser.add_argument("--no-halt", action="store_true", help="Keep ticking after the guest halts")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Do not print tellraw output")
+    parser.add_argument("--report", help="Write the JSON report (including per-tick counts) to this file")
+    args = parser.parse_args()
+
+    runner = GuestRunner(args.datapack, args.namespace, echo=not args.quiet)
+    report = runner.run(args.ticks, stop_on_halt=not args.no_halt)
+    print(f"Ticks: {report['ticks']}{' (halted)' if report['halted'] else ''}")
+    print(f"Commands: {report['load_commands']} in load, {report['tick_commands']} in ticks "
+          f"({report['commands_per_tick']} per tick, max {report['max_commands_per_tick']})")
+    print(f"Guest instructions: {report['guest_instructions']} ({report['commands_per_instruction']} commands per instruction)")
+    print(f"Max call depth: {report['max_call_depth']}")
+    if report["unsupported"]:
+        print(f"Unsupported commands skipped: {report['unsupported']}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,13 @@
 import os
+from writer import open_writer
 
 class LibGenerator:
-    def __init__(self, output_dir, namespace="rv32"):
-        self.output_dir = output_dir
+    def __init__(self, writer, namespace="rv32"):
+        self.writer = open_writer(writer) if isinstance(writer, str) else writer
         self.namespace = namespace
         self.lib_costs = {}
 
     def generate(self):
-        for d in ["lib", "mem", "ecall", "debug", "utils", "input"]:
-            os.makedirs(os.path.join(self.output_dir, d), exist_ok=True)
         self.gen_bitwise()
         self.gen_shifts()
         self.gen_math()
@@ -65,13 +64,13 @@ class LibGenerator:
         palette_lines.append(f'data remove storage {self.namespace}:temp gpu_batch')
         palette_lines.append(f'data modify storage {self.namespace}:gpu palette append value {{"text":"\\\\n"}}')
         
-        with open(os.path.join(self.output_dir, "lib", "init_gpu.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "init_gpu.mcfunction")) as f:
             f.write("\n".join(palette_lines) + "\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "screen_kill_old.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_kill_old.mcfunction")) as f:
             f.write(f"$kill @e[type=text_display,tag={self.namespace}_screen_$(screen_id)]\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "screen_init.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_init.mcfunction")) as f:
             f.write(f"execute store result storage {self.namespace}:io screen_id int 1 run scoreboard players get x10 {self.namespace}_reg\n")
             f.write(f"execute store result score #sid {self.namespace}_temp run scoreboard players get x10 {self.namespace}_reg\n")
             f.write(f"execute store result score #facing {self.namespace}_temp run scoreboard players get x11 {self.namespace}_reg\n")
@@ -102,7 +101,7 @@ class LibGenerator:
         ]
 
         for fid, fname, rot, axes in definitions:
-            with open(os.path.join(self.output_dir, "ecall", f"screen_init_facing_{fid}.mcfunction"), 'w') as f:
+            with self.writer.open(os.path.join("ecall", f"screen_init_facing_{fid}.mcfunction")) as f:
                 for g in range(10):
                     for l in range(4):
                         ox, oy = (0, 0)
@@ -122,7 +121,7 @@ class LibGenerator:
                         f.write(f"function {self.namespace}:ecall/screen_calc_pos_{fid}\n")
                         f.write(f"function {self.namespace}:ecall/screen_summon_{fid} with storage {self.namespace}:io\n")
 
-            with open(os.path.join(self.output_dir, "ecall", f"screen_calc_pos_{fid}.mcfunction"), 'w') as f:
+            with self.writer.open(os.path.join("ecall", f"screen_calc_pos_{fid}.mcfunction")) as f:
                 f.write(f"scoreboard players set #scale {self.namespace}_temp 1000\n")
                 f.write(f"scoreboard players set #c_100 {self.namespace}_temp 100\n")
                 f.write(f"scoreboard players set #c_10 {self.namespace}_temp 10\n")
@@ -169,20 +168,20 @@ class LibGenerator:
                 write_axis_calc("y", "#base_y", axes[1])
                 write_axis_calc("z", "#base_z", axes[2])
 
-            with open(os.path.join(self.output_dir, "ecall", f"screen_summon_{fid}.mcfunction"), 'w') as f:
+            with self.writer.open(os.path.join("ecall", f"screen_summon_{fid}.mcfunction")) as f:
                 lines_summon = [
                     f"$summon text_display $(xs)$(xi).$(xd1)$(xd2)$(xd3) $(ys)$(yi).$(yd1)$(yd2)$(yd3) $(zs)$(zi).$(zd1)$(zd2)$(zd3) {{Tags:[\"$(self)_screen\",\"$(self)_screen_$(screen_id)\",\"$(self)_screen_$(screen_id)_$(group)\",\"$(self)_screen_$(screen_id)_$(group)_$(layer)\"],billboard:\"fixed\",Rotation:[{rot}],alignment:\"left\",background:0,text:'\"\"'}}"
                 ]
                 content = "\n".join(lines_summon).replace("$(self)", self.namespace)
                 f.write(content + "\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "screen_flush_apply.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_flush_apply.mcfunction")) as f:
             for g in range(10):
                 for l in range(4):
                     f.write(f"$data modify entity @e[type=text_display,tag={self.namespace}_screen_$(screen_id)_{g}_{l},limit=1] text set value '\"\"'\n")
                     f.write(f"$execute if data storage {self.namespace}:gpu buf_{g}_{l}[0] run data modify entity @e[type=text_display,tag={self.namespace}_screen_$(screen_id)_{g}_{l},limit=1] text set value '$(buf_{g}_{l})'\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "screen_flush.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_flush.mcfunction")) as f:
             for g in range(10):
                 for l in range(4):
                     f.write(f"data modify storage {self.namespace}:gpu buf_{g}_{l} set value []\n")
@@ -194,7 +193,7 @@ class LibGenerator:
             f.write(f"function {self.namespace}:ecall/screen_flush_row\n")
             f.write(f"function {self.namespace}:ecall/screen_flush_apply with storage {self.namespace}:gpu\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "screen_flush_row.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_flush_row.mcfunction")) as f:
             f.write(f"execute if score #curr_y {self.namespace}_temp matches 40.. run return 0\n")
             f.write(f"scoreboard players set #curr_x {self.namespace}_temp 0\n")
             f.write(f"scoreboard players operation #group {self.namespace}_temp = #curr_y {self.namespace}_temp\n")
@@ -204,7 +203,7 @@ class LibGenerator:
             f.write(f"scoreboard players add #curr_y {self.namespace}_temp 1\n")
             f.write(f"function {self.namespace}:ecall/screen_flush_row\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "screen_flush_pixel.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_flush_pixel.mcfunction")) as f:
             f.write(f"execute if score #curr_x {self.namespace}_temp matches 48.. run return 0\n")
             f.write(f"scoreboard players operation #addr_word {self.namespace}_temp = #addr {self.namespace}_temp\n")
             f.write(f"scoreboard players operation #addr_word {self.namespace}_temp /= #four {self.namespace}_const\n")
@@ -231,20 +230,58 @@ class LibGenerator:
             f.write(f"scoreboard players add #curr_x {self.namespace}_temp 1\n")
             f.write(f"function {self.namespace}:ecall/screen_flush_pixel\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "screen_append_pixel.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_append_pixel.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:gpu buf_$(g)_$(l) append from storage {self.namespace}:gpu palette[$(col_idx)]\n")
         
-        with open(os.path.join(self.output_dir, "ecall", "screen_append_nl.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "screen_append_nl.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:gpu buf_$(g)_$(l) append from storage {self.namespace}:gpu palette[4096]\n")
 
     def gen_sleep(self):
-        with open(os.path.join(self.output_dir, "ecall", "sleep.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "sleep.mcfunction")) as f:
             f.write(f"scoreboard players operation #sleep_ticks {self.namespace}_temp = x10 {self.namespace}_reg\n")
             f.write(f"scoreboard players set #ipt_count {self.namespace}_temp 0\n")
 
-        with open(os.path.join(self.output_dir, "lib", "sleep_tick.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "sleep_tick.mcfunction")) as f:
             f.write(f"execute if score #sleep_ticks {self.namespace}_temp matches 1.. run scoreboard players remove #sleep_ticks {self.namespace}_temp 1\n")
 
+    def gen_ras(self, trampoline=False):
+        # Shadow return-address stack: call sites push {pc, f} (see
+        # BlockEmitter), returns pop it and go straight to f when pc matches
+        ns = self.namespace
+        cond = f"execute if score #ipt_count {ns}_temp matches 1.. if score #sleep_ticks {ns}_temp matches ..0 unless score #halt {ns}_temp matches 1 run"
+        with self.writer.open(os.path.join("ras", "ret.mcfunction")) as f:
+            f.write(f"execute unless data storage {ns}:ras stack[0] run return run function {ns}:ras/miss\n")
+            f.write(f"execute store result score #ras_pc {ns}_temp run data get storage {ns}:ras stack[-1].pc\n")
+            f.write(f"data modify storage {ns}:ras top set from storage {ns}:ras stack[-1]\n")
+            f.write(f"data remove storage {ns}:ras stack[-1]\n")
+            f.write(f"execute unless score #ras_pc {ns}_temp = pc {ns}_pc run return run function {ns}:ras/miss\n")
+            if trampoline:
+                # The tick driver runs f next; a miss leaves its default, dispatch/root
+                f.write(f"data modify storage {ns}:tramp next set from storage {ns}:ras top.f\n")
+            else:
+                f.write(f"{cond} function {ns}:ras/jump with storage {ns}:ras top\n")
+        with self.writer.open(os.path.join("ras", "jump.mcfunction")) as f:
+            f.write(f"$return run function {ns}:$(f)\n")
+        with self.writer.open(os.path.join("ras", "miss.mcfunction")) as f:
+            if not trampoline:
+                f.write(f"{cond} function {ns}:dispatch/root\n")
+        self._register_cost("ras/miss", 1)
+        self._register_cost("ras/ret", 7, ["ras/miss"])
+
+    def gen_trampoline(self, steps, check_every=16):
+        # Flat block driver: every step runs the function a block left in
+        # tramp next (its successor when known) and resets it to dispatch/root
+        ns = self.namespace
+        cond = f"execute if score #ipt_count {ns}_temp matches 1.. if score #sleep_ticks {ns}_temp matches ..0 unless score #halt {ns}_temp matches 1 run"
+        with self.writer.open(os.path.join("tramp", "step.mcfunction")) as f:
+            f.write(f'data modify storage {ns}:tramp next set value "dispatch/root"\n')
+            f.write(f"$function {ns}:$(next)\n")
+        with self.writer.open(os.path.join("tramp", "drive.mcfunction")) as f:
+            for i in range(steps):
+                if i and i % check_every == 0:
+                    f.write(f"execute unless score #ipt_count {ns}_temp matches 1.. run return 0\n")
+                f.write(f"{cond} function {ns}:tramp/step with storage {ns}:tramp\n")
+
     def gen_exec_cmd(self):
         MAX_CMD_LEN = 4096
         lines_init = [f'data modify storage {self.namespace}:cmd_template args set value {{}}']
@@ -257,14 +294,14 @@ class LibGenerator:
         if batch:
             lines_init.append(f'data modify storage {self.namespace}:cmd_template args merge value {{{",".join(batch)}}}')
 
-        with open(os.path.join(self.output_dir, "lib", "init_cmd_template.mcfunction"), "w") as f:
+        with self.writer.open(os.path.join("lib", "init_cmd_template.mcfunction")) as f:
             f.write("\n".join(lines_init) + "\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "exec_cmd_resolve_char.mcfunction"), "w") as f:
+        with self.writer.open(os.path.join("ecall", "exec_cmd_resolve_char.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:io_cmd char set from storage {self.namespace}:ascii table[$(char_idx)]\n")
             f.write(f"function {self.namespace}:ecall/exec_cmd_append_char with storage {self.namespace}:io_cmd\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "exec_cmd_append_char.mcfunction"), "w") as f:
+        with self.writer.open(os.path.join("ecall", "exec_cmd_append_char.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:io_cmd args.$(idx) set value '$(char)'\n")
 
         lengths = [256, 512, 1024, 2048, 3072, 4096]
@@ -279,7 +316,7 @@ class LibGenerator:
             f"function {self.namespace}:ecall/exec_cmd_loop_{length}",
             f"function {self.namespace}:ecall/exec_cmd_run_macro_{length} with storage {self.namespace}:io_cmd args"
         ]
-        with open(os.path.join(self.output_dir, "ecall", f"exec_cmd_{length}.mcfunction"), "w") as f:
+        with self.writer.open(os.path.join("ecall", f"exec_cmd_{length}.mcfunction")) as f:
             f.write("\n".join(lines) + "\n")
             
         lines_loop = [
@@ -289,8 +326,8 @@ class LibGenerator:
             f"execute if score #off {self.namespace}_temp matches ..-1 run scoreboard players add #off {self.namespace}_temp 4",
             f"scoreboard players operation #addr_word {self.namespace}_temp = #addr {self.namespace}_temp",
             f"scoreboard players operation #addr_word {self.namespace}_temp /= #four {self.namespace}_const",
-            f"execute store result storage {self.namespace}:io_cmd addr int 1 run scoreboard players get #addr_word {self.namespace}_temp",
-            f"function {self.namespace}:mem/read_lw with storage {self.namespace}:io_cmd",
+            f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #addr_word {self.namespace}_temp",
+            f"function {self.namespace}:mem/read_lw with storage {self.namespace}:io",
             f"scoreboard players operation #w {self.namespace}_temp = #res {self.namespace}_temp",
             f"scoreboard players set #valid {self.namespace}_temp 4",
             f"execute if score #off {self.namespace}_temp matches 1.. run scoreboard players operation #valid {self.namespace}_temp -= #off {self.namespace}_temp",
@@ -352,10 +389,10 @@ class LibGenerator:
 
             f"function {self.namespace}:ecall/exec_cmd_next_word_{length}"
         ]
-        with open(os.path.join(self.output_dir, "ecall", f"exec_cmd_loop_{length}.mcfunction"), "w") as f:
+        with self.writer.open(os.path.join("ecall", f"exec_cmd_loop_{length}.mcfunction")) as f:
             f.write("\n".join(lines_loop) + "\n")
 
-        with open(os.path.join(self.output_dir, "ecall", f"exec_cmd_next_word_{length}.mcfunction"), "w") as f:
+        with self.writer.open(os.path.join("ecall", f"exec_cmd_next_word_{length}.mcfunction")) as f:
             lines_next = [
                 f"scoreboard players operation #off {self.namespace}_temp = #addr {self.namespace}_temp",
                 f"scoreboard players operation #off {self.namespace}_temp %= #four {self.namespace}_const",
@@ -368,7 +405,7 @@ class LibGenerator:
             f.write("\n".join(lines_next) + "\n")
 
         macro_str = "$" + "".join([f"$({i})" for i in range(length)])
-        with open(os.path.join(self.output_dir, "ecall", f"exec_cmd_run_macro_{length}.mcfunction"), "w") as f:
+        with self.writer.open(os.path.join("ecall", f"exec_cmd_run_macro_{length}.mcfunction")) as f:
              f.write(macro_str + "\n")
 
 
@@ -378,10 +415,10 @@ class LibGenerator:
             f"execute store result score #curr_idx {self.namespace}_temp run data get storage {self.namespace}:io dest_idx",
             f"function {self.namespace}:mem/copy_loop"
         ]
-        with open(os.path.join(self.output_dir, "mem", "copy_storage_to_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "copy_storage_to_ram.mcfunction")) as f:
             f.write("\n".join(lines_main) + "\n")
         self._register_cost("mem/copy_storage_to_ram", lines_main)
-        with open(os.path.join(self.output_dir, "load_extra_data.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("load_extra_data.mcfunction")) as f:
             f.write("# dummy file\n")
         
         lines_loop = [
@@ -392,13 +429,13 @@ class LibGenerator:
             f"scoreboard players add #curr_idx {self.namespace}_temp 1",
             f"function {self.namespace}:mem/copy_loop"
         ]
-        with open(os.path.join(self.output_dir, "mem", "copy_loop.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "copy_loop.mcfunction")) as f:
              f.write("\n".join(lines_loop) + "\n")
         
         lines_step = [
             f"$data modify storage {self.namespace}:ram data[$(idx)] set from storage {self.namespace}:temp CopyList[0]"
         ]
-        with open(os.path.join(self.output_dir, "mem", "copy_step.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "copy_step.mcfunction")) as f:
              f.write("\n".join(lines_step) + "\n")
 
     def gen_load_batch(self):
@@ -409,13 +446,13 @@ class LibGenerator:
             f"scoreboard players add #temp {self.namespace}_temp 1",
             f"execute if data storage {self.namespace}:temp Batch[0] run function {self.namespace}:mem/load_batch"
         ]
-        with open(os.path.join(self.output_dir, "mem", "load_batch.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "load_batch.mcfunction")) as f:
             f.write("\n".join(lines) + "\n")
 
         lines_step = [
             f"$data modify storage {self.namespace}:ram data[$(idx)] set from storage {self.namespace}:temp Batch[0]"
         ]
-        with open(os.path.join(self.output_dir, "mem", "load_batch_step.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "load_batch_step.mcfunction")) as f:
             f.write("\n".join(lines_step) + "\n")
 
     def gen_ascii_map(self):
@@ -438,13 +475,11 @@ class LibGenerator:
         for _ in range(127, 256):
              lines_table.append(f'data modify storage {self.namespace}:ascii table append value ""')
              
-        os.makedirs(os.path.join(self.output_dir, "lib", "ascii"), exist_ok=True)
-        with open(os.path.join(self.output_dir, "lib", "ascii", "init_table.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "ascii", "init_table.mcfunction")) as f:
             f.write("\n".join(lines_table) + "\n")
 
         def generate_tree(chars, path):
-            os.makedirs(os.path.join(self.output_dir, "lib", "ascii", os.path.dirname(path)), exist_ok=True)
-            with open(os.path.join(self.output_dir, "lib", "ascii", f"{path}.mcfunction"), 'w') as f:
+            with self.writer.open(os.path.join("lib", "ascii", f"{path}.mcfunction")) as f:
                 if len(chars) == 1:
                     c, val = chars[0]
                     escaped = c.replace('\\', '\\\\').replace('"', '\\"')
@@ -475,7 +510,7 @@ class LibGenerator:
             f"execute if data storage {self.namespace}:uart buffer[0] run tellraw @a {{\"nbt\":\"buffer[]\",\"storage\":\"{self.namespace}:uart\",\"separator\":\"\"}}",
             f"data modify storage {self.namespace}:uart buffer set value []"
         ]
-        with open(os.path.join(self.output_dir, "lib", "uart_flush.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "uart_flush.mcfunction")) as f:
             f.write("\n".join(lines_flush) + "\n")
         self._register_cost("lib/uart_flush", lines_flush)
         
@@ -485,10 +520,10 @@ class LibGenerator:
             f"execute unless score #char {self.namespace}_temp matches 10 run execute store result storage {self.namespace}:io char_idx int 1 run scoreboard players get #char {self.namespace}_temp",
             f"execute unless score #char {self.namespace}_temp matches 10 run function {self.namespace}:lib/uart_append_macro with storage {self.namespace}:io"
         ]
-        with open(os.path.join(self.output_dir, "lib", "uart_putc.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "uart_putc.mcfunction")) as f:
             f.write("\n".join(lines_putc) + "\n")
         
-        with open(os.path.join(self.output_dir, "lib", "uart_append_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "uart_append_macro.mcfunction")) as f:
             f.write(f'$data modify storage {self.namespace}:uart buffer append from storage {self.namespace}:ascii table[$(char_idx)]\n')
 
         self._register_cost("lib/uart_putc", lines_putc, deps=["lib/uart_flush"])
@@ -497,13 +532,13 @@ class LibGenerator:
         return ascii_depth
 
     def gen_keyboard(self):
-        with open(os.path.join(self.output_dir, "utils", "get_input_book.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("utils", "get_input_book.mcfunction")) as f:
             f.write(f'give @s writable_book[custom_data={{{self.namespace}_keyboard:1b}},item_name=\'{{"text":"UART Keyboard","italic":false,"color":"gold"}}\']\n')
 
         lines_tick = [
             f'execute as @a[nbt={{Inventory:[{{Slot:-106b,components:{{"minecraft:custom_data":{{{self.namespace}_keyboard:1b}}}}}}]}}] run function {self.namespace}:input/check_hand'
         ]
-        with open(os.path.join(self.output_dir, "input", "tick.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("input", "tick.mcfunction")) as f:
             f.write("\n".join(lines_tick) + "\n")
 
         lines_check = [
@@ -515,14 +550,14 @@ class LibGenerator:
             f'function {self.namespace}:input/process_page',
             f'data modify storage {self.namespace}:io temp_page set value ""',
         ]
-        with open(os.path.join(self.output_dir, "input", "check_hand.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("input", "check_hand.mcfunction")) as f:
             f.write("\n".join(lines_check) + "\n")
 
         lines_process = [
             f'data modify storage {self.namespace}:io input_buf set from storage {self.namespace}:io temp_page',
             f'function {self.namespace}:input/parse_loop'
         ]
-        with open(os.path.join(self.output_dir, "input", "process_page.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("input", "process_page.mcfunction")) as f:
             f.write("\n".join(lines_process) + "\n")
 
         lines_loop = [
@@ -533,20 +568,20 @@ class LibGenerator:
             f'function {self.namespace}:input/buffer_write',
             f'function {self.namespace}:input/parse_loop'
         ]
-        with open(os.path.join(self.output_dir, "input", "parse_loop.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("input", "parse_loop.mcfunction")) as f:
             f.write("\n".join(lines_loop) + "\n")
 
         lines_extract = [
             f'data modify storage {self.namespace}:io char_str set string storage {self.namespace}:io input_buf 0 1',
             f'data modify storage {self.namespace}:io input_buf set string storage {self.namespace}:io input_buf 1'
         ]
-        with open(os.path.join(self.output_dir, "input", "extract_char.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("input", "extract_char.mcfunction")) as f:
             f.write("\n".join(lines_extract) + "\n")
 
         lines_write = [
             f'data modify storage {self.namespace}:uart rx_buf append from storage {self.namespace}:io char_val'
         ]
-        with open(os.path.join(self.output_dir, "input", "buffer_write.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("input", "buffer_write.mcfunction")) as f:
             f.write("\n".join(lines_write) + "\n")
 
         lines_c2i = [f'data modify storage {self.namespace}:io char_val set value 10']
@@ -564,7 +599,7 @@ class LibGenerator:
             
             lines_c2i.append(f'execute if data storage {self.namespace}:io {{char_str:{match_str}}} run data modify storage {self.namespace}:io char_val set value {i}')
         
-        with open(os.path.join(self.output_dir, "input", "char_to_int.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("input", "char_to_int.mcfunction")) as f:
             f.write("\n".join(lines_c2i) + "\n")
     
     def gen_uart_read(self):
@@ -572,149 +607,151 @@ class LibGenerator:
             f"scoreboard players set x10 {self.namespace}_reg -1",
             f"execute if data storage {self.namespace}:uart rx_buf[0] run function {self.namespace}:lib/uart_pop_byte"
         ]
-        with open(os.path.join(self.output_dir, "lib", "uart_getc.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "uart_getc.mcfunction")) as f:
             f.write("\n".join(lines_getc) + "\n")
         
         lines_pop = [
             f"execute store result score x10 {self.namespace}_reg run data get storage {self.namespace}:uart rx_buf[0]",
             f"data remove storage {self.namespace}:uart rx_buf[0]"
         ]
-        with open(os.path.join(self.output_dir, "lib", "uart_pop_byte.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "uart_pop_byte.mcfunction")) as f:
             f.write("\n".join(lines_pop) + "\n")
 
         self._register_cost("lib/uart_getc", lines_getc)
 
     def gen_math(self):
-        mul_lines = []
-        mul_lines.append(f"scoreboard players set #res {self.namespace}_temp 0")
-        mul_lines.append(f"scoreboard players operation #t1 {self.namespace}_temp = #op1 {self.namespace}_temp")
-        mul_lines.append(f"scoreboard players operation #t2 {self.namespace}_temp = #op2 {self.namespace}_temp")
-        for i in range(32):
-            mul_lines.append(f"scoreboard players operation #bit {self.namespace}_temp = #t2 {self.namespace}_temp")
-            mul_lines.append(f"scoreboard players operation #bit {self.namespace}_temp %= #two {self.namespace}_const")
-            mul_lines.append(f"execute unless score #bit {self.namespace}_temp matches 0 run scoreboard players operation #res {self.namespace}_temp += #t1 {self.namespace}_temp")
-            mul_lines.append(f"scoreboard players operation #t1 {self.namespace}_temp *= #two {self.namespace}_const")
-            mul_lines.append(f"scoreboard players operation #t2 {self.namespace}_temp /= #two {self.namespace}_const")
-        
-        with open(os.path.join(self.output_dir, "lib", "mul.mcfunction"), 'w') as f:
+        # Scoreboard *= is a Java int multiply: exactly the low 32 bits of the product
+        mul_lines = [
+            f"scoreboard players operation #res {self.namespace}_temp = #op1 {self.namespace}_temp",
+            f"scoreboard players operation #res {self.namespace}_temp *= #op2 {self.namespace}_temp",
+        ]
+        with self.writer.open(os.path.join("lib", "mul.mcfunction")) as f:
             f.write("\n".join(mul_lines) + "\n")
         self._register_cost("lib/mul", mul_lines)
-        
-        lines_add64 = [
-            f"scoreboard players operation #rh {self.namespace}_temp += #u1h {self.namespace}_temp",
-            f"scoreboard players operation #old_rl {self.namespace}_temp = #rl {self.namespace}_temp",
-            f"scoreboard players operation #rl {self.namespace}_temp += #u1l {self.namespace}_temp",
-            f"scoreboard players operation #c1 {self.namespace}_temp = #rl {self.namespace}_temp",
-            f"scoreboard players operation #c1 {self.namespace}_temp -= #min_int {self.namespace}_const",
-            f"scoreboard players operation #c2 {self.namespace}_temp = #old_rl {self.namespace}_temp",
-            f"scoreboard players operation #c2 {self.namespace}_temp -= #min_int {self.namespace}_const",
-            f"execute if score #c1 {self.namespace}_temp < #c2 {self.namespace}_temp run scoreboard players add #rh {self.namespace}_temp 1"
+
+        # High word of the unsigned product from 16-bit limbs. Limb products
+        # can exceed 2^31 and wrap, but floorDiv/floorMod by 2^16 still give
+        # their unsigned halves, and the sum wraps to the high word mod 2^32.
+        t = f"{self.namespace}_temp"
+        p16 = f"#p_16 {self.namespace}_const"
+        limb_lines = []
+        for src, lo, hi in (("#op1", "#a0", "#a1"), ("#op2", "#b0", "#b1")):
+            limb_lines += [
+                f"scoreboard players operation {lo} {t} = {src} {t}",
+                f"scoreboard players operation {lo} {t} %= {p16}",
+                f"scoreboard players operation {hi} {t} = {src} {t}",
+                f"scoreboard players operation {hi} {t} /= {p16}",
+                f"scoreboard players operation {hi} {t} %= {p16}",
+            ]
+        mulhu_lines = limb_lines + [
+            f"scoreboard players operation #res {t} = #a1 {t}",
+            f"scoreboard players operation #res {t} *= #b1 {t}",
+            f"scoreboard players operation #mid {t} = #a0 {t}",
+            f"scoreboard players operation #mid {t} *= #b0 {t}",
+            f"scoreboard players operation #mid {t} /= {p16}",
+            f"scoreboard players operation #mid {t} %= {p16}",
         ]
-        with open(os.path.join(self.output_dir, "lib", "add64_u1.mcfunction"), 'w') as f:
-            f.write("\n".join(lines_add64) + "\n")
-        self._register_cost("lib/add64_u1", lines_add64)
-
-        lines_shl64 = [
-            f"scoreboard players operation #u1h {self.namespace}_temp *= #two {self.namespace}_const",
-            f"execute if score #u1l {self.namespace}_temp matches ..-1 run scoreboard players add #u1h {self.namespace}_temp 1",
-            f"scoreboard players operation #u1l {self.namespace}_temp *= #two {self.namespace}_const"
+        for x, y in (("#a0", "#b1"), ("#a1", "#b0")):
+            mulhu_lines += [
+                f"scoreboard players operation #prod {t} = {x} {t}",
+                f"scoreboard players operation #prod {t} *= {y} {t}",
+                f"scoreboard players operation #part {t} = #prod {t}",
+                f"scoreboard players operation #part {t} %= {p16}",
+                f"scoreboard players operation #mid {t} += #part {t}",
+                f"scoreboard players operation #prod {t} /= {p16}",
+                f"scoreboard players operation #prod {t} %= {p16}",
+                f"scoreboard players operation #res {t} += #prod {t}",
+            ]
+        mulhu_lines += [
+            f"scoreboard players operation #mid {t} /= {p16}",
+            f"scoreboard players operation #res {t} += #mid {t}",
         ]
-        with open(os.path.join(self.output_dir, "lib", "shl64_u1.mcfunction"), 'w') as f:
-            f.write("\n".join(lines_shl64) + "\n")
-        self._register_cost("lib/shl64_u1", lines_shl64)
-
-        for op in ["mulh", "mulhu", "mulhsu"]:
-            lines = []
-            lines.append(f"scoreboard players set #rh {self.namespace}_temp 0\nscoreboard players set #rl {self.namespace}_temp 0")
-            lines.append(f"scoreboard players operation #u1l {self.namespace}_temp = #op1 {self.namespace}_temp\nscoreboard players set #u1h {self.namespace}_temp 0")
-            lines.append(f"scoreboard players operation #u2l {self.namespace}_temp = #op2 {self.namespace}_temp\nscoreboard players set #u2h {self.namespace}_temp 0")
-            if op == "mulh":
-                lines.append(f"execute if score #op1 {self.namespace}_temp matches ..-1 run scoreboard players set #u1h {self.namespace}_temp -1")
-                lines.append(f"execute if score #op2 {self.namespace}_temp matches ..-1 run scoreboard players set #u2h {self.namespace}_temp -1")
-            elif op == "mulhsu":
-                lines.append(f"execute if score #op1 {self.namespace}_temp matches ..-1 run scoreboard players set #u1h {self.namespace}_temp -1")
-            for i in range(32):
-                lines.append(f"scoreboard players operation #bit {self.namespace}_temp = #u2l {self.namespace}_temp")
-                lines.append(f"scoreboard players operation #bit {self.namespace}_temp %= #two {self.namespace}_const")
-                lines.append(f"execute unless score #bit {self.namespace}_temp matches 0 run function {self.namespace}:lib/add64_u1")
-                lines.append(f"function {self.namespace}:lib/shl64_u1")
-                lines.append(f"scoreboard players operation #op1 {self.namespace}_temp = #u2l {self.namespace}_temp")
-                lines.append(f"scoreboard players set #op2 {self.namespace}_temp 1")
-                lines.append(f"function {self.namespace}:lib/srl")
-                lines.append(f"scoreboard players operation #u2l {self.namespace}_temp = #res {self.namespace}_temp")
-            lines.append(f"scoreboard players operation #res {self.namespace}_temp = #rh {self.namespace}_temp")
-            
-            with open(os.path.join(self.output_dir, "lib", f"{op}.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("lib", "mulhu.mcfunction")) as f:
+            f.write("\n".join(mulhu_lines) + "\n")
+        self._register_cost("lib/mulhu", mulhu_lines)
+
+        # Signed operands: subtract the other operand for each negative one
+        for op, signed in (("mulh", ("#op1", "#op2")), ("mulhsu", ("#op1",))):
+            lines = [f"function {self.namespace}:lib/mulhu"]
+            for src in signed:
+                other = "#op2" if src == "#op1" else "#op1"
+                lines.append(f"execute if score {src} {t} matches ..-1 run scoreboard players operation #res {t} -= {other} {t}")
+            with self.writer.open(os.path.join("lib", f"{op}.mcfunction")) as f:
                 f.write("\n".join(lines) + "\n")
-            self._register_cost(f"lib/{op}", lines, deps=[("lib/add64_u1", 32), ("lib/shl64_u1", 32), ("lib/srl", 32)])
-
-        divu_lines = []
-        divu_lines.append(f"scoreboard players set #q {self.namespace}_temp 0\nscoreboard players set #r {self.namespace}_temp 0")
-        divu_lines.append(f"execute if score #u2 {self.namespace}_temp matches 0 run scoreboard players set #q {self.namespace}_temp -1")
-        divu_lines.append(f"execute if score #u2 {self.namespace}_temp matches 0 run scoreboard players operation #r {self.namespace}_temp = #u1 {self.namespace}_temp")
-        divu_lines.append(f"execute if score #u2 {self.namespace}_temp matches 0 run return 0")
-        divu_lines.append(f"scoreboard players operation #tu2 {self.namespace}_temp = #u2 {self.namespace}_temp")
-        divu_lines.append(f"scoreboard players operation #tu2 {self.namespace}_temp -= #min_int {self.namespace}_const")
-        for i in range(31, -1, -1):
-            divu_lines.append(f"scoreboard players operation #r {self.namespace}_temp *= #two {self.namespace}_const")
-            if i == 31:
-                divu_lines.append(f"scoreboard players set #bit {self.namespace}_temp 0")
-                divu_lines.append(f"execute if score #u1 {self.namespace}_temp matches ..-1 run scoreboard players set #bit {self.namespace}_temp 1")
-            else:
-                divu_lines.append(f"scoreboard players operation #bit {self.namespace}_temp = #u1 {self.namespace}_temp")
-                if i > 0: divu_lines.append(f"scoreboard players operation #bit {self.namespace}_temp /= #p_{i} {self.namespace}_const")
-                divu_lines.append(f"scoreboard players operation #bit {self.namespace}_temp %= #two {self.namespace}_const")
-                divu_lines.append(f"execute if score #bit {self.namespace}_temp matches ..-1 run scoreboard players add #bit {self.namespace}_temp 2")
-            divu_lines.append(f"scoreboard players operation #r {self.namespace}_temp += #bit {self.namespace}_temp")
-            divu_lines.append(f"scoreboard players operation #tr {self.namespace}_temp = #r {self.namespace}_temp")
-            divu_lines.append(f"scoreboard players operation #tr {self.namespace}_temp -= #min_int {self.namespace}_const")
-            divu_lines.append(f"execute if score #tr {self.namespace}_temp >= #tu2 {self.namespace}_temp run scoreboard players operation #r {self.namespace}_temp -= #u2 {self.namespace}_temp")
-            if i > 0: divu_lines.append(f"execute if score #tr {self.namespace}_temp >= #tu2 {self.namespace}_temp run scoreboard players operation #q {self.namespace}_temp += #p_{i} {self.namespace}_const")
-            else: divu_lines.append(f"execute if score #tr {self.namespace}_temp >= #tu2 {self.namespace}_temp run scoreboard players add #q {self.namespace}_temp 1")
-        
-        with open(os.path.join(self.output_dir, "lib", "divu_logic.mcfunction"), 'w') as f:
+            self._register_cost(f"lib/{op}", lines, deps=["lib/mulhu"])
+
+        # Unsigned division of #op1 by #op2 (nonzero, one of them >= 2^31) into #q and #r
+        divu_lines = [
+            # Divisor >= 2^31: the quotient is 0 or 1, and signed order matches unsigned when both are negative
+            f"execute if score #op2 {t} matches ..-1 run scoreboard players set #q {t} 0",
+            f"execute if score #op2 {t} matches ..-1 if score #op1 {t} matches ..-1 if score #op1 {t} >= #op2 {t} run scoreboard players set #q {t} 1",
+            f"execute if score #op2 {t} matches ..-1 run scoreboard players operation #r {t} = #op1 {t}",
+            f"execute if score #op2 {t} matches ..-1 if score #q {t} matches 1 run scoreboard players operation #r {t} -= #op2 {t}",
+            f"execute if score #op2 {t} matches ..-1 run return 0",
+            # Dividend >= 2^31: divide half of it, double, and correct the remainder once
+            f"scoreboard players operation #q {t} = #op1 {t}",
+            f"scoreboard players operation #q {t} /= #two {self.namespace}_const",
+            f"scoreboard players operation #q {t} -= #min_int {self.namespace}_const",
+            f"scoreboard players operation #q {t} /= #op2 {t}",
+            f"scoreboard players operation #q {t} *= #two {self.namespace}_const",
+            f"scoreboard players operation #tr {t} = #q {t}",
+            f"scoreboard players operation #tr {t} *= #op2 {t}",
+            f"scoreboard players operation #r {t} = #op1 {t}",
+            f"scoreboard players operation #r {t} -= #tr {t}",
+            f"scoreboard players operation #tr {t} = #r {t}",
+            f"scoreboard players operation #tr {t} -= #min_int {self.namespace}_const",
+            f"scoreboard players operation #tu2 {t} = #op2 {t}",
+            f"scoreboard players operation #tu2 {t} -= #min_int {self.namespace}_const",
+            f"execute if score #tr {t} >= #tu2 {t} run scoreboard players add #q {t} 1",
+            f"execute if score #tr {t} >= #tu2 {t} run scoreboard players operation #r {t} -= #op2 {t}",
+        ]
+        with self.writer.open(os.path.join("lib", "divu_logic.mcfunction")) as f:
             f.write("\n".join(divu_lines) + "\n")
         self._register_cost("lib/divu_logic", divu_lines)
 
-        for op in ["divu", "remu", "div", "rem"]:
-            lines = []
-            if op == "divu":
-                lines.append(f"scoreboard players operation #u1 {self.namespace}_temp = #op1 {self.namespace}_temp")
-                lines.append(f"scoreboard players operation #u2 {self.namespace}_temp = #op2 {self.namespace}_temp")
-                lines.append(f"function {self.namespace}:lib/divu_logic")
-                lines.append(f"scoreboard players operation #res {self.namespace}_temp = #q {self.namespace}_temp")
-            elif op == "remu":
-                lines.append(f"scoreboard players operation #u1 {self.namespace}_temp = #op1 {self.namespace}_temp")
-                lines.append(f"scoreboard players operation #u2 {self.namespace}_temp = #op2 {self.namespace}_temp")
-                lines.append(f"function {self.namespace}:lib/divu_logic")
-                lines.append(f"scoreboard players operation #res {self.namespace}_temp = #r {self.namespace}_temp")
-            elif op in ["div", "rem"]:
-                lines.append(f"scoreboard players set #s1 {self.namespace}_temp 0\nscoreboard players set #s2 {self.namespace}_temp 0")
-                lines.append(f"execute if score #op1 {self.namespace}_temp matches ..-1 run scoreboard players set #s1 {self.namespace}_temp 1")
-                lines.append(f"execute if score #op2 {self.namespace}_temp matches ..-1 run scoreboard players set #s2 {self.namespace}_temp 1")
-                lines.append(f"scoreboard players operation #u1 {self.namespace}_temp = #op1 {self.namespace}_temp")
-                lines.append(f"execute if score #s1 {self.namespace}_temp matches 1 run scoreboard players set #zero {self.namespace}_temp 0")
-                lines.append(f"execute if score #s1 {self.namespace}_temp matches 1 run scoreboard players operation #u1 {self.namespace}_temp = #zero {self.namespace}_temp")
-                lines.append(f"execute if score #s1 {self.namespace}_temp matches 1 run scoreboard players operation #u1 {self.namespace}_temp -= #op1 {self.namespace}_temp")
-                lines.append(f"scoreboard players operation #u2 {self.namespace}_temp = #op2 {self.namespace}_temp")
-                lines.append(f"execute if score #s2 {self.namespace}_temp matches 1 run scoreboard players set #zero {self.namespace}_temp 0")
-                lines.append(f"execute if score #s2 {self.namespace}_temp matches 1 run scoreboard players operation #u2 {self.namespace}_temp = #zero {self.namespace}_temp")
-                lines.append(f"execute if score #s2 {self.namespace}_temp matches 1 run scoreboard players operation #u2 {self.namespace}_temp -= #op2 {self.namespace}_temp")
-                lines.append(f"function {self.namespace}:lib/divu_logic")
-                if op == "div":
-                    lines.append(f"scoreboard players operation #res {self.namespace}_temp = #q {self.namespace}_temp")
-                    lines.append(f"execute unless score #s1 {self.namespace}_temp = #s2 {self.namespace}_temp if score #q {self.namespace}_temp matches 1.. run scoreboard players set #zero {self.namespace}_temp 0")
-                    lines.append(f"execute unless score #s1 {self.namespace}_temp = #s2 {self.namespace}_temp if score #q {self.namespace}_temp matches 1.. run scoreboard players operation #res {self.namespace}_temp = #zero {self.namespace}_temp")
-                    lines.append(f"execute unless score #s1 {self.namespace}_temp = #s2 {self.namespace}_temp if score #q {self.namespace}_temp matches 1.. run scoreboard players operation #res {self.namespace}_temp -= #q {self.namespace}_temp")
-                else:
-                    lines.append(f"scoreboard players operation #res {self.namespace}_temp = #r {self.namespace}_temp")
-                    lines.append(f"execute if score #s1 {self.namespace}_temp matches 1 if score #r {self.namespace}_temp matches 1.. run scoreboard players set #zero {self.namespace}_temp 0")
-                    lines.append(f"execute if score #s1 {self.namespace}_temp matches 1 if score #r {self.namespace}_temp matches 1.. run scoreboard players operation #res {self.namespace}_temp = #zero {self.namespace}_temp")
-                    lines.append(f"execute if score #s1 {self.namespace}_temp matches 1 if score #r {self.namespace}_temp matches 1.. run scoreboard players operation #res {self.namespace}_temp -= #r {self.namespace}_temp")
-            
-            with open(os.path.join(self.output_dir, "lib", f"{op}.mcfunction"), 'w') as f:
+        # Scoreboard /= and %= are floorDiv and floorMod: exact for operands
+        # below 2^31, and INT_MIN / -1 wraps to INT_MIN as RISC-V requires
+        for op, result, by_zero in (("divu", "#q", "set #res {t} -1"), ("remu", "#r", "operation #res {t} = #op1 {t}")):
+            wide = [f"function {self.namespace}:lib/divu_logic", f"scoreboard players operation #res {t} = {result} {t}"]
+            with self.writer.open(os.path.join("lib", f"{op}_wide.mcfunction")) as f:
+                f.write("\n".join(wide) + "\n")
+            self._register_cost(f"lib/{op}_wide", wide, deps=["lib/divu_logic"])
+            native = "/=" if op == "divu" else "%="
+            lines = [
+                f"execute if score #op2 {t} matches 0 run return run scoreboard players {by_zero.format(t=t)}",
+                f"execute if score #op1 {t} matches ..-1 run return run function {self.namespace}:lib/{op}_wide",
+                f"execute if score #op2 {t} matches ..-1 run return run function {self.namespace}:lib/{op}_wide",
+                f"scoreboard players operation #res {t} = #op1 {t}",
+                f"scoreboard players operation #res {t} {native} #op2 {t}",
+            ]
+            with self.writer.open(os.path.join("lib", f"{op}.mcfunction")) as f:
+                f.write("\n".join(lines) + "\n")
+            self._register_cost(f"lib/{op}", lines, deps=[f"lib/{op}_wide"])
+
+        # Signed: floor results differ from truncated ones when the floor
+        # remainder is nonzero with a sign other than the dividend's
+        div_lines = [
+            f"execute if score #op2 {t} matches 0 run return run scoreboard players set #res {t} -1",
+            f"scoreboard players operation #res {t} = #op1 {t}",
+            f"scoreboard players operation #res {t} /= #op2 {t}",
+            f"execute if score #op1 {t} matches 0.. if score #op2 {t} matches 0.. run return 0",
+            f"scoreboard players operation #r {t} = #op1 {t}",
+            f"scoreboard players operation #r {t} %= #op2 {t}",
+            f"execute if score #op1 {t} matches ..-1 if score #r {t} matches 1.. run scoreboard players add #res {t} 1",
+            f"execute if score #op1 {t} matches 0.. if score #r {t} matches ..-1 run scoreboard players add #res {t} 1",
+        ]
+        rem_lines = [
+            f"execute if score #op2 {t} matches 0 run return run scoreboard players operation #res {t} = #op1 {t}",
+            f"scoreboard players operation #res {t} = #op1 {t}",
+            f"scoreboard players operation #res {t} %= #op2 {t}",
+            f"execute if score #op1 {t} matches 0.. if score #op2 {t} matches 0.. run return 0",
+            f"execute if score #op1 {t} matches ..-1 if score #res {t} matches 1.. run scoreboard players operation #res {t} -= #op2 {t}",
+            f"execute if score #op1 {t} matches 0.. if score #res {t} matches ..-1 run scoreboard players operation #res {t} -= #op2 {t}",
+        ]
+        for op, lines in (("div", div_lines), ("rem", rem_lines)):
+            with self.writer.open(os.path.join("lib", f"{op}.mcfunction")) as f:
                 f.write("\n".join(lines) + "\n")
-            self._register_cost(f"lib/{op}", lines, deps=["lib/divu_logic"])
+            self._register_cost(f"lib/{op}", lines)
 
     def gen_bitwise(self):
         for op in ["and", "or", "xor"]:
@@ -754,7 +791,7 @@ class LibGenerator:
                 lines.append(f"execute unless score #s1 {self.namespace}_temp matches 1 if score #s2 {self.namespace}_temp matches 1 run scoreboard players operation #res {self.namespace}_temp -= #min_int {self.namespace}_const")
             elif op == "xor":
                 lines.append(f"execute unless score #s1 {self.namespace}_temp = #s2 {self.namespace}_temp run scoreboard players operation #res {self.namespace}_temp -= #min_int {self.namespace}_const")
-            with open(os.path.join(self.output_dir, "lib", f"{op}.mcfunction"), 'w') as f:
+            with self.writer.open(os.path.join("lib", f"{op}.mcfunction")) as f:
                 f.write("\n".join(lines))
 
     def gen_shifts(self):
@@ -776,11 +813,11 @@ class LibGenerator:
                 elif op == "sra":
                     lines.append(f"execute if score #bit {self.namespace}_temp matches 1 run function {self.namespace}:lib/sra_{amt}")
                 lines.append(f"scoreboard players operation #amt {self.namespace}_temp /= #two {self.namespace}_const")
-            with open(os.path.join(self.output_dir, "lib", f"{op}.mcfunction"), 'w') as f: f.write("\n".join(lines))
+            with self.writer.open(os.path.join("lib", f"{op}.mcfunction")) as f: f.write("\n".join(lines))
             if op == "srl":
                 for i in range(5):
                     amt = 1 << i
-                    with open(os.path.join(self.output_dir, "lib", f"srl_{amt}_neg.mcfunction"), 'w') as f:
+                    with self.writer.open(os.path.join("lib", f"srl_{amt}_neg.mcfunction")) as f:
                         lines_srl = [
                             f"scoreboard players operation #res {self.namespace}_temp -= #min_int {self.namespace}_const",
                             f"scoreboard players operation #res {self.namespace}_temp /= #p_{amt} {self.namespace}_const",
@@ -790,7 +827,7 @@ class LibGenerator:
             elif op == "sra":
                 for i in range(5):
                     amt = 1 << i
-                    with open(os.path.join(self.output_dir, "lib", f"sra_{amt}.mcfunction"), 'w') as f:
+                    with self.writer.open(os.path.join("lib", f"sra_{amt}.mcfunction")) as f:
                         for _ in range(amt):
                             f.write(f"scoreboard players operation #old_res {self.namespace}_temp = #res {self.namespace}_temp\n")
                             f.write(f"scoreboard players operation #rem {self.namespace}_temp = #res {self.namespace}_temp\n")
@@ -808,7 +845,7 @@ class LibGenerator:
         SOCKET_BASE = s32(0xfd0a0000) >> 2
         SOCKET_END  = SOCKET_BASE + 135
 
-        with open(os.path.join(self.output_dir, "mem", "init.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "init.mcfunction")) as f:
             zeros = ",".join(["0"] * 136)
             f.write(f"data modify storage {self.namespace}:ram data set value [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]\n")
             for _ in range(18):
@@ -821,27 +858,27 @@ class LibGenerator:
             f.write(f"function {self.namespace}:lib/init_nbt_template\n")
             f.write(f"function {self.namespace}:lib/init_cmd_template\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lw.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lw.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lw_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lw_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lw_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lw_ram.mcfunction")) as f:
             f.write(f"$execute store result score #res {self.namespace}_temp run data get storage {self.namespace}:ram data[$(addr)]\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lw_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lw_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/read_lw_socket_macro with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lw_socket_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lw_socket_macro.mcfunction")) as f:
             f.write(f"$execute store result score #res {self.namespace}_temp run data get storage {self.namespace}:ram data_socket[$(addr)]\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lb.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lb.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lb_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lb_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lb_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lb_ram.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(1,8),(2,16),(3,24),(-3,8),(-2,16),(-1,24)]:
@@ -852,13 +889,13 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches 128..255 run scoreboard players remove #w {self.namespace}_temp 256\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lb_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lb_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/read_lb_socket_macro with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lb_socket_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lb_socket_macro.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data_socket[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(1,8),(2,16),(3,24),(-3,8),(-2,16),(-1,24)]:
@@ -869,11 +906,11 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches 128..255 run scoreboard players remove #w {self.namespace}_temp 256\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lbu.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lbu.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lbu_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lbu_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lbu_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lbu_ram.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(1,8),(2,16),(3,24),(-3,8),(-2,16),(-1,24)]:
@@ -883,13 +920,13 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches ..-1 run scoreboard players operation #w {self.namespace}_temp += #p_8 {self.namespace}_const\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lbu_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lbu_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/read_lbu_socket_macro with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lbu_socket_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lbu_socket_macro.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data_socket[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(1,8),(2,16),(3,24),(-3,8),(-2,16),(-1,24)]:
@@ -899,11 +936,11 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches ..-1 run scoreboard players operation #w {self.namespace}_temp += #p_8 {self.namespace}_const\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lh.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lh.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lh_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lh_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lh_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lh_ram.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(2,16),(-2,16)]:
@@ -914,13 +951,13 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches 32768..65535 run scoreboard players remove #w {self.namespace}_temp 65536\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lh_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lh_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/read_lh_socket_macro with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lh_socket_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lh_socket_macro.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data_socket[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(2,16),(-2,16)]:
@@ -931,11 +968,11 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches 32768..65535 run scoreboard players remove #w {self.namespace}_temp 65536\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lhu.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lhu.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lhu_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/read_lhu_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lhu_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lhu_ram.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(2,16),(-2,16)]:
@@ -945,13 +982,13 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches ..-1 run scoreboard players operation #w {self.namespace}_temp += #p_16 {self.namespace}_const\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lhu_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lhu_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/read_lhu_socket_macro with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "read_lhu_socket_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "read_lhu_socket_macro.mcfunction")) as f:
             f.write(f"$execute store result score #w {self.namespace}_temp run data get storage {self.namespace}:ram data_socket[$(addr)]\n")
             f.write(f"scoreboard players set #shift {self.namespace}_temp 0\n")
             for pos, shift in [(2,16),(-2,16)]:
@@ -961,7 +998,7 @@ class LibGenerator:
                     f"execute if score #w {self.namespace}_temp matches ..-1 run scoreboard players operation #w {self.namespace}_temp += #p_16 {self.namespace}_const\n"
                     f"scoreboard players operation #res {self.namespace}_temp = #w {self.namespace}_temp\n")
 
-        with open(os.path.join(self.output_dir, "mem", "u_div.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "u_div.mcfunction")) as f:
             f.write(f"execute if score #w {self.namespace}_temp matches ..-1 run scoreboard players set #is_neg {self.namespace}_temp 1\n")
             f.write(f"execute unless score #w {self.namespace}_temp matches ..-1 run scoreboard players set #is_neg {self.namespace}_temp 0\n")
             f.write(f"execute if score #is_neg {self.namespace}_temp matches 1 run scoreboard players operation #w {self.namespace}_temp -= #min_int {self.namespace}_const\n")
@@ -972,20 +1009,20 @@ class LibGenerator:
             f.write(f"execute if score #is_neg {self.namespace}_temp matches 1 if score #shift {self.namespace}_temp matches 16 run scoreboard players operation #w {self.namespace}_temp += #p_15 {self.namespace}_const\n")
             f.write(f"execute if score #is_neg {self.namespace}_temp matches 1 if score #shift {self.namespace}_temp matches 24 run scoreboard players operation #w {self.namespace}_temp += #p_7 {self.namespace}_const\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sw.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sw.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/write_sw_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/write_sw_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sw_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sw_ram.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:ram data[$(addr)] set from storage {self.namespace}:io val\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sw_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sw_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/write_sw_socket_macro with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sw_socket_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sw_socket_macro.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:ram data_socket[$(addr)] set from storage {self.namespace}:io val\n")
 
         def _write_sb_body(f, read_macro_fn, write_macro_fn):
@@ -1015,21 +1052,21 @@ class LibGenerator:
                     f"execute store result storage {self.namespace}:io val int 1 run scoreboard players get #old {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/{write_macro_fn} with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sb.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sb.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/write_sb_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/write_sb_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sb_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sb_ram.mcfunction")) as f:
             f.write(f"$execute store result score #old {self.namespace}_temp run data get storage {self.namespace}:ram data[$(addr)]\n")
             _write_sb_body(f, "write_sb_ram", "write_sw_ram")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sb_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sb_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/write_sb_socket_read with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sb_socket_read.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sb_socket_read.mcfunction")) as f:
             f.write(f"$execute store result score #old {self.namespace}_temp run data get storage {self.namespace}:ram data_socket[$(addr)]\n")
             _write_sb_body(f, "write_sb_socket_read", "write_sw_socket_macro")
 
@@ -1055,21 +1092,21 @@ class LibGenerator:
                     f"execute store result storage {self.namespace}:io val int 1 run scoreboard players get #old {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/{write_macro_fn} with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sh.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sh.mcfunction")) as f:
             f.write(f"execute if score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/write_sh_socket\n")
             f.write(f"execute unless score #addr_word {self.namespace}_temp matches {SOCKET_BASE}..{SOCKET_END} run function {self.namespace}:mem/write_sh_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sh_ram.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sh_ram.mcfunction")) as f:
             f.write(f"$execute store result score #old {self.namespace}_temp run data get storage {self.namespace}:ram data[$(addr)]\n")
             _write_sh_body(f, "write_sw_ram")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sh_socket.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sh_socket.mcfunction")) as f:
             f.write(f"scoreboard players operation #socket_idx {self.namespace}_temp = #addr_word {self.namespace}_temp\n")
             f.write(f"scoreboard players add #socket_idx {self.namespace}_temp {-SOCKET_BASE}\n")
             f.write(f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #socket_idx {self.namespace}_temp\n")
             f.write(f"function {self.namespace}:mem/write_sh_socket_read with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "mem", "write_sh_socket_read.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("mem", "write_sh_socket_read.mcfunction")) as f:
             f.write(f"$execute store result score #old {self.namespace}_temp run data get storage {self.namespace}:ram data_socket[$(addr)]\n")
             _write_sh_body(f, "write_sw_socket_macro")
 
@@ -1089,7 +1126,7 @@ class LibGenerator:
             
             f'function {self.namespace}:ecall/read_nbt_run_macro with storage {self.namespace}:io_nbt'
         ]
-        with open(os.path.join(self.output_dir, "ecall", "read_nbt.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "read_nbt.mcfunction")) as f:
             f.write("\n".join(lines) + "\n")
 
         lines_loop = [
@@ -1102,8 +1139,8 @@ class LibGenerator:
             f"scoreboard players operation #addr_word {self.namespace}_temp = #addr {self.namespace}_temp",
             f"scoreboard players operation #addr_word {self.namespace}_temp /= #four {self.namespace}_const",
             
-            f"execute store result storage {self.namespace}:io_nbt addr int 1 run scoreboard players get #addr_word {self.namespace}_temp",
-            f"function {self.namespace}:mem/read_lw with storage {self.namespace}:io_nbt",
+            f"execute store result storage {self.namespace}:io addr int 1 run scoreboard players get #addr_word {self.namespace}_temp",
+            f"function {self.namespace}:mem/read_lw with storage {self.namespace}:io",
             f"scoreboard players operation #w {self.namespace}_temp = #res {self.namespace}_temp",
             
             f"scoreboard players set #valid {self.namespace}_temp 4",
@@ -1177,10 +1214,10 @@ class LibGenerator:
 
             f"function {self.namespace}:ecall/read_nbt_next_word"
         ]
-        with open(os.path.join(self.output_dir, "ecall", "read_nbt_loop.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "read_nbt_loop.mcfunction")) as f:
             f.write("\n".join(lines_loop) + "\n")
             
-        with open(os.path.join(self.output_dir, "ecall", "read_nbt_next_word.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "read_nbt_next_word.mcfunction")) as f:
             lines_next = [
                 f"scoreboard players operation #off {self.namespace}_temp = #addr {self.namespace}_temp",
                 f"scoreboard players operation #off {self.namespace}_temp %= #four {self.namespace}_const",
@@ -1192,14 +1229,14 @@ class LibGenerator:
             ]
             f.write("\n".join(lines_next) + "\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "read_nbt_resolve_char.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "read_nbt_resolve_char.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:io_nbt char set from storage {self.namespace}:ascii table[$(char_idx)]\n")
             f.write(f"function {self.namespace}:ecall/read_nbt_append_char with storage {self.namespace}:io_nbt\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "read_nbt_append_char.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "read_nbt_append_char.mcfunction")) as f:
             f.write(f"$data modify storage {self.namespace}:io_nbt buf set value '$(buf)$(char)'\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "read_nbt_run_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "read_nbt_run_macro.mcfunction")) as f:
              f.write(f"$execute store result score x10 {self.namespace}_reg run data get storage $(source) $(path)\n")
     
     def gen_write_nbt(self):
@@ -1220,14 +1257,14 @@ class LibGenerator:
 
             f'function {self.namespace}:ecall/write_nbt_run_macro with storage {self.namespace}:io_nbt'
         ]
-        with open(os.path.join(self.output_dir, "ecall", "write_nbt.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "write_nbt.mcfunction")) as f:
             f.write("\n".join(lines) + "\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "write_nbt_run_macro.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "write_nbt_run_macro.mcfunction")) as f:
              f.write(f"$data modify storage $(source) $(path) set value $(value)\n")
 
     def gen_ecall(self):
-        with open(os.path.join(self.output_dir, "ecall", "dispatch.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "dispatch.mcfunction")) as f:
             f.write(f"execute if score x17 {self.namespace}_reg matches 1 run function {self.namespace}:ecall/print_int\n")
             f.write(f"execute if score x17 {self.namespace}_reg matches 11 run function {self.namespace}:lib/uart_putc\n")
             f.write(f"execute if score x17 {self.namespace}_reg matches 12 run function {self.namespace}:ecall/syscon\n")
@@ -1247,7 +1284,7 @@ class LibGenerator:
             f.write(f"execute if score x17 {self.namespace}_reg matches 93 run function {self.namespace}:debug/dump_inline\n")
             f.write(f"execute if score x17 {self.namespace}_reg matches 10 run scoreboard players set #halt {self.namespace}_temp 1\n")
         
-        with open(os.path.join(self.output_dir, "ecall", "load_data.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "load_data.mcfunction")) as f:
             f.write(f"scoreboard players operation #addr {self.namespace}_temp = x10 {self.namespace}_reg\n")
             f.write(f"scoreboard players operation #addr {self.namespace}_temp /= #four {self.namespace}_const\n")
             f.write(f"execute store result storage {self.namespace}:io dest_idx int 1 run scoreboard players get #addr {self.namespace}_temp\n")
@@ -1255,14 +1292,14 @@ class LibGenerator:
             f.write(f'data modify storage {self.namespace}:io nbt set value "Data"\n')
             f.write(f"function {self.namespace}:mem/copy_storage_to_ram with storage {self.namespace}:io\n")
 
-        with open(os.path.join(self.output_dir, "ecall", "syscon.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "syscon.mcfunction")) as f:
             f.write(f'execute if score x10 {self.namespace}_reg matches 21845 run tellraw @a [{{"text":"[MC-RVVM] Powering Off.","color":"red"}}]\n')
             f.write(f"execute if score x10 {self.namespace}_reg matches 21845 run scoreboard players set #halt {self.namespace}_temp 1\n")
-        with open(os.path.join(self.output_dir, "ecall", "print_int.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("ecall", "print_int.mcfunction")) as f:
             f.write(f"tellraw @a [{{\"score\":{{\"name\":\"x10\",\"objective\":\"{self.namespace}_reg\"}},\"color\":\"green\"}}]\n")
 
     def gen_debug(self):
-        with open(os.path.join(self.output_dir, "debug", "dump_inline.mcfunction"), 'w') as f:
+        with self.writer.open(os.path.join("debug", "dump_inline.mcfunction")) as f:
             f.write(f"tellraw @a [{{\"text\":\"PC:\",\"color\":\"gray\"}},{{\"score\":{{\"name\":\"pc\",\"objective\":\"{self.namespace}_pc\"}}}},{{\"text\":\" | \",\"color\":\"dark_gray\"}}")
             for i in [1, 2, 8, 10, 11, 12, 13, 14, 15, 17]:
                 f.write(f",{{\"text\":\"x{i}:\",\"color\":\"aqua\"}},{{\"score\":{{\"name\":\"x{i}\",\"objective\":\"{self.namespace}_reg\"}}}},{{\"text\":\" \",\"color\":\"white\"}}")
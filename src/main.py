@@ -1,181 +1,271 @@
 import argparse
+import math
 import os
 import shutil
 import json
 import struct
-import re
+from array import array
 from decoder import Decoder
 from transpiler import Transpiler
-from dispatcher import DispatcherGenerator
+from dispatcher import DispatcherGenerator, DISPATCH_MODES, DEFAULT_WAYS, DEFAULT_PAGE_SIZE
 from lib_gen import LibGenerator
-from block_optimizer import BlockOptimizer
+from block_optimizer import BlockOptimizer, INLINE_SIZE, INLINE_COST, SUPERBLOCK_SIZE
+from emitter import BlockEmitter, DRIVERS
+from command_ir import CommandOptimizer
+from const_fold import s32
+from build_cache import BuildCache, hash_key
+from writer import BufferWriter, open_writer
+from elf_loader import ElfImage, is_elf, read_map_symbols
+from reachability import ReachabilityAnalyzer, tree_depth
+from profiler import BuildProfiler
+from simulator import read_profile
 
 def main():
     parser = argparse.ArgumentParser(description="RV32 ELF to Minecraft Datapack Compile")
-    parser.add_argument("input_file", help="Path to the binary file (.bin) or hex dump")
-    parser.add_argument("output_dir", help="Output directory for the datapack")
+    parser.add_argument("input_file", help="Path to the RV32 ELF executable or flat binary file (.bin)")
+    parser.add_argument("output_dir", help="Output directory for the datapack (a path ending in .zip writes a zipped datapack)")
     parser.add_argument("--namespace", default="rv32", help="Datapack namespace")
     parser.add_argument("--map_file", help="Path to linker map file (.map) for optimization")
     parser.add_argument("--optimize", "-O", action="store_true", help="Enable block optimization")
     parser.add_argument("--ipt", type=int, default=2500, help="Instructions per tick (max 4800)")
+    parser.add_argument("--reachable", action="store_true", help="Only transpile code reachable from the entry point and symbols")
+    parser.add_argument("--incremental", action="store_true", help="Only rewrite files whose inputs changed since the last build")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes for file emission (0 = all cores)")
+    parser.add_argument("--profile", metavar="REPORT", help="Write per-phase timing, memory and output statistics to a JSON file")
+    parser.add_argument("--dispatch", choices=DISPATCH_MODES, default="bst", help="Dispatch tree shape: midpoint split (bst), weight-balanced on the block weights (weighted) or a macro jump to a weighted tree per page (page)")
+    parser.add_argument("--dispatch-ways", type=int, default=DEFAULT_WAYS, metavar="K", help=f"Range checks per dispatch tree node, at least 2 (default {DEFAULT_WAYS})")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, metavar="BYTES", help=f"Page size of --dispatch page, a power of two (default {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--ras", action="store_true", help="Predict function returns with a shadow return-address stack instead of dispatching (with -O)")
+    parser.add_argument("--inline-size", type=int, default=INLINE_SIZE, metavar="N", help=f"Inline leaf functions of at most N instructions at their call sites (with -O, 0 = off, default {INLINE_SIZE})")
+    parser.add_argument("--inline-cost", type=int, default=INLINE_COST, metavar="C", help=f"Only inline leaf bodies estimated at C commands or less (default {INLINE_COST})")
+    parser.add_argument("--superblock", type=int, default=SUPERBLOCK_SIZE, metavar="N", help=f"Merge each block with its likely successors up to N instructions (with -O, 0 = off, default {SUPERBLOCK_SIZE})")
+    parser.add_argument("--no-peephole", action="store_true", help="Skip the peephole pass over block commands (with -O)")
+    parser.add_argument("--driver", choices=DRIVERS, default="chain", help="How blocks continue (with -O): call their successor directly (chain) or leave it to a flat driver loop in tick (trampoline)")
+    parser.add_argument("--instrument", action="store_true", help="Count how often every block/instruction function runs in the rv32_prof scoreboard")
+    parser.add_argument("--profile-in", metavar="PROFILE", help="Weight the dispatcher with execution counts from simulator.py --profile-out")
     args = parser.parse_args()
-    
+    if args.page_size <= 0 or args.page_size & (args.page_size - 1):
+        parser.error(f"--page-size must be a power of two, got {args.page_size}")
+    if args.dispatch_ways < 2:
+        parser.error(f"--dispatch-ways must be at least 2, got {args.dispatch_ways}")
+    if args.ras and not args.optimize:
+        print("--ras needs -O (instruction mode dispatches every instruction); ignoring it.")
+        args.ras = False
+    if args.driver != "chain" and not args.optimize:
+        print("--driver needs -O (instruction mode already dispatches from tick); ignoring it.")
+        args.driver = "chain"
+    trampoline = args.driver == "trampoline"
+
+    profiler = BuildProfiler()
+    profiler.phase("decode")
     ipt = min(args.ipt, 4800)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
     print(f"Reading {args.input_file}...")
     with open(args.input_file, 'rb') as f:
         data = f.read()
 
-    decoder = Decoder(data)
-    instructions = decoder.decode_all()
+    entry = 0
+    symbols = None
+    if is_elf(data):
+        image = ElfImage(data)
+        print(f"Loaded ELF: {image.summary()}.")
+        instructions = image.decode_table()
+        try:
+            data = image.memory_image()
+        except ValueError as e:
+            raise SystemExit(f"{args.input_file}: {e}")
+        symbols = image.symbols
+        entry = image.entry
+    else:
+        decoder = Decoder(data)
+        instructions = decoder.decode_table()
     print(f"Decoded {len(instructions)} instructions.")
 
+    entries_before = None
+    if args.reachable:
+        profiler.phase("reachability")
+        if symbols is None and args.map_file:
+            symbols = read_map_symbols(args.map_file)
+        total = len(instructions)
+        entries_before = BlockOptimizer(instructions, None, symbols or {}).count_blocks() if args.optimize else total
+        reachable = ReachabilityAnalyzer(instructions, data).analyze([entry] + sorted(symbols or ()))
+        instructions = instructions.select([i for i, addr in enumerate(instructions.address) if addr in reachable])
+        print(f"Reachability: {len(instructions)} of {total} instructions reachable, {total - len(instructions)} dropped.")
+
     blocks = []
     weights = {}
     block_starts = set()
+    jump_tables = {}
 
     if args.optimize:
+        profiler.phase("optimize")
         print("Optimizing blocks...")
-        optimizer = BlockOptimizer(instructions, args.map_file)
+        optimizer = BlockOptimizer(instructions, args.map_file, symbols, entry, data)
         blocks, weights = optimizer.optimize()
         block_starts = {b['start'] for b in blocks}
+        jump_tables = {b['end']: b['jump'][1] for b in blocks if b.get('jump', ("",))[0] == "table"}
+        cfg = optimizer.cfg
         print(f"Identified {len(blocks)} blocks.")
+        direct = sum(1 for b in blocks if b.get('jump', ("",))[0] == "direct")
+        print(f"Indirect jumps: {direct} resolved to a constant target, {len(jump_tables)} through known tables.")
+        print(f"Static estimate: {len(cfg.functions)} functions, {len(cfg.calls)} call sites, "
+              f"{len(cfg.loops)} loops (max nesting {max(cfg.depth.values(), default=0)}).")
+        if args.profile_in:
+            weights = read_profile(args.profile_in, dispatch=True)
+            dispatched = sum(1 for start in block_starts if start in weights)
+            print(f"Profile: {dispatched} of {len(blocks)} blocks reached through dispatch.")
         sorted_weights = sorted(weights.items(), key=lambda x: x[1], reverse=True)
         print("Top 3 Hotspots:")
         for addr, w in sorted_weights[:3]:
             print(f"  {hex(addr)}: Weight {w}")
 
-    if os.path.exists(args.output_dir):
-        shutil.rmtree(args.output_dir)
-    
-    data_dir = os.path.join(args.output_dir, "data", args.namespace, "function")
-    os.makedirs(data_dir, exist_ok=True)
-    
-    dispatch_dir = os.path.join(data_dir, "dispatch")
-    os.makedirs(dispatch_dir, exist_ok=True)
+    elif args.profile_in:
+        weights = read_profile(args.profile_in, per_instruction=True)
+        print(f"Profile: {len(weights)} of {len(instructions)} instructions executed.")
+
+    if entries_before is not None:
+        entries = len(blocks) if args.optimize else len(instructions)
+        # One function per entry plus the dispatch tree nodes and dispatch/root
+        files = lambda n: n + math.ceil((n - 1) / (args.dispatch_ways - 1)) + 1 if n else 0
+        print(f"Reachability: {files(entries_before) - files(entries)} fewer function files ({files(entries_before)} -> {files(entries)}), "
+              f"dispatch depth {tree_depth(entries_before, args.dispatch_ways)} -> {tree_depth(entries, args.dispatch_ways)}.")
+
+    profiler.phase("dispatch")
+    writer = open_writer(args.output_dir)
+    profiler.writer = writer
+    cache = None
+    if args.incremental and not writer.parallel_safe:
+        print("Incremental: zip output is always rebuilt in full.")
+    elif args.incremental:
+        cache = BuildCache(args.output_dir, {"namespace": args.namespace, "optimize": args.optimize, "instrument": args.instrument, "ras": args.ras, "driver": args.driver, "peephole": not args.no_peephole})
+        if not cache.reusable():
+            print("Incremental: no usable manifest, doing a full build.")
+            cache.reset()
+
+    if cache is None or not cache.old:
+        writer.reset()
     
-    dispatcher = DispatcherGenerator(instructions, dispatch_dir, args.namespace)
-    dispatch_depth = dispatcher.generate(weights if args.optimize else None, block_starts if args.optimize else None)
-    if dispatch_depth is None: dispatch_depth = 0
-
-    lib_gen = LibGenerator(data_dir, args.namespace)
-    ascii_depth, lib_costs = lib_gen.generate()
-    if ascii_depth is None: ascii_depth = 0
-    if "ecall/dispatch" not in lib_costs: lib_costs["ecall/dispatch"] = 20 + ascii_depth
+    data_writer = writer.child(f"data/{args.namespace}/function")
+    dispatch_writer = data_writer.child("dispatch")
+    dispatch_key = None
+    dispatch_record = None
+    if cache:
+        dispatch_addrs = sorted(block_starts) if args.optimize else instructions.address
+        dispatch_key = hash_key(array('I', dispatch_addrs).tobytes(), sorted(weights.items()), args.dispatch, args.dispatch_ways, args.page_size, sorted(jump_tables.items()))
+        dispatch_record = cache.section("dispatch", dispatch_key)
+
+    if dispatch_record and dispatch_writer.exists(""):
+        dispatch_depth, dispatch_commands = dispatch_record["depth"], dispatch_record["commands"]
+        print("Incremental: dispatch tree unchanged.")
+    else:
+        if dispatch_writer.exists(""):
+            shutil.rmtree(dispatch_writer.path())
+        dispatcher = DispatcherGenerator(instructions, dispatch_writer, args.namespace, args.dispatch, args.instrument, args.dispatch_ways, args.page_size)
+        dispatch_depth = dispatcher.generate(weights, block_starts if args.optimize else None, jobs=jobs)
+        if dispatch_depth is None: dispatch_depth = 0
+        dispatch_commands = dispatcher.worst_commands
+        dispatcher.generate_tables(jump_tables)
+        if dispatch_depth:
+            stats = dispatcher.stats()
+            shape = f"{dispatcher.ways}-way" + (f", {args.page_size}-byte pages" if args.dispatch == "page" else "")
+            print(f"Dispatch ({args.dispatch}, {shape}): expected depth {stats['expected_depth']:.2f} "
+                  f"({stats['expected_commands']:.2f} commands), worst-case depth {stats['worst_depth']} "
+                  f"({dispatch_commands} commands).")
+    if cache: cache.record("dispatch", dispatch_key, depth=dispatch_depth, commands=dispatch_commands)
+
+    profiler.phase("lib")
+    lib_record = cache.section("lib", "static") if cache else None
+    if lib_record and data_writer.exists("lib"):
+        ascii_depth, lib_costs = lib_record["ascii_depth"], lib_record["lib_costs"]
+        print("Incremental: lib/, mem/, ecall/ and input/ unchanged.")
+    else:
+        lib_gen = LibGenerator(data_writer, args.namespace)
+        ascii_depth, lib_costs = lib_gen.generate()
+        if ascii_depth is None: ascii_depth = 0
+        if "ecall/dispatch" not in lib_costs: lib_costs["ecall/dispatch"] = 20 + ascii_depth
+    if cache: cache.record("lib", "static", ascii_depth=ascii_depth, lib_costs=lib_costs)
+    if args.ras:
+        ras_gen = LibGenerator(data_writer, args.namespace)
+        ras_gen.gen_ras(trampoline)
+        lib_costs.update(ras_gen.lib_costs)
+    if trampoline:
+        # A step runs at least one instruction, so ipt steps always finish the tick
+        LibGenerator(data_writer, args.namespace).gen_trampoline(ipt)
     
+    profiler.phase("emit")
+    peephole = None
+    if args.optimize and not args.no_peephole:
+        # Summaries of what the library functions read, from their generated text
+        library = BufferWriter()
+        LibGenerator(library, args.namespace).generate()
+        peephole = CommandOptimizer(args.namespace, {path[:-len(".mcfunction")]: text.splitlines() for path, text in library.files})
     transpiler = Transpiler(instructions, args.namespace)
-    max_instr_cost = 0
-    func_pattern = re.compile(f"function {args.namespace}:([a-zA-Z0-9_./]+)")
-    
-    instr_lines_map = {}
-    for instr in instructions:
-        lines = transpiler.convert_instruction(instr, include_pc_update=True)
-        lines.append(f"scoreboard players remove #ipt_count {args.namespace}_temp 1")
-        if instr.name in ["ecall", "ebreak"]:
-            lines.append("return 0")
-        instr_lines_map[instr.address] = lines
-        
-        cost = 0
-        for line in lines:
-            cost += 1
-            match = func_pattern.search(line)
-            if match:
-                called_func = match.group(1)
-                if called_func in lib_costs: cost += lib_costs[called_func]
-                elif "ascii" in called_func: cost += ascii_depth
-                else: cost += 50 
-        if cost > max_instr_cost: max_instr_cost = cost
-
-    if not args.optimize:
-        for instr in instructions:
-            fname = f"i_{hex(instr.address)[2:]}.mcfunction"
-            with open(os.path.join(data_dir, fname), 'w') as f:
-                f.write("\n".join(instr_lines_map[instr.address]))
+    emitter = BlockEmitter(transpiler, data_writer, args.namespace, lib_costs, ascii_depth, block_starts, cache, args.instrument, args.ras, trampoline, peephole)
+    if args.optimize and args.inline_size > 0:
+        inlined = optimizer.inline_leaves(args.inline_size, args.inline_cost, lambda instr: emitter.lines_cost(emitter.instruction_lines(instr)))
+        print(f"Inlined {inlined} calls to small leaf functions.")
+    if args.optimize and args.superblock > 0:
+        trace_weights = read_profile(args.profile_in) if args.profile_in else optimizer.weights
+        copied = optimizer.form_superblocks(args.superblock, trace_weights)
+        print(f"Superblocks: {copied} blocks copied into the traces of {sum(1 for b in blocks if 'trace' in b)} blocks.")
+    items = blocks if args.optimize else instructions
+    if jobs > 1 and len(items) > jobs:
+        max_instr_cost = emitter.emit_parallel(items, args.optimize, jobs)
+    elif args.optimize:
+        max_instr_cost = emitter.emit_blocks(blocks)
+    else:
+        max_instr_cost = emitter.emit_instructions(instructions)
+    stats = emitter.stats
+    if stats["fold_blocks"]:
+        print(f"Constant folding: {stats['fold_saved']} commands saved in {stats['fold_blocks']} blocks "
+              f"({stats['fold_saved'] / stats['fold_blocks']:.1f} per block).")
+    if peephole:
+        print(f"Peephole: {stats['peephole_saved']} commands removed in {stats['peephole_blocks']} blocks.")
+        if stats["peephole_rejected"]:
+            print(f"Peephole: {stats['peephole_rejected']} rewrites failed the equivalence check and were dropped.")
+    if cache:
+        cache.record_functions(emitter.entries)
+        cache.remove_stale(data_writer)
+        print(f"Incremental: rewrote {emitter.rewritten} function files, reused {emitter.reused}, removed {cache.removed} stale.")
 
-    if args.optimize:
-        for block in blocks:
-            fname = f"b_{hex(block['start'])[2:]}.mcfunction"
-            content = []
-            
-            content.append(f"scoreboard players remove #ipt_count {args.namespace}_temp {block['length']}")
-
-            last_idx = len(block['instrs']) - 1
-            for i, instr in enumerate(block['instrs']):
-                is_last = (i == last_idx)
-                is_jmp_type = instr.name in ["jal", "jalr", "beq", "bne", "blt", "bge", "bltu", "bgeu"]
-                
-                if is_last and is_jmp_type:
-                    content.extend(transpiler.convert_instruction(instr, include_pc_update=True))
-                else:
-                    content.extend(transpiler.convert_instruction(instr, include_pc_update=False))
-                
-                if instr.name in ["ecall", "ebreak"]:
-                    content.append("return 0")
-            
-            last_instr = block['instrs'][-1]
-            next_addr = (last_instr.address + 4) & 0xFFFFFFFF
-            
-            is_uncond_jump = last_instr.name in ["jal", "jalr", "ecall", "ebreak"]
-            is_branch = last_instr.name in ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
-            
-            if not is_branch and not is_uncond_jump:
-                 content.append(f"scoreboard players set pc {args.namespace}_pc {next_addr}")
-
-            cond = f"execute if score #ipt_count {args.namespace}_temp matches 1.. if score #sleep_ticks {args.namespace}_temp matches ..0 unless score #halt {args.namespace}_temp matches 1 run"
-            target_addr = None
-            if is_branch or last_instr.name == "jal":
-                 target_addr = (last_instr.address + last_instr.imm) & 0xFFFFFFFF
-            
-            if is_branch:
-                if target_addr is not None and target_addr in block_starts:
-                     content.append(f"{cond} execute if score pc {args.namespace}_pc matches {target_addr} run function {args.namespace}:b_{hex(target_addr)[2:]}")
-                if next_addr in block_starts:
-                     content.append(f"{cond} execute if score pc {args.namespace}_pc matches {next_addr} run function {args.namespace}:b_{hex(next_addr)[2:]}")
-            elif last_instr.name == "jal":
-                if target_addr is not None and target_addr in block_starts:
-                    content.append(f"{cond} function {args.namespace}:b_{hex(target_addr)[2:]}")
-            elif last_instr.name == "jalr":
-                 content.append(f"{cond} function {args.namespace}:dispatch/root")
-            elif last_instr.name in ["ecall", "ebreak"]:
-                 if next_addr in block_starts:
-                     content.append(f"{cond} function {args.namespace}:b_{hex(next_addr)[2:]}")
-            else:
-                 if next_addr in block_starts:
-                     content.append(f"{cond} function {args.namespace}:b_{hex(next_addr)[2:]}")
-
-            with open(os.path.join(data_dir, fname), 'w') as f:
-                f.write("\n".join(content))
-
-    total_chain = ipt * (max_instr_cost + dispatch_depth)
+    total_chain = ipt * (max_instr_cost + dispatch_commands)
     print(f"Calculated Max Potential Chain: {total_chain} commands per tick (IPT={ipt})")
     
-    with open(os.path.join(args.output_dir, "pack.mcmeta"), 'w') as f:
+    profiler.phase("data")
+    with writer.open("pack.mcmeta") as f:
         json.dump({"pack": {"pack_format": 48, "description": "MC-RVVM 1.21"}}, f, indent=4)
 
     padded_data = data + b'\x00' * ((4 - len(data) % 4) % 4)
-    with open(os.path.join(data_dir, "mem", "load_data.mcfunction"), 'w') as f:
-        batch_size = 128
-        words = [struct.unpack_from("<i", padded_data, i)[0] for i in range(0, len(padded_data), 4)]
-        for i in range(0, len(words), batch_size):
-            batch_str = ",".join(map(str, words[i:i+batch_size]))
-            f.write(f"data modify storage {args.namespace}:temp Batch set value [{batch_str}]\n")
-            f.write(f"execute store result storage {args.namespace}:io start_idx int 1 run scoreboard players set #temp {args.namespace}_temp {i}\n")
-            f.write(f"function {args.namespace}:mem/load_batch with storage {args.namespace}:io\n")
-
-    with open(os.path.join(data_dir, "reset.mcfunction"), 'w') as f:
+    load_data_path = "mem/load_data.mcfunction"
+    data_key = hash_key(padded_data) if cache else None
+    if not (cache and cache.section("data", data_key) and data_writer.exists(load_data_path)):
+        with data_writer.open(load_data_path) as f:
+            batch_size = 128
+            words = [struct.unpack_from("<i", padded_data, i)[0] for i in range(0, len(padded_data), 4)]
+            for i in range(0, len(words), batch_size):
+                batch_str = ",".join(map(str, words[i:i+batch_size]))
+                f.write(f"data modify storage {args.namespace}:temp Batch set value [{batch_str}]\n")
+                f.write(f"execute store result storage {args.namespace}:io start_idx int 1 run scoreboard players set #temp {args.namespace}_temp {i}\n")
+                f.write(f"function {args.namespace}:mem/load_batch with storage {args.namespace}:io\n")
+    if cache: cache.record("data", data_key)
+
+    with data_writer.open("reset.mcfunction") as f:
         for i in range(32): f.write(f"scoreboard players set x{i} {args.namespace}_reg 0\n")
-        f.write(f"scoreboard players set pc {args.namespace}_pc 0\n")
+        f.write(f"scoreboard players set pc {args.namespace}_pc {s32(entry)}\n")
         f.write(f"scoreboard players set #halt {args.namespace}_temp 0\n")
         f.write(f"scoreboard players set #halt_notified {args.namespace}_temp 0\n")
         f.write(f"scoreboard players set #sleep_ticks {args.namespace}_temp 0\n")
         f.write(f"scoreboard players set #ipt_count {args.namespace}_temp 0\n")
         f.write(f"data modify storage {args.namespace}:uart buffer set value []\n")
         f.write(f"data modify storage {args.namespace}:uart rx_buf set value []\n")
+        if args.ras: f.write(f"data modify storage {args.namespace}:ras stack set value []\n")
+        if trampoline: f.write(f'data modify storage {args.namespace}:tramp next set value "dispatch/root"\n')
         f.write(f"data merge storage {args.namespace}:io {{}}\n")
         f.write(f"function {args.namespace}:mem/load_data\n")
         f.write(f"function {args.namespace}:load_extra_data\n")
         f.write("tellraw @a [{\"text\":\"[MC-RVVM] VM Reset.\",\"color\":\"yellow\"}]\n")
     
-    with open(os.path.join(data_dir, "tick.mcfunction"), 'w') as f:
+    with data_writer.open("tick.mcfunction") as f:
         f.write(f"function {args.namespace}:input/tick\n")
         f.write(f"scoreboard players set #is_sleeping {args.namespace}_temp 0\n")
         f.write(f"execute if score #sleep_ticks {args.namespace}_temp matches 1.. run scoreboard players set #is_sleeping {args.namespace}_temp 1\n")
@@ -183,19 +273,23 @@ def main():
         f.write(f"execute if score #is_sleeping {args.namespace}_temp matches 1 run return 0\n")
         
         f.write(f"scoreboard players set #ipt_count {args.namespace}_temp {ipt}\n")
-        loop_count = 10 if args.optimize else 300
-        for _ in range(loop_count):
-            f.write(f"execute if score #ipt_count {args.namespace}_temp matches 1.. if score #sleep_ticks {args.namespace}_temp matches ..0 unless score #halt {args.namespace}_temp matches 1 run function {args.namespace}:dispatch/root\n")
+        if trampoline:
+            f.write(f"function {args.namespace}:tramp/drive\n")
+        else:
+            loop_count = 10 if args.optimize else 300
+            for _ in range(loop_count):
+                f.write(f"execute if score #ipt_count {args.namespace}_temp matches 1.. if score #sleep_ticks {args.namespace}_temp matches ..0 unless score #halt {args.namespace}_temp matches 1 run function {args.namespace}:dispatch/root\n")
         
         f.write(f"execute if score #halt {args.namespace}_temp matches 1 unless score #halt_notified {args.namespace}_temp matches 1 run tellraw @a [{{\"text\":\"[MC-RVVM] Stopped.\",\"color\":\"red\"}}]\n")
         f.write(f"execute if score #halt {args.namespace}_temp matches 1 run scoreboard players set #halt_notified {args.namespace}_temp 1\n")
 
-    with open(os.path.join(data_dir, "load.mcfunction"), 'w') as f:
+    with data_writer.open("load.mcfunction") as f:
         f.write("gamerule maxCommandChainLength 2147483646\n")
         f.write(f"scoreboard objectives add {args.namespace}_reg dummy\n")
         f.write(f"scoreboard objectives add {args.namespace}_pc dummy\n")
         f.write(f"scoreboard objectives add {args.namespace}_temp dummy\n")
         f.write(f"scoreboard objectives add {args.namespace}_const dummy\n")
+        if args.instrument: f.write(f"scoreboard objectives add {args.namespace}_prof dummy\n")
         f.write(f"scoreboard players set #four {args.namespace}_const 4\n")
         f.write(f"scoreboard players set #two {args.namespace}_const 2\n")
         for i in range(31): f.write(f"scoreboard players set #p_{i} {args.namespace}_const {1 << i}\n")
@@ -207,13 +301,23 @@ def main():
         f.write(f"function {args.namespace}:reset\n")
         f.write("tellraw @a [{\"text\":\"[MC-RVVM] Loaded.\",\"color\":\"green\"}]\n")
 
-    tag_dir = os.path.join(args.output_dir, "data", "minecraft", "tags", "function")
-    os.makedirs(tag_dir, exist_ok=True)
-    with open(os.path.join(tag_dir, "tick.json"), 'w') as f:
+    if args.instrument:
+        with data_writer.open("prof/reset.mcfunction") as f:
+            f.write(f"scoreboard players reset * {args.namespace}_prof\n")
+
+    tag_writer = writer.child("data/minecraft/tags/function")
+    with tag_writer.open("tick.json") as f:
         json.dump({"values": [f"{args.namespace}:tick"]}, f, indent=4)
-    with open(os.path.join(tag_dir, "load.json"), 'w') as f:
+    with tag_writer.open("load.json") as f:
         json.dump({"values": [f"{args.namespace}:load"]}, f, indent=4)
 
+    writer.close()
+    if cache: cache.save()
+    if args.profile:
+        profiler.save(args.profile, input_file=args.input_file, instructions=len(instructions),
+                      blocks=len(blocks), optimize=args.optimize, jobs=jobs, dispatch=args.dispatch,
+                      dispatch_ways=args.dispatch_ways, dispatch_depth=dispatch_depth, dispatch_commands=dispatch_commands)
+        print(f"Profile written to {args.profile}")
     print("Done! Datapack generated at:", args.output_dir)
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_mb():
+    # Peak resident set size of this process and of its finished workers
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own / scale, 1), round(children / scale, 1)
+
+class BuildProfiler:
+    """Wall time, peak memory and output volume of each main.py phase.
+
+    Phases are sequential: phase() ends the running phase and starts the
+    next one. Set `writer` once output starts so file counts are recorded."""
+
+    def __init__(self):
+        self.phases = []
+        self.writer = None
+        self.start = time.perf_counter()
+        self.current = None
+
+    def _written(self):
+        if self.writer is None:
+            return 0, 0
+        return self.writer.stats["files"], self.writer.stats["bytes"]
+
+    def phase(self, name):
+        self.finish()
+        self.current = (name, time.perf_counter(), self._written())
+
+    def finish(self):
+        if self.current is None:
+            return
+        name, start, (files, written) = self.current
+        self.current = None
+        now_files, now_written = self._written()
+        record = {"name": name, "seconds": round(time.perf_counter() - start, 4),
+                  "files": now_files - files, "bytes": now_written - written}
+        rss = peak_rss_mb()
+        if rss:
+            record["peak_rss_mb"], record["peak_child_rss_mb"] = rss
+        self.phases.append(record)
+
+    def report(self, **info):
+        self.finish()
+        report = dict(info)
+        report["total_seconds"] = round(time.perf_counter() - self.start, 4)
+        rss = peak_rss_mb()
+        if rss:
+            report["peak_rss_mb"], report["peak_child_rss_mb"] = rss
+        report["files_written"], report["bytes_written"] = self._written()
+        report["phases"] = self.phases
+        return report
+
+    def save(self, path, **info):
+        with open(path, 'w') as f:
+            json.dump(self.report(**info), f, indent=4)
@@ -0,0 +1,88 @@
+import struct
+
+BRANCHES = {"beq", "bne", "blt", "bge", "bltu", "bgeu"}
+# fence and CSR instructions decode as "unknown" but do not end a code path
+PASSTHROUGH_OPCODES = {0x0F, 0x73}
+MAX_TABLE_ENTRIES = 4096
+
+def tree_depth(count, ways=2):
+    # Node files on the longest path of DispatcherGenerator's tree over `count` addresses
+    depth = 1 if count else 0
+    while ways ** depth < count:
+        depth += 1
+    return depth
+
+class ReachabilityAnalyzer:
+    """Recursive-descent disassembly from a set of root addresses.
+
+    Paths are followed through fallthrough, branch and jal targets and the
+    return site after every call. lui/auipc+addi (and auipc+jalr) constants
+    that land on an instruction become roots too, and when such a constant
+    points at a table of code addresses in `memory` (a switch jump table or
+    function pointer array), every entry is added as well."""
+
+    def __init__(self, instructions, memory=b""):
+        self.instructions = instructions
+        self.index = {instr.address: i for i, instr in enumerate(instructions)}
+        self.memory = memory
+        self.reachable = set()
+
+    def analyze(self, roots):
+        work = [addr for addr in roots if addr in self.index]
+        while work:
+            self._walk(work.pop(), work)
+        return self.reachable
+
+    def _walk(self, addr, work):
+        hi = {}
+        while addr in self.index and addr not in self.reachable:
+            instr = self.instructions[self.index[addr]]
+            name = instr.name
+            if name == "unknown" and instr.word & 0x7F not in PASSTHROUGH_OPCODES:
+                return
+            self.reachable.add(addr)
+            next_addr = (addr + 4) & 0xFFFFFFFF
+
+            if name in BRANCHES:
+                work.append((addr + instr.imm) & 0xFFFFFFFF)
+            elif name == "jal":
+                work.append((addr + instr.imm) & 0xFFFFFFFF)
+                if instr.rd == 0:
+                    return
+            elif name == "jalr":
+                if instr.rs1 in hi:
+                    work.append((hi[instr.rs1] + instr.imm) & 0xFFFFFFFE)
+                if instr.rd == 0:
+                    return
+            elif name == "lui":
+                hi[instr.rd] = instr.imm & 0xFFFFFFFF
+                self._add_constant(hi[instr.rd], work)
+                addr = next_addr
+                continue
+            elif name == "auipc":
+                hi[instr.rd] = (addr + instr.imm) & 0xFFFFFFFF
+                self._add_constant(hi[instr.rd], work)
+                addr = next_addr
+                continue
+            elif name == "addi" and instr.rs1 in hi:
+                value = (hi[instr.rs1] + instr.imm) & 0xFFFFFFFF
+                self._add_constant(value, work)
+                hi[instr.rd] = value
+                addr = next_addr
+                continue
+
+            if instr.rd in hi:
+                del hi[instr.rd]
+            addr = next_addr
+
+    def _add_constant(self, value, work):
+        if value in self.index:
+            work.append(value)
+        for entry in range(MAX_TABLE_ENTRIES):
+            offset = value + entry * 4
+            if offset + 4 > len(self.memory):
+                break
+            target = struct.unpack_from("<I", self.memory, offset)[0]
+            if target == 0 or target not in self.index:
+                break
+            work.append(target)
@@ -0,0 +1,338 @@
+import argparse
+import json
+import struct
+import sys
+import time
+from decoder import Decoder
+from elf_loader import ElfImage, RAM_SIZE, is_elf, read_map_symbols
+from block_optimizer import BlockOptimizer
+
+BRANCHES = {"beq": "==", "bne": "!=", "blt": "<", "bge": ">=", "bltu": "<", "bgeu": ">="}
+TERMINATORS = set(BRANCHES) | {"jal", "jalr", "ecall", "ebreak"}
+AMO_OPS = {
+    "amoswap.w": "b",
+    "amoadd.w": "(a + b) & M",
+    "amoxor.w": "a ^ b",
+    "amoand.w": "a & b",
+    "amoor.w": "a | b",
+    "amomin.w": "a if s(a) < s(b) else b",
+    "amomax.w": "a if s(a) > s(b) else b",
+    "amominu.w": "min(a, b)",
+    "amomaxu.w": "max(a, b)",
+}
+
+class SimulatorError(Exception):
+    pass
+
+def _s(value):
+    return (value ^ 0x80000000) - 0x80000000
+
+def _div(a, b):
+    if b == 0:
+        return 0xFFFFFFFF
+    a, b = _s(a), _s(b)
+    q = abs(a) // abs(b)
+    return (-q if (a < 0) != (b < 0) else q) & 0xFFFFFFFF
+
+def _rem(a, b):
+    if b == 0:
+        return a
+    a, b = _s(a), _s(b)
+    r = abs(a) % abs(b)
+    return (-r if a < 0 else r) & 0xFFFFFFFF
+
+def _divu(a, b):
+    return a // b if b else 0xFFFFFFFF
+
+def _remu(a, b):
+    return a % b if b else a
+
+def load_program(path, map_file=None):
+    # (instructions, memory image, code symbols, entry) of an ELF or flat binary
+    with open(path, 'rb') as f:
+        data = f.read()
+    if is_elf(data):
+        image = ElfImage(data)
+        return image.decode_table(), image.memory_image(), image.symbols, image.entry
+    symbols = read_map_symbols(map_file) if map_file else {}
+    return Decoder(data).decode_table(), data, symbols, 0
+
+class Simulator:
+    """RV32IMA instruction-set simulator with the MC-RVVM ecall ABI.
+
+    Straight-line runs of code are compiled to Python functions that return
+    the next pc. Blocks follow BlockOptimizer's leaders, so `counts` (times
+    each block was entered) lines up with the b_* functions of an -O build;
+    jumps into the middle of a block start a new block there."""
+
+    def __init__(self, instructions, memory, symbols=None, entry=0, input_bytes=b"", extra_data=b""):
+        optimizer = BlockOptimizer(instructions, None, symbols or {})
+        optimizer._identify_leaders()
+        self.leaders = optimizer.leaders
+        self.instr_map = optimizer.instr_map
+        if len(memory) > RAM_SIZE:
+            raise SimulatorError(f"memory image of {len(memory)} bytes does not fit in RAM")
+        self.ram = bytearray(RAM_SIZE)
+        self.ram[:len(memory)] = memory
+        self.x = [0] * 32
+        self.pc = entry & 0xFFFFFFFF
+        self.input = list(input_bytes)
+        self.extra_data = extra_data
+        self.blocks = {}
+        self.counts = {}
+        self.dispatches = {}
+        self.instructions = 0
+        self.halted = False
+        self.sleep_ticks = 0
+        self.output = []
+        self.line = []
+        self.on_output = None
+        self.commands = []
+        self.nbt = {}
+        self.ecalls = {}
+
+    def run(self, max_instructions=None):
+        blocks = self.blocks
+        counts = self.counts
+        dispatches = self.dispatches
+        x, ram = self.x, self.ram
+        pc = self.pc
+        limit = max_instructions if max_instructions is not None else float("inf")
+        executed = self.instructions
+        try:
+            while not self.halted and executed < limit:
+                block = blocks.get(pc)
+                if block is None:
+                    block = self._compile(pc)
+                counts[pc] = counts.get(pc, 0) + 1
+                executed += block[1]
+                self.pc = pc
+                pc = block[0](x, ram)
+                if block[2]:
+                    # Datapack blocks reach these through dispatch/root
+                    dispatches[pc] = dispatches.get(pc, 0) + 1
+        except (IndexError, struct.error):
+            raise SimulatorError(f"memory access out of range in block {hex(self.pc)}")
+        finally:
+            self.instructions = executed
+        self.pc = pc
+        return self.halted
+
+    def _compile(self, pc):
+        if pc not in self.instr_map:
+            raise SimulatorError(f"jump to {hex(pc)}, which is not an instruction (from block {hex(self.pc)})")
+        instrs = []
+        addr = pc
+        while addr in self.instr_map:
+            instr = self.instr_map[addr]
+            instrs.append(instr)
+            addr += 4
+            if instr.name in TERMINATORS or addr in self.leaders:
+                break
+        lines = [f"def block(x, m):"]
+        for instr in instrs:
+            lines.extend("    " + line for line in self._translate(instr))
+        if instrs[-1].name not in TERMINATORS or instrs[-1].name in BRANCHES:
+            lines.append(f"    return {addr & 0xFFFFFFFF}")
+        env = {"M": 0xFFFFFFFF, "s": _s, "div": _div, "rem": _rem, "divu": _divu, "remu": _remu,
+               "unpack": struct.unpack_from, "pack": struct.pack_into, "sim": self}
+        exec("\n".join(lines), env)
+        block = (env["block"], len(instrs), instrs[-1].name in ("jalr", "ecall", "ebreak"))
+        self.blocks[pc] = block
+        return block
+
+    def _translate(self, instr):
+        name, rd, rs1, rs2, imm, addr = instr.name, instr.rd, instr.rs1, instr.rs2, instr.imm, instr.address
+        a, b = f"x[{rs1}]", f"x[{rs2}]"
+        ea = f"(x[{rs1}] + {imm}) & M" if imm else a
+        value = None
+
+        if name in BRANCHES:
+            op = BRANCHES[name]
+            if name in ("blt", "bge"):
+                a, b = f"s({a})", f"s({b})"
+            return [f"if {a} {op} {b}: return {(addr + imm) & 0xFFFFFFFF}"]
+        if name == "jal":
+            lines = [f"x[{rd}] = {(addr + 4) & 0xFFFFFFFF}"] if rd else []
+            return lines + [f"return {(addr + imm) & 0xFFFFFFFF}"]
+        if name == "jalr":
+            lines = [f"t = ({ea}) & 0xFFFFFFFE"]
+            if rd: lines.append(f"x[{rd}] = {(addr + 4) & 0xFFFFFFFF}")
+            return lines + ["return t"]
+        if name == "ecall":
+            return [f"return sim.ecall({(addr + 4) & 0xFFFFFFFF})"]
+        if name == "ebreak":
+            return ["sim.dump()", f"return {(addr + 4) & 0xFFFFFFFF}"]
+        if name == "sw":
+            return [f"pack('<I', m, {ea}, {b})"]
+        if name == "sh":
+            return [f"pack('<H', m, {ea}, {b} & 0xFFFF)"]
+        if name == "sb":
+            return [f"m[{ea}] = {b} & 0xFF"]
+        if name in AMO_OPS or name in ("lr.w", "sc.w"):
+            lines = [f"t = {a}", "v = unpack('<I', m, t)[0]"]
+            if name == "sc.w":
+                lines = [f"pack('<I', m, {a}, {b})"]
+                return lines + ([f"x[{rd}] = 0"] if rd else [])
+            if name != "lr.w":
+                lines.append(f"a, b = v, {b}")
+                lines.append(f"pack('<I', m, t, {AMO_OPS[name]})")
+            return lines + ([f"x[{rd}] = v"] if rd else [])
+
+        if name == "unknown":
+            # fence and CSR accesses; the transpiler skips them as well
+            return ["pass"]
+        if rd == 0:
+            # Loads into x0 still touch memory
+            return [f"m[{ea}]"] if name[0] == "l" else ["pass"]
+
+        if name == "lui": value = str(imm & 0xFFFFFFFF)
+        elif name == "auipc": value = str((addr + imm) & 0xFFFFFFFF)
+        elif name == "addi": value = f"({a} + {imm}) & M"
+        elif name == "slti": value = f"int(s({a}) < {imm})"
+        elif name == "sltiu": value = f"int({a} < {imm & 0xFFFFFFFF})"
+        elif name == "xori": value = f"{a} ^ {imm & 0xFFFFFFFF}"
+        elif name == "ori": value = f"{a} | {imm & 0xFFFFFFFF}"
+        elif name == "andi": value = f"{a} & {imm & 0xFFFFFFFF}"
+        elif name == "slli": value = f"({a} << {imm & 31}) & M"
+        elif name == "srli": value = f"{a} >> {imm & 31}"
+        elif name == "srai": value = f"(s({a}) >> {imm & 31}) & M"
+        elif name == "add": value = f"({a} + {b}) & M"
+        elif name == "sub": value = f"({a} - {b}) & M"
+        elif name == "sll": value = f"({a} << ({b} & 31)) & M"
+        elif name == "srl": value = f"{a} >> ({b} & 31)"
+        elif name == "sra": value = f"(s({a}) >> ({b} & 31)) & M"
+        elif name == "slt": value = f"int(s({a}) < s({b}))"
+        elif name == "sltu": value = f"int({a} < {b})"
+        elif name == "xor": value = f"{a} ^ {b}"
+        elif name == "or": value = f"{a} | {b}"
+        elif name == "and": value = f"{a} & {b}"
+        elif name == "mul": value = f"({a} * {b}) & M"
+        elif name == "mulh": value = f"((s({a}) * s({b})) >> 32) & M"
+        elif name == "mulhsu": value = f"((s({a}) * {b}) >> 32) & M"
+        elif name == "mulhu": value = f"({a} * {b}) >> 32"
+        elif name in ("div", "rem", "divu", "remu"): value = f"{name}({a}, {b})"
+        elif name == "lw": value = f"unpack('<I', m, {ea})[0]"
+        elif name == "lh": value = f"unpack('<h', m, {ea})[0] & M"
+        elif name == "lhu": value = f"unpack('<H', m, {ea})[0]"
+        elif name == "lb": value = f"unpack('<b', m, {ea})[0] & M"
+        elif name == "lbu": value = f"m[{ea}]"
+        else:
+            raise SimulatorError(f"no semantics for {name} at {hex(addr)}")
+        return [f"x[{rd}] = {value}"]
+
+    def _string(self, addr):
+        end = self.ram.index(0, addr)
+        return self.ram[addr:end].decode("latin-1")
+
+    def _emit(self, line):
+        self.output.append(line)
+        if self.on_output:
+            self.on_output(line)
+
+    def ecall(self, next_pc):
+        x = self.x
+        number, a0 = x[17], x[10]
+        self.ecalls[number] = self.ecalls.get(number, 0) + 1
+        if number == 1:
+            self._emit(str(_s(a0)))
+        elif number == 11:
+            if a0 & 0xFF == 10:
+                if self.line:
+                    self._emit("".join(self.line))
+                self.line = []
+            else:
+                self.line.append(chr(a0 & 0xFF))
+        elif number == 10:
+            self.halted = True
+        elif number == 12:
+            if a0 == 0x5555:
+                self.halted = True
+        elif number == 13:
+            self.ram[a0 & ~3:(a0 & ~3) + len(self.extra_data)] = self.extra_data
+        elif number in (14, 18, 19, 20, 21, 22):
+            self.commands.append(self._string(a0))
+        elif number == 15:
+            # Storage paths written by write_nbt read back; anything else is 0
+            x[10] = self.nbt.get((self._string(a0), self._string(x[11])), 0)
+        elif number == 16:
+            self.nbt[(self._string(a0), self._string(x[11]))] = x[12]
+        elif number == 25:
+            self.sleep_ticks += _s(a0)
+        elif number == 26:
+            x[10] = self.input.pop(0) if self.input else 0xFFFFFFFF
+        elif number == 93:
+            self.dump()
+        return next_pc
+
+    def dump(self):
+        regs = " ".join(f"x{i}:{_s(self.x[i])}" for i in (1, 2, 8, 10, 11, 12, 13, 14, 15, 17))
+        print(f"PC:{self.pc} | {regs}", file=sys.stderr)
+
+    def registers(self):
+        # Signed values, as the rv32_reg scoreboard holds them
+        return [_s(v) for v in self.x]
+
+    def profile(self):
+        blocks = {hex(addr): [count, self.blocks[addr][1]] for addr, count in sorted(self.counts.items())}
+        dispatch = {hex(addr): count for addr, count in sorted(self.dispatches.items())}
+        return {"instructions": self.instructions, "halted": self.halted, "blocks": blocks, "dispatch": dispatch}
+
+def read_profile(path, per_instruction=False, dispatch=False):
+    """Execution counts from a Simulator profile, keyed by block start or,
+    with `per_instruction`, by every instruction address. With `dispatch`,
+    the counts of entries through dispatch/root (after jalr, ecall and
+    ebreak) are used when the profile has them."""
+    with open(path, 'r') as f:
+        profile = json.load(f)
+    if dispatch and profile.get("dispatch"):
+        return {int(addr, 16): count for addr, count in profile["dispatch"].items()}
+    counts = {}
+    for start, (count, length) in profile["blocks"].items():
+        start = int(start, 16)
+        for addr in range(start, start + 4 * length if per_instruction else start + 1, 4):
+            counts[addr] = counts.get(addr, 0) + count
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an RV32IMA program with the MC-RVVM ecall ABI and profile it")
+    parser.add_argument("input_file", help="Path to the RV32 ELF executable or flat binary file (.bin)")
+    parser.add_argument("--map_file", help="Path to linker map file (.map) for block boundaries of a .bin")
+    parser.add_argument("--max-instructions", type=int, help="Stop after this many instructions")
+    parser.add_argument("--profile-out", metavar="PROFILE", help="Write per-block execution counts for main.py --profile-in")
+    parser.add_argument("--input", default="", help="Bytes returned by getchar (ecall 26)")
+    parser.add_argument("--load-data", help="Raw file copied into RAM by load_data (ecall 13)")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Do not print program output")
+    args = parser.parse_args()
+
+    instructions, memory, symbols, entry = load_program(args.input_file, args.map_file)
+    extra = b""
+    if args.load_data:
+        with open(args.load_data, 'rb') as f:
+            extra = f.read()
+    sim = Simulator(instructions, memory, symbols, entry, args.input.encode("latin-1"), extra)
+    if not args.quiet:
+        sim.on_output = print
+
+    start = time.perf_counter()
+    try:
+        sim.run(args.max_instructions)
+    except SimulatorError as e:
+        print(f"Error: {e}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    print(f"Instructions: {sim.instructions}{' (halted)' if sim.halted else ''} in {elapsed:.2f}s "
+          f"({sim.instructions / max(elapsed, 1e-9) / 1e6:.2f} MIPS), {len(sim.counts)} blocks executed")
+    if sim.sleep_ticks:
+        print(f"Slept for {sim.sleep_ticks} ticks")
+    if sim.commands:
+        print(f"exec_cmd called {len(sim.commands)} times")
+    if args.profile_out:
+        profile = sim.profile()
+        profile["input_file"] = args.input_file
+        with open(args.profile_out, 'w') as f:
+            json.dump(profile, f, indent=4)
+        print(f"Profile written to {args.profile_out}")
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,30 @@ class Transpiler:
         self.temp_obj = f"{namespace}_temp"
         self.const_obj = f"{namespace}_const"
 
+    def branch_condition(self, instr):
+        """(setup commands, taken, not taken) for a conditional branch, the
+        last two as `execute` subcommands such as "if score x1 rv32_reg = x2 rv32_reg"."""
+        reg_obj = self.reg_obj
+        temp_obj = self.temp_obj
+        rs1 = f"x{instr.rs1}"
+        rs2 = f"x{instr.rs2}"
+        if instr.name in ["bltu", "bgeu"]:
+            prep = [
+                f"scoreboard players operation #u1 {temp_obj} = {rs1} {reg_obj}",
+                f"scoreboard players operation #u1 {temp_obj} -= #min_int {self.const_obj}",
+                f"scoreboard players operation #u2 {temp_obj} = {rs2} {reg_obj}",
+                f"scoreboard players operation #u2 {temp_obj} -= #min_int {self.const_obj}",
+            ]
+            op = "<" if instr.name == "bltu" else ">="
+            test = f"score #u1 {temp_obj} {op} #u2 {temp_obj}"
+        else:
+            prep = []
+            op = {"beq":"=","bne":"=","blt":"<","bge":">="}[instr.name]
+            test = f"score {rs1} {reg_obj} {op} {rs2} {reg_obj}"
+        if instr.name == "bne":
+            return prep, f"unless {test}", f"if {test}"
+        return prep, f"if {test}", f"unless {test}"
+
     def convert_instruction(self, instr, include_pc_update=True):
         cmds = []
         reg_obj = self.reg_obj
@@ -46,6 +70,10 @@ class Transpiler:
                     cmds.append(f"scoreboard players operation #op1 {temp_obj} = {source(instr.rs1)} {reg_obj}")
                     cmds.append(f"scoreboard players operation #op1 {temp_obj} += {source(instr.rs2)} {reg_obj}")
                     cmds.append(f"scoreboard players operation {rd} {reg_obj} = #op1 {temp_obj}")
+                elif instr.name == "mul":
+                    cmds.append(f"scoreboard players operation #op1 {temp_obj} = {source(instr.rs1)} {reg_obj}")
+                    cmds.append(f"scoreboard players operation #op1 {temp_obj} *= {source(instr.rs2)} {reg_obj}")
+                    cmds.append(f"scoreboard players operation {rd} {reg_obj} = #op1 {temp_obj}")
                 elif instr.name == "sub":
                     cmds.append(f"scoreboard players operation #op1 {temp_obj} = {source(instr.rs1)} {reg_obj}")
                     cmds.append(f"scoreboard players operation #op1 {temp_obj} -= {source(instr.rs2)} {reg_obj}")
@@ -53,7 +81,7 @@ class Transpiler:
                 elif instr.name == "addi":
                     cmds.append(f"scoreboard players operation {rd} {reg_obj} = {source(instr.rs1)} {reg_obj}")
                     cmds.extend(safe_add_literal(rd, reg_obj, instr.imm))
-                elif instr.name in ["xor", "or", "and", "mul", "mulh", "mulhsu", "mulhu", "div", "divu", "rem", "remu"]:
+                elif instr.name in ["xor", "or", "and", "mulh", "mulhsu", "mulhu", "div", "divu", "rem", "remu"]:
                     cmds.append(f"scoreboard players operation #op1 {temp_obj} = {source(instr.rs1)} {reg_obj}")
                     cmds.append(f"scoreboard players operation #op2 {temp_obj} = {source(instr.rs2)} {reg_obj}")
                     cmds.append(f"function {self.namespace}:lib/{instr.name}")
@@ -106,32 +134,23 @@ class Transpiler:
         elif instr.name in ["beq", "bne", "blt", "bge", "bltu", "bgeu"]:
             target_addr = s32(instr.address + instr.imm)
             next_addr = s32(instr.address + 4)
-            if instr.name in ["bltu", "bgeu"]:
-                cmds.append(f"scoreboard players operation #u1 {temp_obj} = {source(instr.rs1)} {reg_obj}")
-                cmds.append(f"scoreboard players operation #u1 {temp_obj} -= #min_int {const_obj}")
-                cmds.append(f"scoreboard players operation #u2 {temp_obj} = {source(instr.rs2)} {reg_obj}")
-                cmds.append(f"scoreboard players operation #u2 {temp_obj} -= #min_int {const_obj}")
-                op = "<" if instr.name == "bltu" else ">="
-                cmds.append(f"execute if score #u1 {temp_obj} {op} #u2 {temp_obj} run scoreboard players set pc {pc_obj} {target_addr}")
-                cmds.append(f"execute unless score #u1 {temp_obj} {op} #u2 {temp_obj} run scoreboard players set pc {pc_obj} {next_addr}")
-            else:
-                op = {"beq":"=","bne":"=","blt":"<","bge":">="}[instr.name]
-                exec_type = "unless" if instr.name == "bne" else "if"
-                other_type = "if" if instr.name == "bne" else "unless"
-                cmds.append(f"execute {exec_type} score {source(instr.rs1)} {reg_obj} {op} {source(instr.rs2)} {reg_obj} run scoreboard players set pc {pc_obj} {target_addr}")
-                cmds.append(f"execute {other_type} score {source(instr.rs1)} {reg_obj} {op} {source(instr.rs2)} {reg_obj} run scoreboard players set pc {pc_obj} {next_addr}")
+            prep, taken, not_taken = self.branch_condition(instr)
+            cmds.extend(prep)
+            cmds.append(f"execute {taken} run scoreboard players set pc {pc_obj} {target_addr}")
+            cmds.append(f"execute {not_taken} run scoreboard players set pc {pc_obj} {next_addr}")
 
         elif instr.name == "jal":
             rd = target(instr.rd)
             if rd: cmds.append(f"scoreboard players set {rd} {reg_obj} {s32(instr.address + 4)}")
             cmds.append(f"scoreboard players set pc {pc_obj} {s32(instr.address + instr.imm)}")
         elif instr.name == "jalr":
+            # Read rs1 before writing rd: `jalr ra, 0(ra)` is common
             rd = target(instr.rd)
-            if rd: cmds.append(f"scoreboard players set {rd} {reg_obj} {s32(instr.address + 4)}")
             cmds.append(f"scoreboard players operation pc {pc_obj} = {source(instr.rs1)} {reg_obj}")
             cmds.extend(safe_add_literal("pc", pc_obj, instr.imm))
             cmds.append(f"scoreboard players operation pc {pc_obj} /= #two {const_obj}")
             cmds.append(f"scoreboard players operation pc {pc_obj} *= #two {const_obj}")
+            if rd: cmds.append(f"scoreboard players set {rd} {reg_obj} {s32(instr.address + 4)}")
 
         elif instr.name == "lui":
             rd = target(instr.rd)
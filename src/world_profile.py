@@ -0,0 +1,150 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import struct
+import zlib
+
+TAG_END, TAG_BYTE, TAG_SHORT, TAG_INT, TAG_LONG, TAG_FLOAT, TAG_DOUBLE = range(7)
+TAG_BYTE_ARRAY, TAG_STRING, TAG_LIST, TAG_COMPOUND, TAG_INT_ARRAY, TAG_LONG_ARRAY = range(7, 13)
+
+_SCALARS = {TAG_BYTE: ">b", TAG_SHORT: ">h", TAG_INT: ">i", TAG_LONG: ">q", TAG_FLOAT: ">f", TAG_DOUBLE: ">d"}
+_ARRAYS = {TAG_BYTE_ARRAY: "b", TAG_INT_ARRAY: "i", TAG_LONG_ARRAY: "q"}
+_COUNTER = re.compile(r'^([bid])_([0-9a-f]+)$')
+_BLOCK_LENGTH = re.compile(r'^scoreboard players remove #ipt_count \S+ (\d+)$')
+
+class _NbtReader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt):
+        value = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return value[0]
+
+    def string(self):
+        length = self.unpack(">H")
+        text = self.data[self.pos:self.pos + length].decode("utf-8", "replace")
+        self.pos += length
+        return text
+
+    def payload(self, tag):
+        if tag in _SCALARS:
+            return self.unpack(_SCALARS[tag])
+        if tag == TAG_STRING:
+            return self.string()
+        if tag in _ARRAYS:
+            count = self.unpack(">i")
+            code = _ARRAYS[tag]
+            values = struct.unpack_from(f">{count}{code}", self.data, self.pos)
+            self.pos += count * struct.calcsize(code)
+            return list(values)
+        if tag == TAG_LIST:
+            item_tag = self.unpack(">b")
+            count = self.unpack(">i")
+            return [self.payload(item_tag) for _ in range(count)]
+        if tag == TAG_COMPOUND:
+            compound = {}
+            while True:
+                child = self.unpack(">b")
+                if child == TAG_END:
+                    return compound
+                name = self.string()
+                compound[name] = self.payload(child)
+        raise ValueError(f"unknown NBT tag {tag} at offset {self.pos}")
+
+def read_nbt_file(path):
+    """Root compound of a (usually gzip-compressed) NBT file such as
+    level.dat, scoreboard.dat or command_storage_<ns>.dat."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    elif data[:1] == b"\x78":
+        data = zlib.decompress(data)
+    reader = _NbtReader(data)
+    tag = reader.unpack(">b")
+    if tag != TAG_COMPOUND:
+        raise ValueError(f"{path} does not start with a compound tag")
+    reader.string()
+    return reader.payload(TAG_COMPOUND)
+
+def find_data_file(path, name):
+    # Accept the .dat file itself, a world directory or its data/ directory
+    for candidate in (path, os.path.join(path, name), os.path.join(path, "data", name)):
+        if os.path.isfile(candidate):
+            return candidate
+    raise FileNotFoundError(f"no {name} found at {path}")
+
+def read_counters(scoreboard_file, namespace="rv32"):
+    """{(kind, address): count} for the b_/i_ (function runs) and d_
+    (dispatch entries) holders of the <ns>_prof objective."""
+    root = read_nbt_file(scoreboard_file)
+    objective = f"{namespace}_prof"
+    counters = {}
+    for entry in root.get("data", root).get("PlayerScores", []):
+        if entry.get("Objective") != objective:
+            continue
+        match = _COUNTER.match(entry.get("Name", ""))
+        if match:
+            # Scores wrap at 2^31; counters that overflowed read back negative
+            counters[(match.group(1), int(match.group(2), 16))] = entry.get("Score", 0) & 0xFFFFFFFF
+    return counters
+
+def block_lengths(datapack, namespace="rv32"):
+    # Instruction count of every b_ function, from its first line
+    function_dir = os.path.join(datapack, "data", namespace, "function")
+    lengths = {}
+    for name in os.listdir(function_dir):
+        match = _COUNTER.match(name[:-len(".mcfunction")]) if name.endswith(".mcfunction") else None
+        if not match or match.group(1) != "b":
+            continue
+        with open(os.path.join(function_dir, name), 'r') as f:
+            first = _BLOCK_LENGTH.match(f.readline().strip())
+        if first:
+            lengths[int(match.group(2), 16)] = int(first.group(1))
+    return lengths
+
+def counters_to_profile(counters, lengths=None):
+    # Same layout as simulator.py --profile-out, readable by main.py --profile-in
+    lengths = lengths or {}
+    blocks = {}
+    dispatch = {}
+    for (kind, addr), count in sorted(counters.items(), key=lambda c: c[0][1]):
+        if not count:
+            continue
+        if kind == "d":
+            dispatch[hex(addr)] = count
+        else:
+            blocks[hex(addr)] = [count, lengths.get(addr, 1) if kind == "b" else 1]
+    instructions = sum(count * length for count, length in blocks.values())
+    return {"instructions": instructions, "halted": None, "blocks": blocks, "dispatch": dispatch}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the block counters of an --instrument build from a world save")
+    parser.add_argument("world", help="World directory, its data/ directory or scoreboard.dat")
+    parser.add_argument("output", help="Profile JSON for main.py --profile-in")
+    parser.add_argument("--namespace", default="rv32", help="Datapack namespace")
+    parser.add_argument("--datapack", help="The instrumented datapack directory, to record block lengths")
+    args = parser.parse_args()
+
+    scoreboard_file = find_data_file(args.world, "scoreboard.dat")
+    counters = read_counters(scoreboard_file, args.namespace)
+    if not counters:
+        print(f"No {args.namespace}_prof counters in {scoreboard_file}. Was the datapack built with --instrument "
+              f"and the world saved (/save-all) after running it?")
+        raise SystemExit(1)
+    lengths = block_lengths(args.datapack, args.namespace) if args.datapack else None
+    profile = counters_to_profile(counters, lengths)
+    profile["world"] = args.world
+    with open(args.output, 'w') as f:
+        json.dump(profile, f, indent=4)
+    hottest = sorted(profile["blocks"].items(), key=lambda b: b[1][0], reverse=True)[:3]
+    print(f"Exported {len(profile['blocks'])} counters ({profile['instructions']} instructions) to {args.output}.")
+    for addr, (count, _) in hottest:
+        print(f"  {addr}: {count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import io
+import os
+import shutil
+import zipfile
+
+class PackWriter:
+    """Writes datapack files by path relative to the pack root.
+
+    `child(prefix)` returns a writer for a subdirectory that shares the
+    destination and the file/byte counters with its parent."""
+
+    parallel_safe = False
+
+    def __init__(self):
+        self.prefix = ""
+        self.stats = {"files": 0, "bytes": 0}
+
+    def child(self, prefix):
+        writer = self._copy()
+        writer.prefix = self._join(prefix)
+        return writer
+
+    def _copy(self):
+        writer = object.__new__(type(self))
+        writer.__dict__.update(self.__dict__)
+        return writer
+
+    def for_worker(self):
+        # Writer for one task in a worker process. Its output and counters
+        # are handed back through result() and applied here with merge().
+        if not self.parallel_safe:
+            return BufferWriter(self.prefix)
+        writer = self._copy()
+        writer.stats = {"files": 0, "bytes": 0}
+        return writer
+
+    def result(self):
+        return [], self.stats
+
+    def merge(self, result):
+        files, stats = result
+        self.write_files(files)
+        for name, value in stats.items():
+            self.stats[name] += value
+
+    def _join(self, path):
+        path = path.replace(os.sep, "/")
+        if not self.prefix or not path:
+            return self.prefix or path
+        return f"{self.prefix}/{path}"
+
+    def open(self, path):
+        full = self._join(path)
+        return _BufferedFile(lambda text: self._store(full, text))
+
+    def write(self, path, text):
+        with self.open(path) as f:
+            f.write(text)
+
+    def write_files(self, files):
+        # `files` are (pack path, text) pairs collected by a BufferWriter.
+        for full, text in files:
+            self._store(full, text)
+
+    def _store(self, full, text):
+        self._write(full, text)
+        self.stats["files"] += 1
+        self.stats["bytes"] += len(text.encode())
+
+    def exists(self, path):
+        return False
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+class _BufferedFile(io.StringIO):
+    def __init__(self, on_close):
+        super().__init__()
+        self._on_close = on_close
+
+    def close(self):
+        if not self.closed:
+            self._on_close(self.getvalue())
+        super().close()
+
+class DirWriter(PackWriter):
+    parallel_safe = True
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self._dirs = set()
+
+    def path(self, path=""):
+        return os.path.join(self.root, *self._join(path).split("/"))
+
+    def exists(self, path):
+        return os.path.exists(self.path(path))
+
+    def reset(self):
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        self._dirs.clear()
+
+    def _write(self, full, text):
+        path = os.path.join(self.root, *full.split("/"))
+        parent = os.path.dirname(path)
+        if parent not in self._dirs:
+            os.makedirs(parent, exist_ok=True)
+            self._dirs.add(parent)
+        with open(path, 'w') as f:
+            f.write(text)
+
+class ZipWriter(PackWriter):
+    """Streams every file into one zip archive as soon as it is closed."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.root = path
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+
+    def _write(self, full, text):
+        self.zip.writestr(full, text)
+
+    def close(self):
+        self.zip.close()
+
+class BufferWriter(PackWriter):
+    """Collects files in memory so worker processes can hand them back to
+    a writer that cannot be shared between processes."""
+
+    def __init__(self, prefix=""):
+        super().__init__()
+        self.prefix = prefix
+        self.files = []
+
+    def _store(self, full, text):
+        self.files.append((full, text))
+
+    def result(self):
+        return self.files, self.stats
+
+def open_writer(output):
+    if output.lower().endswith(".zip"):
+        return ZipWriter(output)
+    return DirWriter(output)